@@ -0,0 +1,408 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Converts the ngSkinTools layers of many scene files without a UI, to run under mayapy.
+
+            mayapy -m rig_tools.tool.ngSkinHelperTool.batchConvert "P:/show/rigs/*/publish/*.ma"
+                --output-dir P:/show/rigs_ng2 --processes 4 --report P:/show/convert_report.json
+
+        Features:
+        - Scene files are given as paths, glob patterns or a text file listing them.
+        - The scenes are shared among a pool of mayapy processes, each one opens a scene at a time.
+        - Each mesh is converted by NgControlV1 or NgControlV2 and verified like the Utils tab does.
+        - A scene is saved only when all of its meshes converted and verified.
+        - The JSON report holds the timing and the verification of each scene and mesh.
+
+:Revisions:
+"""
+# Build-in
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# Maya modules
+from maya import cmds
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import progress
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+
+CONVERTED = "converted"
+SKIPPED = "skipped"
+FAILED = "failed"
+ERROR = "error"
+
+SOURCE_VERSIONS = ("ngSkinTools1", "ngSkinTools2")
+
+
+def _initializeWorker():
+    # each process of the pool runs its own Maya session
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+
+    from rig_tools.tool.ngSkinHelperTool.util import utils
+    isNg1, isNg2 = utils.checkNgSkinToolsPlugins()
+    if not (isNg1 and isNg2):
+        log.warning("Both ngSkinTools plugins are needed to convert (ngSkinTools1: %s, ngSkinTools2: %s)",
+                    isNg1, isNg2)
+
+
+def _getControl(sourceVersion):
+    if sourceVersion == SOURCE_VERSIONS[0]:
+        from rig_tools.tool.ngSkinHelperTool.tabInternal.version1.convert import NgControlV1
+        return NgControlV1(None)
+
+    from rig_tools.tool.ngSkinHelperTool.tabInternal.version2.convert import NgControlV2
+    return NgControlV2(None)
+
+
+def _listMeshes(sourceVersion, namespaces=None):
+    from rig_tools.tool.ngSkinHelperTool.util import utils
+
+    policy = utils.NamespacePolicy()
+    if namespaces:
+        policy = utils.NamespacePolicy(utils.NamespacePolicy.INCLUDE_LISTED, namespaces=namespaces)
+
+    index = utils.SceneSkinIndex()
+    meshes = utils.getNgSkinnedMesh(mode=2, index=index, namespacePolicy=policy) or []
+    return [mesh for mesh in meshes if index.get(mesh).ngVersion == sourceVersion]
+
+
+def _saveScene(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fileType = "mayaBinary" if path.lower().endswith(".mb") else "mayaAscii"
+    cmds.file(rename=path)
+    cmds.file(save=True, force=True, type=fileType)
+
+
+def convertScene(job):
+    """Open a scene, convert the layers of its meshes and save it, run in a process of the pool
+
+    :param job: dict
+        "scene", "output", "sourceVersion", "namespaces", "tolerance", "keepSource" and "timeout"
+    :return: dict
+        the report entry of the scene
+    """
+    start = time.time()
+    entry = {"scene": job["scene"],
+             "output": job["output"],
+             "status": ERROR,
+             "process": os.getpid(),
+             "meshes": [],
+             "openSeconds": 0.0,
+             "saveSeconds": 0.0,
+             "seconds": 0.0,
+             "error": None}
+
+    try:
+        cmds.file(job["scene"], open=True, force=True, prompt=False)
+        entry["openSeconds"] = time.time() - start
+
+        meshes = _listMeshes(job["sourceVersion"], job["namespaces"])
+        if not meshes:
+            entry["status"] = SKIPPED
+            return entry
+
+        control = _getControl(job["sourceVersion"])
+        control.reporter.subscribe(progress.LoggingSubscriber(log, logging.DEBUG))
+        if job["tolerance"] is not None:
+            control.TOLERANCE = job["tolerance"]
+        control.keepSource = job["keepSource"]
+        if job["timeout"]:
+            # restarted for each mesh, a mesh taking longer isn't converted and the scene isn't saved
+            control.reporter.token = progress.TimeoutToken(job["timeout"])
+
+        for mesh in meshes:
+            meshStart = time.time()
+            cmds.select(mesh, replace=True)
+            converted = control.convert(mesh)
+
+            verification = control.verification.toData() if control.verification else None
+            entry["meshes"].append({"mesh": mesh,
+                                    "converted": converted,
+                                    "seconds": time.time() - meshStart,
+                                    "verification": verification})
+
+        failed = [meshEntry["mesh"] for meshEntry in entry["meshes"] if not meshEntry["converted"]]
+        if failed:
+            # a published scene isn't saved half converted
+            entry["status"] = FAILED
+            entry["error"] = "Not converted: {}".format(", ".join(failed))
+            return entry
+
+        saveStart = time.time()
+        _saveScene(job["output"])
+        entry["saveSeconds"] = time.time() - saveStart
+        entry["status"] = CONVERTED
+
+    except Exception:
+        entry["error"] = traceback.format_exc()
+
+    finally:
+        entry["seconds"] = time.time() - start
+        try:
+            cmds.file(new=True, force=True)
+        except RuntimeError:
+            log.exception("Can't close %s", job["scene"])
+
+    return entry
+
+
+def collectScenes(patterns, listFile=None):
+    """Expand the paths and glob patterns to scene files
+
+    :param patterns: list
+        paths or glob patterns
+    :param listFile: str
+        a text file with a path or pattern per line
+    :return: list
+        sorted unique paths
+    """
+    patterns = list(patterns)
+    if listFile:
+        with open(listFile, "r") as f:
+            patterns.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    scenes = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if not matches:
+            log.warning("No scene matches %s", pattern)
+        scenes.update(os.path.normpath(path) for path in matches if os.path.isfile(path))
+    return sorted(scenes)
+
+
+def getCommonDirectory(scenes):
+    """Get the deepest directory holding every scene
+
+    :param scenes: list
+    :return: str
+    """
+    splitDirectories = [os.path.dirname(os.path.abspath(scene)).split(os.sep) for scene in scenes]
+
+    common = []
+    for parts in zip(*splitDirectories):
+        if any(part != parts[0] for part in parts):
+            break
+        common.append(parts[0])
+    return os.sep.join(common) or os.sep
+
+
+def getOutputPath(scene, outputDirectory=None, suffix="", sourceRoot=None):
+    """Get the path a converted scene is saved to, the scene itself when neither option is given
+
+    :param scene: str
+    :param outputDirectory: str
+    :param suffix: str
+        added to the file name before the extension
+    :param sourceRoot: str
+        the directories of the scene under it are kept in the output directory,
+        e.g. getCommonDirectory() of the scenes
+    :return: str
+    """
+    name, extension = os.path.splitext(os.path.basename(scene))
+    directory = os.path.dirname(scene)
+
+    if outputDirectory:
+        subdirectory = ""
+        if sourceRoot:
+            try:
+                subdirectory = os.path.relpath(os.path.dirname(os.path.abspath(scene)), sourceRoot)
+            except ValueError:
+                # on another drive than the root
+                log.warning("%s is not under %s, it is saved at the top of the output directory", scene, sourceRoot)
+        directory = os.path.normpath(os.path.join(outputDirectory, subdirectory))
+
+    return os.path.join(directory, "{}{}{}".format(name, suffix, extension))
+
+
+def findDuplicateOutputs(jobs):
+    """Find the output paths shared by several scenes, they would overwrite each other
+
+    :param jobs: list
+    :return: dict
+        the scenes of each shared output path
+    """
+    scenes = {}
+    for job in jobs:
+        key = os.path.normcase(os.path.abspath(job["output"]))
+        scenes.setdefault(key, []).append(job["scene"])
+    return dict((path, names) for path, names in scenes.items() if len(names) > 1)
+
+
+def runBatch(jobs, processes=1, maxScenesPerProcess=None):
+    """Convert the scenes among a pool of processes
+
+    :param jobs: list
+        a job per scene, see convertScene()
+    :param processes: int
+        1 runs the scenes in this process
+    :param maxScenesPerProcess: int
+        restart a process of the pool after this many scenes, to give its memory back
+    :return: list
+        the report entry of each scene, in the order they finished
+    """
+    entries = []
+
+    def report(entry):
+        entries.append(entry)
+        log.info("[%d/%d] %s %s (%.1f sec)", len(entries), len(jobs), entry["status"], entry["scene"],
+                 entry["seconds"])
+
+    if processes <= 1:
+        _initializeWorker()
+        for job in jobs:
+            report(convertScene(job))
+        return entries
+
+    pool = multiprocessing.Pool(processes, initializer=_initializeWorker, maxtasksperchild=maxScenesPerProcess)
+    try:
+        # a scene at a time, the scenes are far from even in size
+        for entry in pool.imap_unordered(convertScene, jobs, chunksize=1):
+            report(entry)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return entries
+
+
+def writeReport(path, entries, options, seconds):
+    """Write the JSON report of a batch
+
+    :param path: str
+    :param entries: list
+        the report entry of each scene
+    :param options: dict
+    :param seconds: float
+        wall time of the batch
+    """
+    counts = dict((status, 0) for status in (CONVERTED, SKIPPED, FAILED, ERROR))
+    for entry in entries:
+        counts[entry["status"]] += 1
+
+    report = {"version": REPORT_VERSION,
+              "options": options,
+              "seconds": seconds,
+              "counts": counts,
+              "scenes": sorted(entries, key=lambda entry: entry["scene"])}
+
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog="batchConvert",
+                                     description="Convert the ngSkinTools layers of scene files under mayapy.")
+    parser.add_argument("scenes", nargs="*", help="scene files or glob patterns")
+    parser.add_argument("--list", dest="listFile", help="a text file with a scene path or pattern per line")
+    parser.add_argument("--source", choices=SOURCE_VERSIONS, default=SOURCE_VERSIONS[0],
+                        help="the version the layers are converted from")
+    parser.add_argument("--output-dir", dest="outputDirectory",
+                        help="save the converted scenes in this directory, under their directories "
+                             "relative to the common directory of the scenes")
+    parser.add_argument("--suffix", default="", help="added to the name of the converted scenes")
+    parser.add_argument("--in-place", dest="inPlace", action="store_true", help="overwrite the scenes")
+    parser.add_argument("--processes", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--max-scenes-per-process", dest="maxScenesPerProcess", type=int, default=None)
+    parser.add_argument("--namespace", dest="namespaces", action="append",
+                        help="also convert the meshes of this namespace, the root namespace only by default")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="the largest change of a skinCluster weight that passes the verification")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="give up a mesh after this many seconds, checked between two layers")
+    parser.add_argument("--keep-source", dest="keepSource", action="store_true",
+                        help="keep the layers of the source version, "
+                             "needed for a later conversion to only write the changed layers")
+    parser.add_argument("--report", default="batchConvert_report.json", help="the JSON report path")
+
+    args = parser.parse_args(argv)
+    if not (args.scenes or args.listFile):
+        parser.error("no scene given")
+    if not (args.outputDirectory or args.suffix or args.inPlace):
+        parser.error("give --output-dir, --suffix or --in-place")
+    return args
+
+
+def main(argv=None):
+    """Entry point of mayapy -m rig_tools.tool.ngSkinHelperTool.batchConvert
+
+    :param argv: list
+    :return: int
+        the exit code, 1 when a scene wasn't converted
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parseArguments(argv)
+
+    scenes = collectScenes(args.scenes, args.listFile)
+    if not scenes:
+        log.error("No scene to convert")
+        return 1
+
+    # the scenes keep their directories under the common one, two rigs can have the same file name
+    sourceRoot = getCommonDirectory(scenes) if args.outputDirectory else None
+    jobs = [{"scene": scene,
+             "output": getOutputPath(scene, args.outputDirectory, args.suffix, sourceRoot),
+             "sourceVersion": args.source,
+             "namespaces": args.namespaces,
+             "tolerance": args.tolerance,
+             "keepSource": args.keepSource,
+             "timeout": args.timeout}
+            for scene in scenes]
+
+    duplicates = findDuplicateOutputs(jobs)
+    if duplicates:
+        for path, names in sorted(duplicates.items()):
+            log.error("%s would be written by %s", path, ", ".join(names))
+        return 1
+
+    processes = max(1, min(args.processes, len(jobs)))
+    log.info("Converting %d scenes from %s with %d processes", len(jobs), args.source, processes)
+
+    start = time.time()
+    entries = runBatch(jobs, processes, args.maxScenesPerProcess)
+    seconds = time.time() - start
+
+    options = dict(vars(args))
+    options["processes"] = processes
+    writeReport(args.report, entries, options, seconds)
+    log.info("Report written to %s (%.1f sec)", args.report, seconds)
+
+    return 0 if all(entry["status"] in (CONVERTED, SKIPPED) for entry in entries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
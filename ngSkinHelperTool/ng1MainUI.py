@@ -38,7 +38,7 @@ from maya import cmds
 import rig_tools.ui.pyside.util as pyqt_util
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import utils, common
+from rig_tools.tool.ngSkinHelperTool.util import utils, common, capabilities, progress
 from rig_tools.tool.ngSkinHelperTool.widgets import tabWidget
 from rig_tools.tool.ngSkinHelperTool.widgets.widget import MainLayout
 from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
@@ -52,18 +52,17 @@ from rig_tools.tool.ngSkinHelperTool.tabInternal.version1 import assignWeights
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
-utils.checkNgSkinToolsPlugins()
-
 
 class MainTabInfo:
 
     def __init__(self, parent):
         self.tabNames = ["CopyPaste", "Build", "Mirror", "Utils"]
+        # the controllers are made when the tab is first shown or warmed on idle
         self.controlMapping = {
-            "CopyPaste": copyPaste.NgSkinControlV1(),
-            "Build": layerCreation.NgLayerControlV1,
-            "Mirror": mirrorHelper.NgControlV1(parent),
-            "Utils": convert.NgControlV1(parent)
+            "CopyPaste": copyPaste.NgSkinControlV1,
+            "Build": lambda: layerCreation.NgLayerControlV1,
+            "Mirror": lambda: mirrorHelper.NgControlV1(parent),
+            "Utils": lambda: convert.NgControlV1(parent)
         }
 
 
@@ -86,35 +85,18 @@ class MainWindow(MainLayout):
         self.mainLayout.setMenuBar(self.createMenuItems(self))
         self.layout()
 
-        # Tab information
-        self.tabInfo = {}
+        self.windowPreferences = self._applyInitialConfig()
 
-        # Create tabs dynamically
+        # Create tabs dynamically, each one is built the first time it is shown
         mainTabInfo = MainTabInfo(self)
-        for name in mainTabInfo.tabNames:
-            tabClass = globals().get("{}Tab".format(name))
-            controlClass = mainTabInfo.controlMapping.get(name)
-
-            if not tabClass and not controlClass:
-                continue
-
-            tabClass = tabClass(self.version,
-                                self.mll1,
-                                control=controlClass,
-                                mLayout=self)
-
-            self.tabInfo[name] = {"tab": tabClass, "name": name, "msg": tabClass.INFO}
-
-        # Add tabs to main tab widget
-        for name in mainTabInfo.tabNames:
-            tabData = self.tabInfo.get(name)
-            self.mainTabWidget.addTab(tabData["tab"].tabWidget, tabData["name"])
-
-        self.mainTabWidget.setCurrentIndex(tabIndex)
+        tabClasses = dict((name, globals().get("{}Tab".format(name))) for name in mainTabInfo.tabNames)
+        self.createLazyTabs(mainTabInfo.tabNames,
+                            tabClasses,
+                            mainTabInfo.controlMapping,
+                            self.mll1,
+                            tabIndex)
         self.mainTabWidget.currentChanged.connect(lambda: self.switchInfoBar(self.tabInfo))
 
-        self.windowPreferences = self._applyInitialConfig()
-
         self.selectionChangedCallback()
         self.initSelectionChangedCallback()
 
@@ -142,15 +124,24 @@ class MainWindow(MainLayout):
         except Exception as e:
             self.logger.exception("Error occurred while loading preferences: %s", e)
 
-        layerData = config.get("layerPreset")
-        presetTree = self.tabInfo["Build"]["tab"].widgets["preset"]
-        database = layerManagerBase.LayerPresetData(presetTree)
-        database.loadFile(layerData)
-
         self.setSize(config.get('width'), config.get('height'))
         self.setPosition(config.get('x'), config.get('y'))
         return config
 
+    def onTabBuilt(self, name, tab):
+        """Fill the preset tree in with the layer presets once the Build tab is built
+        """
+        if name != "Build":
+            return
+
+        presetTree = tab.widgets["preset"]
+        database = layerManagerBase.LayerPresetData(presetTree)
+
+        layerData = self.windowPreferences.get("layerPreset")
+        if layerData is None:
+            layerData = database.load(filePath=database.filePath)
+        database.loadFile(layerData)
+
     def showEvent(self, event):
         """Restore the window geometry once show events are sent just after the window system shows the window.
 
@@ -166,12 +157,23 @@ class MainWindow(MainLayout):
 
         :param event:
         """
+        if self.progressBar.isVisible():
+            # an operation is running, its progress updates let the close through: stop it instead
+            self.cancelToken.cancel()
+            event.ignore()
+            return
+
+        self.removeCallbacks()
+        utils.SKIN_VERSION_CACHE.uninstall()
+
         if self.prefPath:
-            presetTree = self.tabInfo["Build"]["tab"].widgets["preset"]
-            getter = layerManagerBase.TreeWidgetReader(presetTree)
-            layerData = getter.getAllItems()
+            # the presets can't have been edited if the Build tab was never shown
+            if self.isTabBuilt("Build"):
+                presetTree = self.getTab("Build").widgets["preset"]
+                getter = layerManagerBase.TreeWidgetReader(presetTree)
+                layerData = getter.getAllItems()
+                self.windowPreferences.update(layerPreset=layerData)
             self.windowPreferences.update(self.getWindowState())
-            self.windowPreferences.update(layerPreset=layerData)
             self.savePreferences(prefData=self.windowPreferences)
 
 
@@ -266,6 +268,7 @@ class CopyPasteTab(tabWidget.CopyPasteTabBase):
         self.settingHLayout1.addWidget(self.setting_subtract_radioButton)
         self.settingHLayout1.addWidget(self.setting_cut_radioButton)
         self.settingHLayout2.addWidget(self.setting_applyMaskWeight_CB)
+        self.settingHLayout2.addWidget(self.setting_batch_CB)
         self.settingsContentsVLayout.addLayout(self.settingHLayout1)
         self.settingsContentsVLayout.addLayout(self.settingHLayout2)
         self.settingMainVLayout.addLayout(self.settingsContentsVLayout)
@@ -472,7 +475,7 @@ class MirrorTab(tabWidget.MirrorTabBase):
             meshes = utils.getNgSkinnedMesh(mode=1)
         # all skinned-meshes mode
         elif self.mirrorOption2RadioBtn.isChecked():
-            meshes = utils.getNgSkinnedMesh(mode=2)
+            meshes = utils.getNgSkinnedMesh(mode=2, namespacePolicy=self.namespacePolicy)
 
         if not meshes:
             message = "Please select any ng-skinned mesh"
@@ -481,13 +484,20 @@ class MirrorTab(tabWidget.MirrorTabBase):
             return
 
         # mirror function
-        for mesh in meshes:
-            # the mesh needs to be selected for the mirror process
-            if self.mirrorOption2RadioBtn.isChecked():
-                cmds.select(cl=True)
-                cmds.select(mesh)
-
-            self.control.mirror(mesh, self.control.getNumberOfLayers(meshes))
+        try:
+            for mesh in meshes:
+                # the mesh needs to be selected for the mirror process
+                if self.mirrorOption2RadioBtn.isChecked():
+                    cmds.select(cl=True)
+                    cmds.select(mesh)
+
+                self.control.mirror(mesh, self.control.getNumberOfLayers(meshes))
+        except progress.CancelledError:
+            # the layers mirrored before the cancel are kept
+            log.warning("The mirror was cancelled on %s, the meshes after it aren't mirrored", mesh)
+            self.mLayout.displayBar.errorScreen("Mirror cancelled on {}".format(mesh))
+            self.timer.singleShot(3000, self.changeInfoInitScreen)
+            return
 
         self.timer.singleShot(3000, self.changeInfoInitScreen)
 
@@ -556,6 +566,7 @@ class UtilsTab(tabWidget.UtilTabBase):
     def layout(self):
         self.convertLaunchCBHLayout.addStretch()
         self.convertLaunchCBHLayout.addWidget(self.convertLaunchCB)
+        self.convertLaunchCBHLayout.addWidget(self.convertKeepSourceCB)
         self.convertLaunchCBHLayout.addStretch()
         self.convertSeparatorLine1HLayout.addWidget(self.convertSeparatorLine1)
 
@@ -589,5 +600,8 @@ class UtilsTab(tabWidget.UtilTabBase):
 def main(tabIndex=0):
     mayaWindow = OpenMayaUI.MQtUtil.mainWindow()
     mayaWrapper = pyqt_util.wrapinstance(mayaWindow)
-    view = MainWindow(tabIndex, parent=mayaWrapper)
+    with capabilities.REGISTRY.timed("build {}".format(MainWindow.TITLE_NAME)):
+        view = MainWindow(tabIndex, parent=mayaWrapper)
     view.show()
+
+    log.debug("Startup cost:\n%s", capabilities.REGISTRY.formatReport())
@@ -38,7 +38,8 @@ from PySide2.QtGui import QIcon
 import rig_tools.ui.pyside.util as pyqt_util
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import utils, common
+from rig_tools.tool.ngSkinHelperTool.util import utils, common, capabilities, layerWeights, spatialTransfer, \
+    weightClipboard, progress
 from rig_tools.tool.ngSkinHelperTool.widgets import widget, tabWidget
 from rig_tools.tool.ngSkinHelperTool.widgets.widget import MainLayout
 from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
@@ -53,18 +54,17 @@ from rig_tools.tool.ngSkinHelperTool.tabInternal.version2 import clipboardWeight
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
-utils.checkNgSkinToolsPlugins()
-
 
 class MainTabInfo:
 
     def __init__(self, parent):
         self.tabNames = ["CopyPaste", "Build", "Mirror", "Utils"]
+        # the controllers are made when the tab is first shown or warmed on idle
         self.controlMapping = {
-            "CopyPaste": copyPaste.NgSkinControlV2(),
-            "Build": layerCreation.NgLayerControlV2,
-            "Mirror": mirrorHelper.NgControlV2(parent),
-            "Utils": convert.NgControlV2(parent)
+            "CopyPaste": copyPaste.NgSkinControlV2,
+            "Build": lambda: layerCreation.NgLayerControlV2,
+            "Mirror": lambda: mirrorHelper.NgControlV2(parent),
+            "Utils": lambda: convert.NgControlV2(parent)
         }
 
 
@@ -88,35 +88,18 @@ class MainWindow(MainLayout):
         self.mainLayout.setMenuBar(self.createMenuItems(self))
         self.layout()
 
-        # Tab information
-        self.tabInfo = {}
+        self.windowPreferences = self._applyInitialConfig()
 
-        # Create tabs dynamically
+        # Create tabs dynamically, each one is built the first time it is shown
         mainTabInfo = MainTabInfo(self)
-        for name in mainTabInfo.tabNames:
-            tabClass = globals().get("{}Tab".format(name))
-            controlClass = mainTabInfo.controlMapping.get(name)
-
-            if not tabClass and not controlClass:
-                continue
-
-            tabClass = tabClass(self.version,
-                                self.mll2,
-                                control=controlClass,
-                                mLayout=self)
-
-            self.tabInfo[name] = {"tab": tabClass, "name": name, "msg": tabClass.INFO}
-
-        # Add tabs to main tab widget
-        for name in mainTabInfo.tabNames:
-            tabData = self.tabInfo.get(name)
-            self.mainTabWidget.addTab(tabData["tab"].tabWidget, tabData["name"])
-
-        self.mainTabWidget.setCurrentIndex(tabIndex)
+        tabClasses = dict((name, globals().get("{}Tab".format(name))) for name in mainTabInfo.tabNames)
+        self.createLazyTabs(mainTabInfo.tabNames,
+                            tabClasses,
+                            mainTabInfo.controlMapping,
+                            self.mll2,
+                            tabIndex)
         self.mainTabWidget.currentChanged.connect(lambda: self.switchInfoBar(self.tabInfo))
 
-        self.windowPreferences = self._applyInitialConfig()
-
         self.selectionChangedCallback()
         self.initSelectionChangedCallback()
 
@@ -144,15 +127,24 @@ class MainWindow(MainLayout):
         except Exception as e:
             self.logger.exception("Error occurred while loading preferences: %s", e)
 
-        layerData = config.get("layerPreset")
-        presetTree = self.tabInfo["Build"]["tab"].widgets["preset"]
-        database = layerManagerBase.LayerPresetData(presetTree)
-        database.loadFile(layerData)
-
         self.setSize(config.get('width'), config.get('height'))
         self.setPosition(config.get('x'), config.get('y'))
         return config
 
+    def onTabBuilt(self, name, tab):
+        """Fill the preset tree in with the layer presets once the Build tab is built
+        """
+        if name != "Build":
+            return
+
+        presetTree = tab.widgets["preset"]
+        database = layerManagerBase.LayerPresetData(presetTree)
+
+        layerData = self.windowPreferences.get("layerPreset")
+        if layerData is None:
+            layerData = database.load(filePath=database.filePath)
+        database.loadFile(layerData)
+
     def showEvent(self, event):
         """Restore the window geometry once show events are sent just after the window system shows the window.
 
@@ -168,12 +160,23 @@ class MainWindow(MainLayout):
 
         :param event:
         """
+        if self.progressBar.isVisible():
+            # an operation is running, its progress updates let the close through: stop it instead
+            self.cancelToken.cancel()
+            event.ignore()
+            return
+
+        self.removeCallbacks()
+        utils.SKIN_VERSION_CACHE.uninstall()
+
         if self.prefPath:
-            presetTree = self.tabInfo["Build"]["tab"].widgets["preset"]
-            getter = layerManagerBase.TreeWidgetReader(presetTree)
-            layerData = getter.getAllItems()
+            # the presets can't have been edited if the Build tab was never shown
+            if self.isTabBuilt("Build"):
+                presetTree = self.getTab("Build").widgets["preset"]
+                getter = layerManagerBase.TreeWidgetReader(presetTree)
+                layerData = getter.getAllItems()
+                self.windowPreferences.update(layerPreset=layerData)
             self.windowPreferences.update(self.getWindowState())
-            self.windowPreferences.update(layerPreset=layerData)
             self.savePreferences(prefData=self.windowPreferences)
 
 
@@ -267,6 +270,7 @@ class CopyPasteTab(tabWidget.CopyPasteTabBase):
         self.settingHLayout1.addWidget(self.setting_subtract_radioButton)
         self.settingHLayout1.addWidget(self.setting_cut_radioButton)
         self.settingHLayout2.addWidget(self.setting_applyMaskWeight_CB)
+        self.settingHLayout2.addWidget(self.setting_batch_CB)
         self.settingsContentsVLayout.addLayout(self.settingHLayout1)
         self.settingsContentsVLayout.addLayout(self.settingHLayout2)
         self.settingMainVLayout.addLayout(self.settingsContentsVLayout)
@@ -563,14 +567,21 @@ class MirrorTab(tabWidget.MirrorTabBase):
         itemIndex = self.leCb.currentIndex()
 
         mirrorEffects = mirrorHelper.MirrorLayerEffects(selectType, self.mLayout)
-        if itemIndex == 0:
-            num = mirrorEffects.setLayerEffects(status[0], everything=True)
-        elif itemIndex == 1:
-            num = mirrorEffects.setLayerEffects(status[0], weight=True)
-        elif itemIndex == 2:
-            num = mirrorEffects.setLayerEffects(status[0], mask=True)
-        elif itemIndex == 3:
-            num = mirrorEffects.setLayerEffects(status[0], dq=True)
+        try:
+            if itemIndex == 0:
+                num = mirrorEffects.setLayerEffects(status[0], everything=True)
+            elif itemIndex == 1:
+                num = mirrorEffects.setLayerEffects(status[0], weight=True)
+            elif itemIndex == 2:
+                num = mirrorEffects.setLayerEffects(status[0], mask=True)
+            elif itemIndex == 3:
+                num = mirrorEffects.setLayerEffects(status[0], dq=True)
+        except progress.CancelledError:
+            # the layers set before the cancel keep their new effects
+            log.warning("Setting the layer effects was cancelled, the remaining layers are left as they were")
+            self.mLayout.displayBar.errorScreen("Layer effects cancelled")
+            self.timer.singleShot(3000, self.changeInfoInitScreen)
+            return
 
         if num > 1:
             message = "{} the layer effects for each of the {} layers"
@@ -590,7 +601,7 @@ class MirrorTab(tabWidget.MirrorTabBase):
             meshes = utils.getNgSkinnedMesh(mode=1)
         # all skinned-meshes mode
         elif self.mirrorOption2RadioBtn.isChecked():
-            meshes = utils.getNgSkinnedMesh(mode=2)
+            meshes = utils.getNgSkinnedMesh(mode=2, namespacePolicy=self.namespacePolicy)
 
         if not meshes:
             message = "Please select any ng-skinned mesh"
@@ -599,13 +610,20 @@ class MirrorTab(tabWidget.MirrorTabBase):
             return
 
         # mirror function
-        for mesh in meshes:
-            # the mesh needs to be selected for the mirror process
-            if self.mirrorOption2RadioBtn.isChecked():
-                cmds.select(cl=True)
-                cmds.select(mesh)
-
-            self.control.mirror(mesh, self.control.getNumberOfLayers(meshes))
+        try:
+            for mesh in meshes:
+                # the mesh needs to be selected for the mirror process
+                if self.mirrorOption2RadioBtn.isChecked():
+                    cmds.select(cl=True)
+                    cmds.select(mesh)
+
+                self.control.mirror(mesh, self.control.getNumberOfLayers(meshes))
+        except progress.CancelledError:
+            # the layers mirrored before the cancel are kept
+            log.warning("The mirror was cancelled on %s, the meshes after it aren't mirrored", mesh)
+            self.mLayout.displayBar.errorScreen("Mirror cancelled on {}".format(mesh))
+            self.timer.singleShot(3000, self.changeInfoInitScreen)
+            return
 
         self.timer.singleShot(3000, self.changeInfoInitScreen)
 
@@ -690,6 +708,7 @@ class UtilsTab(tabWidget.UtilTabBase):
         super(UtilsTab, self).__init__(version, mll, control, mLayout)
 
         self.weightList = None
+        self.historyKey = None
 
         self.clipboardGroup = QtWidgets.QGroupBox(self.tabWidget)
         self.clipboardVLayout = QtWidgets.QVBoxLayout(self.clipboardGroup)
@@ -750,23 +769,95 @@ class UtilsTab(tabWidget.UtilTabBase):
         paste3Action = QtWidgets.QAction("Paste weights (subtract from existing)", self.cbMenu)
         paste3Action.triggered.connect(lambda: self.clipboardAction("pasteSubtract", mode=1))
         self.cbMenu.addAction(paste3Action)
+        paste4Action = QtWidgets.QAction("Paste weights (multiply existing)", self.cbMenu)
+        paste4Action.triggered.connect(lambda: self.clipboardAction("pasteMultiply", mode=1))
+        self.cbMenu.addAction(paste4Action)
+        paste5Action = QtWidgets.QAction("Scale weights of copied influences...", self.cbMenu)
+        paste5Action.triggered.connect(lambda: self.clipboardAction("pasteScale", mode=1))
+        self.cbMenu.addAction(paste5Action)
+        self.cbMenu.addSeparator()
+        self.cbChannelsAction = QtWidgets.QAction("Include mask and dq weights", self.cbMenu)
+        self.cbChannelsAction.setCheckable(True)
+        self.cbMenu.addAction(self.cbChannelsAction)
+        self.cbByOrderAction = QtWidgets.QAction("Paste by selection order", self.cbMenu)
+        self.cbByOrderAction.setCheckable(True)
+        self.cbByOrderAction.setToolTip("Match the copied influences to the selected ones instead of by name")
+        self.cbMenu.addAction(self.cbByOrderAction)
+
+        # pasting to another topology resamples the weights by the copied vertex positions,
+        # the positions are only copied while a transfer is checked
+        self.cbMenu.addSeparator()
+        self.cbTransferGroup = QtWidgets.QActionGroup(self.cbMenu)
+        self.cbTransferGroup.setExclusive(True)
+        for label, transfer in (("Same vertex order", None),
+                                ("Transfer by closest point", spatialTransfer.CLOSEST_POINT),
+                                ("Transfer by closest triangle", spatialTransfer.BARYCENTRIC)):
+            transferAction = QtWidgets.QAction(label, self.cbTransferGroup)
+            transferAction.setCheckable(True)
+            transferAction.setChecked(transfer is None)
+            transferAction.setData(transfer)
+            self.cbMenu.addAction(transferAction)
+
+        # earlier copies of the session can be pasted without copying them again
+        self.cbMenu.addSeparator()
+        self.cbHistoryMenu = self.cbMenu.addMenu("Paste from history")
+        self.cbHistoryMenu.aboutToShow.connect(self.updateHistoryMenu)
+
+    def updateHistoryMenu(self):
+        self.cbHistoryMenu.clear()
+        historyGroup = QtWidgets.QActionGroup(self.cbHistoryMenu)
+        historyGroup.setExclusive(True)
+
+        entries = [(None, "Latest copy")]
+        entries += [(entry.key, entry.label()) for entry in weightClipboard.CLIPBOARD_HISTORY.entries()]
+        for key, label in entries:
+            historyAction = QtWidgets.QAction(label, historyGroup)
+            historyAction.setCheckable(True)
+            historyAction.setChecked(key == self.historyKey)
+            historyAction.triggered.connect(lambda checked=False, key=key: self.setHistoryKey(key))
+            self.cbHistoryMenu.addAction(historyAction)
+
+        self.cbHistoryMenu.addSeparator()
+        clearAction = self.cbHistoryMenu.addAction("Clear history")
+        clearAction.triggered.connect(self.clearHistory)
+
+    def setHistoryKey(self, key):
+        self.historyKey = key
+
+    def clearHistory(self):
+        weightClipboard.CLIPBOARD_HISTORY.clear()
+        self.historyKey = None
 
     def clipboardAction(self, operation, mode=0):
         clip = clipboardWeights.ClipboardOperation()
+        channels = layerWeights.CHANNELS if self.cbChannelsAction.isChecked() else ()
+        mapping = clip.BY_ORDER if self.cbByOrderAction.isChecked() else clip.BY_NAME
+        transfer = self.cbTransferGroup.checkedAction().data()
         if mode == 0:
-            if operation is "copy":
-                clip.copyWeights(operation)
-            elif operation is "cut":
-                clip.copyWeights(operation)
-            self.weightList = clip.weightClip
+            if operation in ("copy", "cut"):
+                clip.copyWeights(operation, channels, transfer=transfer)
+            # the disk clipboard is pasted unless it couldn't be written
+            self.weightList = None if clip.storedOnDisk else clip.weightClip
+            self.historyKey = None
 
         elif mode == 1:
-            if operation is clip.REPLACE:
-                clip.pasteWeights(clip.REPLACE, self.weightList)
-            elif operation is clip.ADD:
-                clip.pasteWeights(clip.ADD, self.weightList)
-            elif operation is clip.SUBTRACT:
-                clip.pasteWeights(clip.SUBTRACT, self.weightList)
+            weightClip = self.weightList
+            if self.historyKey is not None:
+                weightClip = weightClipboard.CLIPBOARD_HISTORY.get(self.historyKey)
+
+            if operation not in clip.OPERATIONS:
+                return
+
+            factor = 1.0
+            if operation == clip.SCALE:
+                factor, accepted = QtWidgets.QInputDialog.getDouble(self.tabWidget, "Scale weights",
+                                                                    "Factor:", 1.0, 0.0, 100.0, 3)
+                if not accepted:
+                    return
+                # only the weights of the copied influences are scaled
+                channels = ()
+
+            clip.pasteWeights(operation, weightClip, mapping, channels=channels, transfer=transfer, factor=factor)
 
     def setSignals(self):
         """Set each of signals
@@ -786,6 +877,7 @@ class UtilsTab(tabWidget.UtilTabBase):
     def layout(self):
         self.convertLaunchCBHLayout.addStretch()
         self.convertLaunchCBHLayout.addWidget(self.convertLaunchCB)
+        self.convertLaunchCBHLayout.addWidget(self.convertKeepSourceCB)
         self.convertLaunchCBHLayout.addStretch()
         self.convertSeparatorLine1HLayout.addWidget(self.convertSeparatorLine1)
 
@@ -820,5 +912,8 @@ class UtilsTab(tabWidget.UtilTabBase):
 def main(tabIndex=0):
     mayaWindow = OpenMayaUI.MQtUtil.mainWindow()
     mayaWrapper = pyqt_util.wrapinstance(mayaWindow)
-    view = MainWindow(tabIndex, parent=mayaWrapper)
+    with capabilities.REGISTRY.timed("build {}".format(MainWindow.TITLE_NAME)):
+        view = MainWindow(tabIndex, parent=mayaWrapper)
     view.showUI()
+
+    log.debug("Startup cost:\n%s", capabilities.REGISTRY.formatReport())
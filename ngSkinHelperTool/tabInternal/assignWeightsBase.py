@@ -26,9 +26,6 @@ import maya.cmds as cmds
 import maya.mel as mel
 from maya.api import OpenMaya
 
-# Third module
-from ngSkinTools2.api import target_info, layers
-
 # Custom module
 from rig_tools.core import geometry
 from rig_tools.util import argument
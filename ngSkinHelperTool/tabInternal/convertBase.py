@@ -22,21 +22,21 @@
 """
 # Build-in
 import logging
+import shutil
+import tempfile
 
 # Third party
 from maya import cmds
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import layerSnapshot, skinVerification, progress
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 
 # ngSkinTools1 modules
-if utils.IS_NG1:
-    import ngSkinTools.ui.events
-    import ngSkinTools.mllInterface
+ngSkinTools = LazyModule("ngSkinTools", submodules=["ngSkinTools.ui.events", "ngSkinTools.mllInterface"])
 
 # ngSkinTools2 modules
-if utils.IS_NG2:
-    from ngSkinTools2.api.session import session
+session = LazyModule("ngSkinTools2.api.session", attribute="session")
 
 # ----------------------------------------------------------------- GLOBALS --#
 logger = logging.getLogger("import v1")
@@ -48,23 +48,25 @@ class ConvertBase(object):
     DOCK_NAME_V1 = 'ngSkinToolsMainWindow_dock'
     DOCK_NAME_V2 = 'ngSkinTools2_mainWindow'
 
-    def __init__(self, parent=None, target=None):
-        self.progressStatus = False
+    # largest change of a skinCluster weight that still lets the cleanup run
+    TOLERANCE = skinVerification.DEFAULT_TOLERANCE
+
+    def __init__(self, parent=None, target=None, reporter=None):
         self.parent = parent
         self.target = target
 
+        # the progress goes to the progress bar of the parent, nowhere when headless
+        self.reporter = reporter or progress.getReporter(parent)
+
         self.layerIdMap = {0: None}
+        self.verification = None
 
-    def isProgressStatus(self):
-        if self.progressStatus:
-            return False
-        return True
+        # keep the layers of this version, the next conversion only writes the layers changed since,
+        # without them there's no next conversion from the same layers and nothing is saved for it
+        self.keepSource = False
 
-    def toggleVisibilityInfomationBar(self):
-        if self.progressStatus:
-            self.parent.progressBar.setVisible(True)
-        else:
-            self.parent.progressBar.setVisible(False)
+        # the import of convertProcess, saved by saveImportState once the source layers are known to stay
+        self.importState = None
 
     def isWindowExist(self, dockName):
         if not cmds.workspaceControl(dockName, q=True, exists=True):
@@ -73,24 +75,22 @@ class ConvertBase(object):
             return True
 
     def preProcess(self, mesh):
-        self.progressStatus = self.isProgressStatus()
-
         # prepare for the convert process
         self.target = mesh
 
-        # show the progress bar
-        self.toggleVisibilityInfomationBar()
+        # the layers are counted by convertProcess
+        self.reporter.start(0, "convert {}".format(mesh))
 
-        # set value
-        self.parent.progressBar.setValue(0)
+    def postProcess(self, cleanup=True):
+        self.reporter.finish()
 
-    def postProcess(self):
-        # hide information bar
-        self.progressStatus = False
-        self.toggleVisibilityInfomationBar()
+        # delete a ngSkinData, kept when the conversion didn't finish
+        if cleanup:
+            self.cleanup()
 
-        # delete a ngSkinData
-        self.cleanup()
+        # no ngSkinTools window to update without a UI, e.g. batchConvert under mayapy
+        if self.parent is None:
+            return
 
         if self.isWindowExist(self.DOCK_NAME_V1):
             # update targe selection for one
@@ -128,13 +128,114 @@ class ConvertBase(object):
     def cleanup(self):
         pass
 
-    def convertProcess(self):
+    def getStackReader(self):
+        """Get the reader of the layers of this version, see layerStack
+
+        :return: StackReaderV1 or StackReaderV2
+        """
         pass
 
-    def convert(self, mesh):
-        self.preProcess(mesh)
+    def getStackWriter(self):
+        """Get the writer of the layers of the other version, see layerStack
+
+        :return: StackWriterV1 or StackWriterV2
+        """
+        pass
+
+    def _advanceLayer(self, record):
+        self.reporter.advance()
 
-        self.convertProcess()
+    def convertProcess(self):
+        """Export the layers to a snapshot, verify it, then import it with the other version.
+        Nothing is written to the mesh until the snapshot is complete and verified,
+        a layer unchanged on both sides since the last conversion isn't saved or written again.
+        An import that fails or is cancelled deletes the layers it made, see StackWriterBase.write().
+        The state of the import is kept for saveImportState().
+
+        :return: bool
+            True when the layers are converted
+        """
+        directory = tempfile.mkdtemp(prefix="ngSkinHelperTool_snapshot_")
+        try:
+            reader = self.getStackReader()
+            writer = self.getStackWriter()
+            # each layer is exported then imported
+            self.reporter.setTotal(2 * len(reader.listLayers(self.target)))
+
+            # the layers written by the last conversion from this version are updated in place,
+            # the ones nobody edited on the target since are left out of the snapshot
+            previous = layerSnapshot.readImportState(self.target, str(self))
+            unchanged, fingerprints = layerSnapshot.findIntactLayers(writer.getReader(), self.target, previous)
+
+            snapshot = layerSnapshot.exportStack(reader, self.target, directory, str(self),
+                                                 progressCallback=self._advanceLayer,
+                                                 unchanged=unchanged)
+            numberOfWeights = snapshot.verify()
+            logger.debug("Verified %s weights of %s layers on %s", numberOfWeights, len(snapshot), self.target)
+
+            self.layerIdMap = layerSnapshot.importStack(snapshot, writer, self.target,
+                                                        progressCallback=self._advanceLayer,
+                                                        previous=previous)
+            # only the manifest of the snapshot is read from here on
+            self.importState = (snapshot, self.layerIdMap, writer.getReader(), fingerprints)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        return True
 
-        self.postProcess()
+    def saveImportState(self, cleanup):
+        """Save the import of convertProcess for the next conversion, while the source layers are kept.
+        The written layers are read back for it, which only pays off with "Keep source layers":
+        the default cleanup deletes the source layers and the state of this version is dropped.
+
+        :param cleanup: bool
+            True when the source layers are deleted
+        """
+        importState, self.importState = self.importState, None
+        if cleanup:
+            layerSnapshot.clearImportState(self.target, str(self))
+        elif importState is not None:
+            snapshot, layerIdMap, reader, fingerprints = importState
+            layerSnapshot.writeImportState(self.target, str(self), snapshot, layerIdMap, reader, fingerprints)
+
+    def verify(self, before):
+        """Compare the skinCluster weights with the ones read before the conversion
+
+        :param before: SkinWeights
+        :return: bool
+            True when no weight moved more than the tolerance
+        """
+        after = skinVerification.readSkinWeights(self.target)
+        if before is None or after is None:
+            reason = "no skinCluster {} the conversion".format("before" if before is None else "after")
+            self.verification = skinVerification.VerificationResult.unverified(self.target, self.TOLERANCE, reason)
+            logger.warning("%s has %s, the ng data is kept", self.target, reason)
+            return False
+
+        self.verification = skinVerification.compareSkinWeights(self.target, before, after, self.TOLERANCE)
+        if not self.verification.passed:
+            logger.warning("The conversion changed the deformation, the ng data is kept\n%s",
+                           self.verification.formatReport())
+            return False
 
+        logger.debug(self.verification.formatReport())
+        return True
+
+    def convert(self, mesh):
+        self.preProcess(mesh)
+        self.verification = None
+        self.importState = None
+
+        converted = False
+        try:
+            before = skinVerification.readSkinWeights(self.target)
+            converted = self.convertProcess() is True and self.verify(before)
+        except progress.CancelledError:
+            logger.warning("The conversion of %s was cancelled, the ng data is kept", mesh)
+        finally:
+            cleanup = converted and not self.keepSource
+            try:
+                self.saveImportState(cleanup)
+            finally:
+                self.postProcess(cleanup=cleanup)
+        return converted
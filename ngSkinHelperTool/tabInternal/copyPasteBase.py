@@ -34,20 +34,120 @@
 :Revisions:
 """
 # Built-in
-from builtins import zip
+from collections import namedtuple
+import contextlib
 import logging
 
 # Third Party
 from maya import cmds
+import numpy as np
 
 # Reelfx modules
+from rig_tools.util import context
 
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, layerWeights, remapCompiler
 
 
 # ----------------------------------------------------------------- GLOBALS --#
 log = logging.getLogger(__name__)
 
+# weights closer than this are treated as unchanged by the preview
+PREVIEW_TOLERANCE = 1e-5
+
+InfluenceDiff = namedtuple("InfluenceDiff",
+                           ["influence", "name", "verticesChanged", "maxDelta", "sumBefore", "sumAfter"])
+
+
+def diffInfluence(influence, name, before, after):
+    """Compare the weights of an influence before and after a paste
+
+    :param influence: int
+    :param name: str
+    :param before: numpy.ndarray
+    :param after: numpy.ndarray
+    :return: InfluenceDiff
+    """
+    delta = np.abs(after - before)
+    return InfluenceDiff(influence,
+                         name,
+                         int(np.count_nonzero(delta > PREVIEW_TOLERANCE)),
+                         float(delta.max()) if len(delta) else 0.0,
+                         float(before.sum()),
+                         float(after.sum()))
+
+
+class PastePreview(object):
+
+    def __init__(self, operation, pasted=None, cleared=None, missingInfluences=None):
+        """Effect of a copy paste computed without touching the layers.
+
+        Args:
+            operation (str): One of ['replace', 'add', 'subtract', 'cut'].
+            pasted (list): InfluenceDiff of each destination influence.
+            cleared (list): InfluenceDiff of each source influence emptied by a cut.
+            missingInfluences (list): Destination names that are not influences of the mesh.
+        """
+        self.operation = operation
+        self.pasted = pasted or []
+        self.cleared = cleared or []
+        self.missingInfluences = missingInfluences or []
+
+    def __repr__(self):
+        return "PastePreview({}, {} influences, {} vertices changed)".format(self.operation,
+                                                                         len(self.pasted),
+                                                                         self.verticesChanged())
+
+    def verticesChanged(self):
+        return sum(diff.verticesChanged for diff in self.pasted + self.cleared)
+
+    def changedInfluences(self):
+        return [diff for diff in self.pasted + self.cleared if diff.verticesChanged]
+
+    def formatReport(self):
+        """Make a readable report, the most changed influences first
+
+        :return: str
+        """
+        lines = ["{} preview: {} influences, {} vertex weights changed".format(self.operation,
+                                                                              len(self.pasted),
+                                                                              self.verticesChanged())]
+
+        for title, diffs in (("pasted", self.pasted), ("cleared", self.cleared)):
+            for diff in sorted(diffs, key=lambda d: d.verticesChanged, reverse=True):
+                lines.append("  {} {:<30} vertices: {:>6}  max delta: {:.3f}  sum: {:.2f} -> {:.2f}".format(
+                    title, diff.name, diff.verticesChanged, diff.maxDelta, diff.sumBefore, diff.sumAfter))
+
+        for name in self.missingInfluences:
+            lines.append("  missing {}".format(name))
+        return "\n".join(lines)
+
+
+class PreviewLayerCache(object):
+    """Layers read by the preview, kept while the preview is shown.
+
+    An edit of the search/replace table only changes the mapping, each layer is read once per mesh
+    until the cache is cleared by a write, a new layer selection or the preview being turned off.
+    """
+
+    def __init__(self):
+        self._layers = {}
+
+    def clear(self):
+        self._layers = {}
+
+    def get(self, adapter, mesh, layerId):
+        """Get every used influence and the mask of the layer, read on the first call
+
+        :param adapter: WeightsAdapter
+        :param mesh: str
+        :param layerId: int
+        :return: SparseLayerWeights
+        """
+        key = (mesh, layerId)
+        if key not in self._layers:
+            self._layers[key] = adapter.load(mesh, layerId, channels=(layerWeights.MASK,), sparse=True)
+        return self._layers[key]
+
 
 class CopyPasteInfluence(object):
 
@@ -71,6 +171,10 @@ class CopyPasteInfluence(object):
                 ex: [["_L", "_R"], ["1", "2"]]
                     result: joint1_L  >>> joint2_R
 
+                regex tokens start with "re:" and "*" captures a part of the name,
+                see remapCompiler for the syntax.
+                ex: [["re:^(\\w+)_L$", "\\1_R"], ["*_01_*", "*_02_*"]]
+
                 you can put None into the searchReplace list if you don't want to replace name
             mask (bool):
                 Copying and paste a mask weights or not.
@@ -90,21 +194,218 @@ class CopyPasteInfluence(object):
         self.missingInfluences = []
         self.numberOfMatched = 0
 
+        self.remapCache = remapCompiler.RemapCache()
+        self.previewCache = PreviewLayerCache()
+        self._influenceData = None
+        self._influenceDataKey = None
+
     def getInfluenceData(self):
         pass
 
+    def getCachedInfluenceData(self):
+        """Get the influence data of the mesh, queried again only after the scene changed
+
+        :return: tuple
+            (influence name of each index, influence index of each name)
+        """
+        cache = utils.SKIN_VERSION_CACHE
+        key = (self.mesh, cache.generation)
+
+        # nothing tells the data is stale without the scene callbacks
+        if not cache.isInstalled() or key != self._influenceDataKey:
+            self._influenceData = self.getInfluenceData()
+            self._influenceDataKey = key
+        return self._influenceData
+
     def getLayerData(self):
         pass
 
     def getUsedInfluenceData(self, indenKey, nameKey):
         pass
 
-    def copyWeights(self, srcInfID):
+    def getWeightsAdapter(self):
         pass
 
-    def pasteWeights(self, weightClip, maskWeight, dstInfID):
+    @contextlib.contextmanager
+    def suspendUpdates(self):
+        """Hold the plugin updates of the mesh back while the block runs
+        """
+        yield
+
+    def emitInfluencesChanged(self):
         pass
 
+    def combineWeights(self, srcWeights, dstWeights, remapData):
+        """Apply the paste operation to every mapped influence, one destination at a time
+
+        :param srcWeights: SparseLayerWeights
+            weights of the source influences
+        :param dstWeights: SparseLayerWeights
+            weights of the destination influences
+        :param remapData: dict
+            destination influence index of each source influence index
+        :return: SparseLayerWeights
+            the new destination weights
+        """
+        sources = {}
+        for srcID in srcWeights.influences:
+            sources.setdefault(remapData[srcID], []).append(srcID)
+
+        result = layerWeights.SparseLayerWeights(dstWeights.numberOfVertices, mask=srcWeights.mask)
+        for dstID in dstWeights.influences:
+            if self.operation in ("add", "subtract"):
+                # several sources mapped to one destination add up
+                weights = dstWeights.denseInfluence(dstID)
+                sign = 1.0 if self.operation == "add" else -1.0
+                for srcID in sources[dstID]:
+                    indexes, values = srcWeights.getSparse(srcID)
+                    weights[indexes] += sign * values
+            else:
+                # replace and cut, the last source mapped to a destination wins
+                weights = srcWeights.denseInfluence(sources[dstID][-1])
+
+            result.setDense(dstID, np.clip(weights, 0.0, 1.0))
+        return result
+
+    def loadSourceWeights(self, influences=None):
+        """Read the source layer with its mask, only the non-zero weights are kept
+
+        :param influences: list
+            influence indexes to read, the influences used by the layer if None
+        :return: SparseLayerWeights
+        """
+        adapter = self.getWeightsAdapter()
+        return adapter.load(self.mesh, self.srcLayerID, influences, channels=(layerWeights.MASK,), sparse=True)
+
+    def computePaste(self, remapData, srcWeights=None, layerCache=None):
+        """Read the mapped influences and compute the destination weights in memory
+
+        :param remapData: dict
+            destination influence index of each source influence index
+        :param srcWeights: SparseLayerWeights
+            the source layer read beforehand, read here if None
+        :param layerCache: PreviewLayerCache
+            take both layers from the cache instead of reading them
+        :return: tuple
+            (source weights, destination weights before, destination weights after)
+        """
+        srcIDs = list(remapData.keys())
+        dstIDs = []
+        for srcID in srcIDs:
+            if remapData[srcID] not in dstIDs:
+                dstIDs.append(remapData[srcID])
+
+        adapter = self.getWeightsAdapter()
+        maskChannels = (layerWeights.MASK,) if self.mask else ()
+
+        # only the non-zero weights are kept until they are written
+        if layerCache is not None:
+            srcWeights = layerCache.get(adapter, self.mesh, self.srcLayerID).subset(srcIDs)
+            if not self.mask:
+                srcWeights.mask = None
+            dstBefore = layerCache.get(adapter, self.mesh, self.dstLayerID).subset(dstIDs)
+            dstBefore.mask = None
+        elif srcWeights is None:
+            srcWeights = adapter.load(self.mesh, self.srcLayerID, srcIDs, channels=maskChannels, sparse=True)
+            dstBefore = adapter.load(self.mesh, self.dstLayerID, dstIDs, channels=(), sparse=True)
+        else:
+            srcWeights = srcWeights.subset(srcIDs)
+            dstBefore = adapter.load(self.mesh, self.dstLayerID, dstIDs, channels=(), sparse=True)
+        dstAfter = self.combineWeights(srcWeights, dstBefore, remapData)
+        return srcWeights, dstBefore, dstAfter
+
+    def preview(self, remapData=None):
+        """Compute the effect of the copy paste without writing to the layers or the undo queue
+
+        :param remapData: dict
+            destination influence index of each source influence index, made from the current settings if None
+        :return: PastePreview
+        """
+        indentKey, nameKey = self.getCachedInfluenceData()
+        if remapData is None:
+            infNames, infIDs = self.getUsedInfluenceData(indentKey, nameKey)
+            remapData = self.storeRemapData(infIDs, infNames, nameKey)
+
+        result = PastePreview(self.operation, missingInfluences=list(self.missingInfluences))
+        if not remapData:
+            return result
+
+        srcWeights, dstBefore, dstAfter = self.computePaste(remapData, layerCache=self.previewCache)
+
+        for dstID in dstAfter.influences:
+            result.pasted.append(diffInfluence(dstID,
+                                               indentKey.get(dstID, str(dstID)),
+                                               dstBefore.denseInfluence(dstID),
+                                               dstAfter.denseInfluence(dstID)))
+
+        if self.operation == "cut":
+            for srcID in srcWeights.influences:
+                # a source pasted onto itself on the same layer isn't emptied
+                if self.srcLayerID == self.dstLayerID and srcID in dstAfter:
+                    continue
+                before = srcWeights.denseInfluence(srcID)
+                result.cleared.append(diffInfluence(srcID,
+                                                    indentKey.get(srcID, str(srcID)),
+                                                    before,
+                                                    np.zeros_like(before)))
+        return result
+
+    def copyPasteWeights(self, remapData, progressCallback=None, srcWeights=None):
+        """Copy every mapped influence from the source layer and paste them to the destination layer in one pass.
+        Each influence is read and written once, and the mask is applied once.
+
+        :param remapData: dict
+            destination influence index of each source influence index
+        :param progressCallback: callable
+            called with the progress in percent
+        :param srcWeights: SparseLayerWeights
+            the source layer read beforehand, read here if None
+        """
+        if not remapData:
+            return
+
+        srcWeights, _, dstWeights = self.computePaste(remapData, srcWeights)
+        self.writePaste(srcWeights.influences, dstWeights, progressCallback)
+
+    def writePaste(self, srcIDs, dstWeights, progressCallback=None):
+        """Write the computed destination weights, and empty the sources of a cut
+
+        :param srcIDs: list
+            the source influence indexes
+        :param dstWeights: SparseLayerWeights
+            the destination weights computed by computePaste
+        :param progressCallback: callable
+            called with the progress in percent
+        """
+        dstIDs = dstWeights.influences
+
+        adapter = self.getWeightsAdapter()
+        maskChannels = (layerWeights.MASK,) if self.mask else ()
+
+        numberOfCut = len(srcIDs) if self.operation == "cut" else 0
+        numberOfOperation = float(numberOfCut + len(dstIDs))
+
+        reportCut = reportPaste = None
+        if progressCallback:
+            reportCut = lambda i, total: progressCallback(100.0 * i / numberOfOperation)
+            reportPaste = lambda i, total: progressCallback(100.0 * (numberOfCut + i) / numberOfOperation)
+
+        with context.UndoContext():
+            # cleared first so a destination on the same layer keeps its pasted weights
+            if numberOfCut:
+                cleared = layerWeights.SparseLayerWeights(dstWeights.numberOfVertices, srcIDs)
+                adapter.store(self.mesh, self.srcLayerID, cleared, channels=(), progressCallback=reportCut)
+
+            # apply mask weighs if checked, the mask is written once after the influences
+            adapter.store(self.mesh, self.dstLayerID, dstWeights, channels=maskChannels,
+                          progressCallback=reportPaste)
+
+        # the layers the preview read are stale
+        self.previewCache.clear()
+
+        # update all influences in the list
+        self.emitInfluencesChanged()
+
     def setSelectedGeo(self, mesh=None):
         if mesh is None:
             sel = cmds.ls(selection=True, type="transform")
@@ -127,17 +428,10 @@ class CopyPasteInfluence(object):
         return layerID[0], layerID[1]
 
     def _replaceName(self, target):
-        if not self.searchReplace:
-            return None
-
-        for token in self.searchReplace:
-            if token is None:
-                return target
-            target = target.replace(*token)
-        return target
+        return remapCompiler.compileRemap(self.searchReplace)(target)
 
     def getNumberMatchedJoint(self, versionObj):
-        indentKey, nameKey = versionObj.getInfluenceData()
+        indentKey, nameKey = versionObj.getCachedInfluenceData()
         infNames, infIDs = versionObj.getUsedInfluenceData(indentKey, nameKey)
         remapData = versionObj.storeRemapData(infIDs, infNames, nameKey)
         return len(remapData.values())
@@ -155,22 +449,10 @@ class CopyPasteInfluence(object):
         self.dstLayerID = layers[1]
 
     def storeRemapData(self, infIdList, infNameList, nameKey):
-        remapData = {}
-        for usedSrcIdInt, usedSrcJnt in zip(infIdList, infNameList):
-            dstJnt = self._replaceName(usedSrcJnt)
-
-            if not dstJnt:
-                continue
-
-            try:
-                dstJntID = nameKey[dstJnt]
-                if dstJntID:
-                    self.numberOfMatched += 1
-
-            except KeyError:
-                log.warning("%s is not an influence of %s", dstJnt, self.mesh)
-                self.missingInfluences.append(dstJnt)
-                continue
-            remapData[usedSrcIdInt] = dstJntID
-        self.searchReplace = None
+        remapData, missing = self.remapCache.get(self.searchReplace, infIdList, infNameList, nameKey)
+        if missing:
+            log.warning("%d names are not influences of %s: %s", len(missing), self.mesh, ", ".join(missing))
+
+        self.missingInfluences = missing
+        self.numberOfMatched = len(remapData)
         return remapData
@@ -0,0 +1,154 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Runs the same copy paste settings on many meshes, e.g. the LOD and outfit variants of a character.
+
+        Features:
+        - The source and destination layers are looked up by name on each mesh.
+        - Meshes sharing a skeleton reuse the compiled remap table of the first one.
+        - Each mesh gets its own suspended updates and undo chunk.
+        - A summary line per mesh tells what was done, skipped or failed.
+
+:Revisions:
+"""
+# Built-in
+from collections import namedtuple
+import logging
+import time
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+MeshResult = namedtuple("MeshResult", ["mesh", "status", "matched", "missing", "seconds", "message"])
+
+
+class CopyPasteBatch(object):
+
+    def __init__(self, control, meshes, layerNames, searchReplace=None, operation="replace", mask=True):
+        """Copy paste job over several meshes.
+
+        # copy the arm layer to its backup on every selected variant
+        batch = CopyPasteBatch(NgSkinControlV2(),
+                               meshes=["body_LOD0", "body_LOD1", "body_LOD2"],
+                               layerNames=["Arm", "ArmBackup"],
+                               searchReplace=[None],
+                               operation="replace")
+        batch.run()
+        print(batch.formatSummary())
+
+        Args:
+            control (CopyPasteInfluence): The control of the ngSkinTools version of the meshes.
+            meshes (list): Names of the skinned meshes.
+            layerNames (list): Both source and destination layer names.
+            searchReplace (list): Token to replace a joint name, the same as CopyPasteInfluence.
+            mask (bool): Copying and paste a mask weights or not.
+            operation (str): One of the names of paste operation mode from ['replace', 'add', 'subtract', 'cut']
+        """
+        self.control = control
+        self.meshes = list(meshes or [])
+        self.layerNames = layerNames
+        self.searchReplace = searchReplace
+        self.operation = operation
+        self.mask = mask
+
+        self.results = []
+
+    def run(self, progressCallback=None):
+        """Run the copy paste on every mesh, a failing mesh doesn't stop the others
+
+        :param progressCallback: callable
+            called with the progress in percent
+        :return: list
+            a list of MeshResult
+        """
+        self.results = []
+        numberOfMeshes = float(len(self.meshes))
+
+        for i, mesh in enumerate(self.meshes, 1):
+            start = time.time()
+            try:
+                status, matched, missing, message = self._runMesh(mesh)
+            except Exception as e:
+                log.exception("Copy paste failed on %s", mesh)
+                status, matched, missing, message = FAILED, 0, [], str(e)
+
+            self.results.append(MeshResult(mesh, status, matched, missing, time.time() - start, message))
+
+            if progressCallback:
+                progressCallback(100.0 * i / numberOfMeshes)
+
+        return self.results
+
+    def _runMesh(self, mesh):
+        control = self.control
+        control.setSelectedGeo(mesh)
+
+        layerDict = control.getLayerData()
+        srcName, dstName = self.layerNames
+        for layerName in (srcName, dstName):
+            if layerName not in layerDict:
+                return SKIPPED, 0, [], "no layer named {}".format(layerName)
+
+        control.setData({'mesh': mesh,
+                         'layer': (layerDict[srcName], layerDict[dstName]),
+                         'method': self.operation,
+                         'token': self.searchReplace,
+                         'mask': self.mask})
+
+        # the remap is cached per influence set, variants sharing a skeleton compute it once
+        indentKey, nameKey = control.getCachedInfluenceData()
+        infNames, infIDs = control.getUsedInfluenceData(indentKey, nameKey)
+        remapData = control.storeRemapData(infIDs, infNames, nameKey)
+        missing = list(control.missingInfluences)
+
+        if not remapData:
+            return SKIPPED, 0, missing, "no matched influences"
+
+        with control.suspendUpdates():
+            control.copyPasteWeights(remapData)
+
+        return DONE, len(remapData), missing, ""
+
+    def succeeded(self):
+        return [result for result in self.results if result.status == DONE]
+
+    def formatSummary(self):
+        """Make a readable summary with a line per mesh
+
+        :return: str
+        """
+        lines = []
+        for result in self.results:
+            line = "{:<8} {:<30} {:>4} influences  {:>6.2f} sec".format(result.status,
+                                                                       result.mesh,
+                                                                       result.matched,
+                                                                       result.seconds)
+            if result.missing:
+                line += "  missing: {}".format(", ".join(result.missing))
+            if result.message:
+                line += "  ({})".format(result.message)
+            lines.append(line)
+
+        lines.append("{} of {} meshes done".format(len(self.succeeded()), len(self.results)))
+        return "\n".join(lines)
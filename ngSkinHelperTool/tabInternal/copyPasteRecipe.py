@@ -0,0 +1,263 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Queues several layer pair copy pastes on a mesh as a recipe, e.g. the left and right
+        side backups of a character that are otherwise done one by one in the CopyPaste tab.
+
+        Features:
+        - A recipe is an ordered list of steps (source layer, destination layer, tokens, operation, mask)
+          saved as a json file.
+        - A source layer feeding several steps is read once, and read again only after a step wrote to it.
+        - Every step is timed by its read, compute and write phases.
+
+:Revisions:
+"""
+# Built-in
+from collections import namedtuple
+import json
+import logging
+import time
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+RecipeStep = namedtuple("RecipeStep", ["source", "destination", "token", "method", "mask"])
+StepTiming = namedtuple("StepTiming", ["index", "source", "destination", "status", "matched",
+                                       "read", "compute", "write", "message"])
+
+
+class CopyPasteRecipe(object):
+
+    def __init__(self, steps=None):
+        """Ordered copy paste steps between the layers of a mesh, the layers are given by name.
+
+        # back up both arms, then mirror the left arm to the right arm layer
+        recipe = CopyPasteRecipe()
+        recipe.addStep("Arm_L", "ArmBackup_L")
+        recipe.addStep("Arm_R", "ArmBackup_R")
+        recipe.addStep("Arm_L", "Arm_R", token=[["_L_", "_R_"]], method="replace")
+        recipe.save("C:/temp/armRecipe.json")
+
+        Args:
+            steps (list): A list of RecipeStep.
+        """
+        self.steps = []
+        for step in steps or []:
+            self.addStep(*step)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def addStep(self, source, destination, token=None, method="replace", mask=True):
+        """Add a step at the end of the recipe
+
+        :param source: str
+            source layer name
+        :param destination: str
+            destination layer name
+        :param token: list
+            pairs of search and replace strings, the same as the search/replace table
+        :param method: str
+            one of 'replace', 'add', 'subtract', 'cut'
+        :param mask: bool
+            copying and paste a mask weights or not
+        :return: RecipeStep
+        """
+        step = RecipeStep(source, destination, list(token or [None]), method, bool(mask))
+        self.steps.append(step)
+        return step
+
+    def sourceUses(self):
+        """Count the steps each source layer feeds
+
+        :return: dict
+        """
+        uses = {}
+        for step in self.steps:
+            uses[step.source] = uses.get(step.source, 0) + 1
+        return uses
+
+    def toData(self):
+        return {"steps": [step._asdict() for step in self.steps]}
+
+    @classmethod
+    def fromData(cls, data):
+        recipe = cls()
+        for step in data.get("steps", []):
+            recipe.addStep(step["source"],
+                           step["destination"],
+                           step.get("token"),
+                           step.get("method", "replace"),
+                           step.get("mask", True))
+        return recipe
+
+    def save(self, filePath):
+        with open(filePath, "w") as f:
+            json.dump(self.toData(), f, indent=4)
+
+    @classmethod
+    def load(cls, filePath):
+        with open(filePath, "r") as f:
+            return cls.fromData(json.load(f))
+
+
+class RecipeRunner(object):
+
+    def __init__(self, control, recipe):
+        """Runs a recipe on a mesh with the control of its ngSkinTools version.
+
+        runner = RecipeRunner(NgSkinControlV2(), CopyPasteRecipe.load("C:/temp/armRecipe.json"))
+        runner.run("body_GEO")
+        print(runner.formatReport())
+
+        Args:
+            control (CopyPasteInfluence): The control of the ngSkinTools version of the mesh.
+            recipe (CopyPasteRecipe): The steps to run.
+        """
+        self.control = control
+        self.recipe = recipe
+
+        self.timings = []
+        self.numberOfReads = 0
+        self._sources = {}
+
+    def run(self, mesh, progressCallback=None):
+        """Run every step in order, a failing step doesn't stop the others
+
+        :param mesh: str
+        :param progressCallback: callable
+            called with the progress in percent
+        :return: list
+            a list of StepTiming
+        """
+        control = self.control
+        control.setSelectedGeo(mesh)
+
+        self.timings = []
+        self.numberOfReads = 0
+        self._sources = {}
+
+        layerDict = control.getLayerData()
+        numberOfSteps = float(len(self.recipe))
+
+        with control.suspendUpdates():
+            for i, step in enumerate(self.recipe.steps):
+                try:
+                    timing = self._runStep(i, step, mesh, layerDict)
+                except Exception as e:
+                    log.exception("Copy paste step %s failed on %s", i, mesh)
+                    timing = StepTiming(i, step.source, step.destination, FAILED, 0, 0.0, 0.0, 0.0, str(e))
+                    # the layers of a failed step may be half written
+                    self._sources = {}
+
+                self.timings.append(timing)
+
+                if progressCallback:
+                    progressCallback(100.0 * (i + 1) / numberOfSteps)
+
+        self._sources = {}
+        return self.timings
+
+    def _runStep(self, index, step, mesh, layerDict):
+        control = self.control
+
+        for layerName in (step.source, step.destination):
+            if layerName not in layerDict:
+                return StepTiming(index, step.source, step.destination, SKIPPED, 0, 0.0, 0.0, 0.0,
+                                  "no layer named {}".format(layerName))
+
+        srcID = layerDict[step.source]
+        dstID = layerDict[step.destination]
+
+        # setData takes a single layer pair, every step sets its own
+        control.setData({'mesh': mesh,
+                         'layer': (srcID, dstID),
+                         'method': step.method,
+                         'token': step.token,
+                         'mask': step.mask})
+
+        start = time.time()
+        indentKey, nameKey = control.getCachedInfluenceData()
+        infNames, infIDs = control.getUsedInfluenceData(indentKey, nameKey)
+        remapData = control.storeRemapData(infIDs, infNames, nameKey)
+        remapTime = time.time() - start
+        if not remapData:
+            return StepTiming(index, step.source, step.destination, SKIPPED, 0, 0.0, remapTime, 0.0,
+                              "no matched influences")
+
+        srcWeights = self._sources.get(srcID)
+        readTime = 0.0
+        if srcWeights is None:
+            readStart = time.time()
+            srcWeights = control.loadSourceWeights()
+            readTime = time.time() - readStart
+            self.numberOfReads += 1
+            self._sources[srcID] = srcWeights
+
+        # the remap lookup counts as compute
+        computeStart = time.time()
+        srcWeights, _, dstWeights = control.computePaste(remapData, srcWeights)
+        computeTime = time.time() - computeStart + remapTime
+
+        writeStart = time.time()
+        control.writePaste(srcWeights.influences, dstWeights)
+        writeTime = time.time() - writeStart
+
+        # the layers written by the step are read again by the next step using them
+        self._sources.pop(dstID, None)
+        if step.method == "cut":
+            self._sources.pop(srcID, None)
+
+        return StepTiming(index, step.source, step.destination, DONE, len(remapData),
+                          readTime, computeTime, writeTime, "")
+
+    def succeeded(self):
+        return [timing for timing in self.timings if timing.status == DONE]
+
+    def formatReport(self):
+        """Make a readable report with the timing breakdown of each step
+
+        :return: str
+        """
+        lines = []
+        for timing in self.timings:
+            line = "{:>3} {:<8} {:<20} -> {:<20} {:>4} influences  " \
+                   "read {:>6.3f}  compute {:>6.3f}  write {:>6.3f} sec".format(timing.index,
+                                                                               timing.status,
+                                                                               timing.source,
+                                                                               timing.destination,
+                                                                               timing.matched,
+                                                                               timing.read,
+                                                                               timing.compute,
+                                                                               timing.write)
+            if timing.message:
+                line += "  ({})".format(timing.message)
+            lines.append(line)
+
+        total = sum(timing.read + timing.compute + timing.write for timing in self.timings)
+        lines.append("{} of {} steps done, {} source layer reads, {:.3f} sec".format(len(self.succeeded()),
+                                                                                  len(self.timings),
+                                                                                  self.numberOfReads,
+                                                                                  total))
+        return "\n".join(lines)
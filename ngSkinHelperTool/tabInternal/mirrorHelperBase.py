@@ -26,7 +26,7 @@ import logging
 # Maya modules
 import maya.OpenMaya as om
 
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, progress
 
 
 # ----------------------------------------------------------------- GLOBALS --#
@@ -43,16 +43,11 @@ class MirrorBase(object):
 
     noMirrorList = ("NO_MIRROR", "NoMirror", "No_Mirror", "noMirror")
 
-    def __init__(self, parent):
+    def __init__(self, parent, reporter=None):
         self.parent = parent
 
-        self.progressStatus = False
-
-    def toggleVisibilityInfomationBar(self):
-        if self.progressStatus:
-            self.parent.progressBar.setVisible(True)
-        else:
-            self.parent.progressBar.setVisible(False)
+        # the progress goes to the progress bar of the parent, nowhere when headless
+        self.reporter = reporter or progress.getReporter(parent)
 
     def setSkinMesh(self, geo):
         pass
@@ -60,28 +55,15 @@ class MirrorBase(object):
     def setConfigureMapper(self):
         pass
 
-    def isProgressStatus(self):
-        if self.progressStatus:
-            return False
-        return True
-
-    def preProcess(self, geo):
-        self.progressStatus = self.isProgressStatus()
-
+    def preProcess(self, geo, numberOfLayers=0):
         # prepare for the mirror process
         self.setSkinMesh(geo)
         self.setConfigureMapper()
 
-        # show the progress bar
-        self.toggleVisibilityInfomationBar()
-
-        # set value
-        self.parent.progressBar.setValue(0)
+        self.reporter.start(numberOfLayers, "mirror {}".format(geo))
 
     def postProcess(self):
-        # hide information bar
-        self.progressStatus = False
-        self.toggleVisibilityInfomationBar()
+        self.reporter.finish()
 
 
 class PrintStatus(object):
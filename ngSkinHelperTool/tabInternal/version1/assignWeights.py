@@ -30,6 +30,7 @@ from rig_tools.tool.ngSkinHelperTool.tabInternal.assignWeightsBase import Region
 import ngSkinTools.mllInterface
 
 from rig_tools.core import geometry
+from rig_tools.tool.ngSkinHelperTool.util import layerWeights
 from rig_tools.util import context
 
 
@@ -93,22 +94,18 @@ class RegionWeight(RegionWeightFactory):
         closestMap = self._findJointClosestToComp()
         numberOfVertices = cmds.polyEvaluate(self.geo, vertex=True)
 
-        # Perform the following steps within an undo context to enable undo functionality.
-        with context.UndoContext():
-            for jnt, vertexList in closestMap.items():
-                # Get the logical index of the current joint from the influences dictionary.
-                influenceIndex = influences[jnt]
-
-                # Create a weight list with zeros for all vertices.
-                weights = [0] * numberOfVertices
+        # Only the vertices weighted by each joint are stored, the rest are zeros.
+        weights = layerWeights.SparseLayerWeights(numberOfVertices)
 
-                # Set the weight to 1.0 for each vertex in the vertex list.
-                for vtx in vertexList:
-                    i = geometry.componentToIndex(vtx)
-                    weights[i] = 1.0
+        for jnt, vertexList in closestMap.items():
+            # Set the weight to 1.0 for each vertex in the vertex list of the joint.
+            indexes = [geometry.componentToIndex(vtx) for vtx in vertexList]
+            weights.setSparse(influences[jnt], indexes, [1.0] * len(indexes))
 
-                # Set the influence weights for the current joint
-                self.mll.setInfluenceWeights(layerId, influenceIndex, weights, True)
+        # Perform the following steps within an undo context to enable undo functionality.
+        with context.UndoContext():
+            # Set the influence weights of every joint
+            layerWeights.MllAdapterV1(self.mll).store(self.geo, layerId, weights, channels=())
 
 
 class FaceRegionWeights:
@@ -30,16 +30,13 @@ import logging
 from maya import cmds
 
 # Reelfx modules
-from rig_tools.tool import ngSkinUtils, ngSkinUtils2
-
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, layerWeights
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 from rig_tools.tool.ngSkinHelperTool.tabInternal.copyPasteBase import CopyPasteInfluence
 
 
 # ngSkinTools1 modules
-import ngSkinTools.mllInterface
-import ngSkinTools.utilities.weightsClipboard
-import ngSkinTools.ui.events
+ngSkinTools = LazyModule("ngSkinTools", submodules=["ngSkinTools.mllInterface", "ngSkinTools.ui.events"])
 
 
 class NgSkinControlV1(CopyPasteInfluence):
@@ -66,53 +63,28 @@ class NgSkinControlV1(CopyPasteInfluence):
     def getLayerData(self):
         layerDict = {}
 
+        self.mll1.setCurrentMesh(self.mesh)
         layers = self.mll1.listLayers()
         for i in layers:
             layerDict[i["name"]] = i["id"]
         return layerDict
 
     def getUsedInfluenceData(self, indentKey, nameKey):
+        # the influence data may come from the cache without setting the mesh
+        self.mll1.setCurrentMesh(self.mesh)
         infData = self.mll1.listLayerInfluences(self.srcLayerID)
         infName = [inf[0] for inf in infData]
         infId = [inf[1] for inf in infData]
         return infName, infId
 
-    def copyWeights(self, srcInfID):
-        # copy or cut weights from a specific joint on the source layer
-        func = ngSkinTools.utilities.weightsClipboard
-        weightClip = func.WeightsClipboard(self.mll1)
-        weightClip.layer = self.srcLayerID
-        weightClip.influence = srcInfID
-
-        # operation starts
-        if self.operation is "cut":
-            weightClip.cut()
-        else:
-            weightClip.copy()
-
-        if self.mask:
-            maskWeight = self.mll1.getLayerMask(self.srcLayerID)
-        else:
-            maskWeight = None
-
-        return weightClip, maskWeight
-
-    def pasteWeights(self, weightClip, maskWeight, dstInfID):
-        # paste weights to the destination layer with a copied weights
-        weightClip.layer = self.dstLayerID
-        weightClip.influence = dstInfID
-        if self.operation == "cut" or self.operation == "replace":
-            weightClip.pasteReplace()
-        elif self.operation == "add":
-            weightClip.pasteAdd()
-        elif self.operation == "subtract":
-            weightClip.pasteSubstract()
-
-        # apply mask weighs if checked
-        if maskWeight:
-            self.mll1.setLayerMask(self.dstLayerID, maskWeight)
-
-        # update all influences in the list
+    def suspendUpdates(self):
+        self.mll1.setCurrentMesh(self.mesh)
+        return self.mll1.batchUpdateContext()
+
+    def getWeightsAdapter(self):
+        return layerWeights.MllAdapterV1(self.mll1)
+
+    def emitInfluencesChanged(self):
         ngSkinTools.ui.events.LayerEvents.influenceListChanged.emit()
 
     def getCurrentLayer(self):
@@ -27,7 +27,7 @@
 from PySide2 import QtCore
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, progress
 from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
 
 
@@ -38,65 +38,46 @@ import ngSkinTools.ui.events
 
 class NgLayerControlV1(object):
 
-    def __init__(self, treeWidget, parent):
+    def __init__(self, treeWidget, parent, reporter=None):
         self.tree = treeWidget
         self.parent = parent
         self.mll1 = ngSkinTools.mllInterface.MllInterface()
-        self.progressStatus = False
 
-        self.remapId = {}
-
-    def isProgressStatus(self):
-        if self.progressStatus:
-            return False
-        return True
-
-    def toggleVisibilityInfomationBar(self):
-        if self.progressStatus:
-            self.parent.progressBar.setVisible(True)
-        else:
-            self.parent.progressBar.setVisible(False)
-
-    def preProcess(self):
-        self.progressStatus = self.isProgressStatus()
+        # the progress goes to the progress bar of the parent, nowhere when headless
+        self.reporter = reporter or progress.getReporter(parent)
 
-        # show the progress bar
-        self.toggleVisibilityInfomationBar()
+        self.remapId = {}
 
-        # set value
-        self.parent.progressBar.setValue(0)
+    def preProcess(self, numberOfLayers=0):
+        self.reporter.start(numberOfLayers, "build layers")
 
     def postProcess(self):
-        # hide information bar
-        self.progressStatus = False
-        self.toggleVisibilityInfomationBar()
-
-    def createLayer(self, mesh):
-        self.preProcess()
+        self.reporter.finish()
 
+    def createLayer(self, mesh, index=None):
         num = self.tree.topLevelItemCount()
         if num == 0:
             return None
 
-        for i in range(num):
-            # display the current progress on the screen
-            currentNum = float(i)
-            progressVal = 100.0 * (currentNum / num)
-            self.parent.progressBar.setValue(progressVal)
+        self.preProcess(num)
 
-            topItemInt = num - (i + 1)
-            topItem = self.tree.topLevelItem(topItemInt)
-            topItemData = topItem.data(0, QtCore.Qt.UserRole)
-
-            # Create top-item layers
-            if not utils.hasLayerData(mesh, version=1):
+        try:
+            if not utils.hasLayerData(mesh, version=1, index=index):
                 self.mll1.initLayers()
-            topLayerId = self.mll1.createLayer(name=topItemData["name"])
 
-            # Create each children of top-item layers
-            self.createSubTreeLayers(topItem, topLayerId)
+            for i in range(num):
+                topItemInt = num - (i + 1)
+                topItem = self.tree.topLevelItem(topItemInt)
+                topItemData = topItem.data(0, QtCore.Qt.UserRole)
+
+                # Create top-item layers
+                topLayerId = self.mll1.createLayer(name=topItemData["name"])
 
-        self.postProcess()
+                # Create each children of top-item layers
+                self.createSubTreeLayers(topItem, topLayerId)
+                self.reporter.advance()
+        finally:
+            self.postProcess()
 
         # Update the layers widget
         ngSkinTools.ui.events.MayaEvents.nodeSelectionChanged.emit()
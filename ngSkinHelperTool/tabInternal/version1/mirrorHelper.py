@@ -28,21 +28,20 @@ import json
 import maya.OpenMaya as om
 import maya.cmds as cmds
 
-from rig_tools.tool.ngSkinHelperTool.util import utils
 from rig_tools.tool.ngSkinHelperTool.tabInternal.mirrorHelperBase import MirrorBase, PrintStatus
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 
 
 # ngSkinTools1 modules
-if utils.IS_NG1:
-    import ngSkinTools.influenceMapping
-    import ngSkinTools.mllInterface
-    import ngSkinTools.selectionState
-    import ngSkinTools.ui.components.influencePrefixSuffixSelector
-    import ngSkinTools.ui.events
-    import ngSkinTools.ui.layerDataModel
-    import ngSkinTools.ui.mainwindow
-    import ngSkinTools.ui.tabMirror
-    import ngSkinTools.ui.uiWrappers
+ngSkinTools = LazyModule("ngSkinTools", submodules=["ngSkinTools.influenceMapping",
+                                                    "ngSkinTools.mllInterface",
+                                                    "ngSkinTools.selectionState",
+                                                    "ngSkinTools.ui.components.influencePrefixSuffixSelector",
+                                                    "ngSkinTools.ui.events",
+                                                    "ngSkinTools.ui.layerDataModel",
+                                                    "ngSkinTools.ui.mainwindow",
+                                                    "ngSkinTools.ui.tabMirror",
+                                                    "ngSkinTools.ui.uiWrappers"])
 
 
 class NgControlV1(MirrorBase):
@@ -55,7 +54,6 @@ class NgControlV1(MirrorBase):
         super(NgControlV1, self).__init__(parent)
 
         self.info = PrintStatus()
-        self.progressStatus = False
 
         _ui = ngSkinTools.ui
         _infComp = _ui.components.influencePrefixSuffixSelector
@@ -147,33 +145,30 @@ class NgControlV1(MirrorBase):
     def mirror(self, geo, numberOfAllLayers):
         """The weights of the mesh will be mirrored across all layers.
         """
-        self.preProcess(geo)
-
-        with self.mll1.batchUpdateContext():
-            trigger = True
-            for i, (layerId, layerName, _) in enumerate(self.mll1.listLayers(), 1):
-                # display the current progress on the screen
-                currentNum = float(i)
-                progressVal = 100.0 * (currentNum / numberOfAllLayers)
-                self.parent.progressBar.setValue(progressVal)
-
-                # ignore a mirror function towards the name tagged
-                for noMirror in self.noMirrorList:
-                    if noMirror in layerName:
-                        self.info.setMessage("Ignore a mirror: {}".format(layerName))
-                        trigger = False
-                        continue
-
-                # mirror weights
-                if trigger:
-                    self.mll1.mirrorLayerWeights(layerId,
-                                                 mirrorWidth=self.mirrorWidth,
-                                                 mirrorLayerWeights=self.mirrorWeights,
-                                                 mirrorLayerMask=self.mirrorMask,
-                                                 mirrorDualQuaternion=self.mirrorDq,
-                                                 mirrorDirection=self.mirrorDirection)
-                trigger = True
-        ngSkinTools.ui.events.LayerEvents.influenceListChanged.emit()
+        self.preProcess(geo, numberOfAllLayers)
 
-        self.postProcess()
+        try:
+            with self.mll1.batchUpdateContext():
+                trigger = True
+                for layerId, layerName, _ in self.mll1.listLayers():
+                    # ignore a mirror function towards the name tagged
+                    for noMirror in self.noMirrorList:
+                        if noMirror in layerName:
+                            self.info.setMessage("Ignore a mirror: {}".format(layerName))
+                            trigger = False
+                            continue
+
+                    # mirror weights
+                    if trigger:
+                        self.mll1.mirrorLayerWeights(layerId,
+                                                     mirrorWidth=self.mirrorWidth,
+                                                     mirrorLayerWeights=self.mirrorWeights,
+                                                     mirrorLayerMask=self.mirrorMask,
+                                                     mirrorDualQuaternion=self.mirrorDq,
+                                                     mirrorDirection=self.mirrorDirection)
+                    trigger = True
+                    self.reporter.advance()
+            ngSkinTools.ui.events.LayerEvents.influenceListChanged.emit()
+        finally:
+            self.postProcess()
 
@@ -32,6 +32,7 @@ from ngSkinTools2.api import layers, target_info, tools, plugin
 from ngSkinTools2.api.session import session
 
 from rig_tools.core import geometry
+from rig_tools.tool.ngSkinHelperTool.util import layerWeights
 from rig_tools.util import context
 
 
@@ -96,22 +97,19 @@ class RegionWeight(RegionWeightFactory):
         closestMap = self._findJointClosestToComp()
         numberOfVertices = cmds.polyEvaluate(self.geo, vertex=True)
 
-        # Perform the following steps within an undo context to enable undo functionality.
-        with context.UndoContext():
-            for jnt, vertexList in closestMap.items():
-                # Get the logical index of the current joint from the influences dictionary.
-                influenceIndex = influences[jnt]
-
-                # Create a weight list with zeros for all vertices.
-                weights = [0] * numberOfVertices
+        # Only the vertices weighted by each joint are stored, the rest are zeros.
+        weights = layerWeights.SparseLayerWeights(numberOfVertices)
 
-                # Set the weight to 1.0 for each vertex in the vertex list.
-                for vtx in vertexList:
-                    i = geometry.componentToIndex(vtx)
-                    weights[i] = 1.0
+        for jnt, vertexList in closestMap.items():
+            # Set the weight to 1.0 for each vertex in the vertex list of the joint.
+            indexes = [geometry.componentToIndex(vtx) for vtx in vertexList]
+            weights.setSparse(influences[jnt], indexes, [1.0] * len(indexes))
 
-                # Set the influence weights for the current joint
-                self.layerObj.set_weights(influenceIndex, weights)
+        # Perform the following steps within an undo context to enable undo functionality.
+        with context.UndoContext():
+            # Set the influence weights of every joint
+            layerWeights.LayersAdapterV2(self.layerObj).store(self.layerObj.mesh, self.layerObj.id, weights,
+                                                              channels=())
         self.postProcess()
 
 
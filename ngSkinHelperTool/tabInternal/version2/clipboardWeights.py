@@ -1,11 +1,17 @@
+import json
+import logging
 
-import numpy as np
+from maya import cmds
 
-import ngSkinTools2
-from ngSkinTools2.api import plugin
-from ngSkinTools2.api.session import session
+from rig_tools.tool.ngSkinHelperTool.util import utils, layerWeights, weightClipboard, remapCompiler, spatialTransfer, \
+    weightMath
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 
-from rig_tools.tool.ngSkinHelperTool.util import utils
+# ngSkinTools2 modules
+ngSkinTools2 = LazyModule("ngSkinTools2", submodules=["ngSkinTools2.mllInterface"])
+session = LazyModule("ngSkinTools2.api.session", attribute="session")
+
+log = logging.getLogger(__name__)
 
 
 class ClipboardOperation(object):
@@ -13,44 +19,239 @@ class ClipboardOperation(object):
     REPLACE = 'pasteReplace'
     ADD = 'pasteAdd'
     SUBTRACT = 'pasteSubtract'
+    MULTIPLY = 'pasteMultiply'
+    SCALE = 'pasteScale'
+
+    OPERATIONS = {REPLACE: weightMath.REPLACE,
+                  ADD: weightMath.ADD,
+                  SUBTRACT: weightMath.SUBTRACT,
+                  MULTIPLY: weightMath.MULTIPLY,
+                  SCALE: weightMath.SCALE}
+
+    BY_NAME = 'byName'
+    BY_ORDER = 'byOrder'
 
-    def __init__(self):
+    def __init__(self, clipboard=None):
         self.weightClip = None
+        self.clipboard = clipboard or weightClipboard.DISK_CLIPBOARD
+        self.storedOnDisk = False
+
+    def _getCurrentTarget(self):
+        layer = session.state.currentLayer.layer
+        influences = list(session.context.selectedInfluences())
+        return layerWeights.LayersAdapterV2(layer), layer, influences
 
-        skinNode = session.state.selectedSkinCluster
-        if skinNode is None:
+    def _getInfluenceNames(self, mesh):
+        mll = ngSkinTools2.mllInterface.MllInterface()
+        mll.setCurrentMesh(mesh)
+        listInfInfo = json.loads(mll.ngSkinLayerCmd(q=True, influenceInfo=True))
+        return dict((inf["index"], inf["path"].split("|")[-1]) for inf in listInfInfo)
+
+    def copyWeights(self, operation, channels=(), transfer=None):
+        """Copy or cut the weights of every selected influence in one read
+
+        :param operation: str
+            'copy' or 'cut'
+        :param channels: list
+            the channels copied with the influences among MASK and DQ
+        :param transfer: str
+            spatialTransfer.CLOSEST_POINT or BARYCENTRIC to keep the source shape for a paste
+            to another topology, the clip only holds the weights if None
+        """
+        adapter, layer, influences = self._getCurrentTarget()
+        if not influences:
+            cmds.warning("Select the influences to copy")
             return
 
-    def copyWeights(self, operation):
-        # copy or cut weights from a specific joint on the source layer
-        layer = session.state.currentLayer.layer
-        influences = session.context.selectedInfluences()
+        # only the non-zero weights of each influence are kept from the read on
+        weights = adapter.load(layer.mesh, layer.id, influences, channels=channels, sparse=True)
 
-        weightClip = layer.get_weights(influences[0])
         if operation == "cut":
-            array = np.array([weightClip, weightClip])
-            weightList = np.subtract(array[1], array[0]).tolist()
-            layer.set_weights(influences[0], weightList)
+            # empty sparse influences, nothing of the mesh size until they are written
+            cleared = layerWeights.SparseLayerWeights(weights.numberOfVertices, influences)
+            adapter.store(layer.mesh, layer.id, cleared, channels=())
 
-        self.weightClip = weightClip
+        # a row per influence, the layout of the clipboard file
+        arrays = weightClipboard.packSparse(weights, influences)
+        for channel in channels:
+            values = weights.getChannel(channel)
+            if values is not None:
+                arrays[channel] = values
 
-    def pasteWeights(self, operation, copyWeightList):
-        layer = session.state.currentLayer.layer
-        influences = session.context.selectedInfluences()
-        pasteWeightList = layer.get_weights(influences[0])
-
-        weightList = None
-        if operation == self.REPLACE:
-            weightList = copyWeightList
-        elif operation == self.ADD:
-            array = np.array([copyWeightList, pasteWeightList])
-            weightList = np.clip(np.sum(array, axis=0), 0.0, 1.0).tolist()
-        elif operation == self.SUBTRACT:
-            array = np.array([copyWeightList, pasteWeightList])
-            weightList = np.subtract(array[1], array[0]).tolist()
+        # the source shape lets the clip be pasted to another topology, the triangles only serve BARYCENTRIC
+        if transfer:
+            arrays[weightClipboard.POINTS] = spatialTransfer.getMeshPoints(layer.mesh)
+        if transfer == spatialTransfer.BARYCENTRIC:
+            arrays[weightClipboard.TRIANGLES] = spatialTransfer.getMeshTriangles(layer.mesh)
+
+        indexKey = self._getInfluenceNames(layer.mesh)
+        influenceNames = [indexKey.get(influence, str(influence)) for influence in influences]
+
+        # the same key on disk, in memory and in the history, the transfer lookups are cached by it
+        stamp = weightClipboard.newStamp()
+
+        # the disk copy can be pasted by the other sessions and after the window is closed
+        try:
+            header = self.clipboard.write(arrays,
+                                          mesh=layer.mesh,
+                                          layer=layer.name,
+                                          influences=influenceNames,
+                                          numberOfVertices=weights.numberOfVertices,
+                                          stamp=stamp)
+            self.storedOnDisk = True
+        except (IOError, OSError) as e:
+            log.warning("The copied weights are kept for this window only: %s", e)
+            header = {"stamp": stamp,
+                      "mesh": layer.mesh,
+                      "layer": layer.name,
+                      "numberOfVertices": weights.numberOfVertices,
+                      "influences": influenceNames}
+            self.storedOnDisk = False
+
+        self.weightClip = (header, arrays)
+        weightClipboard.CLIPBOARD_HISTORY.add(header, arrays)
+
+    def readClipboard(self):
+        """Read the disk clipboard, the files are mapped rather than loaded
+
+        :return: tuple
+            (header, numpy array of each name), (None, {}) when the clipboard is empty
+        """
+        return self.clipboard.read(mmap=True)
+
+    def mapInfluences(self, header, mesh, selected, mapping=BY_NAME, searchReplace=None):
+        """Find the destination influence of each copied influence
+
+        :param header: dict
+            header of the clip
+        :param mesh: str
+            destination mesh
+        :param selected: list
+            selected influence indexes of the destination, used by BY_ORDER
+        :param mapping: str
+            BY_NAME to match the influence names, BY_ORDER to match the selection order
+        :param searchReplace: list
+            pairs of search and replace strings applied to the names before matching
+        :return: tuple
+            (row indexes of the clip, destination influence indexes)
+        """
+        copied = header["influences"]
+
+        if mapping == self.BY_ORDER:
+            if len(selected) != len(copied):
+                log.warning("%s influences were copied, %s are selected", len(copied), len(selected))
+            pairs = list(zip(range(len(copied)), selected))
+        else:
+            indexKey = self._getInfluenceNames(mesh)
+            nameKey = dict((name, index) for index, name in indexKey.items())
+            remap = remapCompiler.compileRemap(searchReplace)
+
+            pairs = []
+            for row, name in enumerate(copied):
+                dstName = remap(name) or name
+                if dstName not in nameKey:
+                    log.warning("%s is not an influence of %s", dstName, mesh)
+                    continue
+                pairs.append((row, nameKey[dstName]))
+
+        rows = []
+        dstInfluences = []
+        for row, influence in pairs:
+            # the first copied influence wins when two map to the same destination
+            if influence in dstInfluences:
+                log.warning("%s is pasted to an influence already pasted", copied[row])
+                continue
+            rows.append(row)
+            dstInfluences.append(influence)
+        return rows, dstInfluences
+
+    def getTransferMap(self, header, arrays, mesh, method):
+        """Make the map resampling the clip onto the mesh, the lookup of a clip is built once
+
+        :param header: dict
+        :param arrays: dict
+        :param mesh: str
+            destination mesh
+        :param method: str
+            spatialTransfer.CLOSEST_POINT or spatialTransfer.BARYCENTRIC
+        :return: TransferMap
+            None when the clip has no source positions
+        """
+        if weightClipboard.POINTS not in arrays:
+            return None
+
+        locator = spatialTransfer.getLocator(header["stamp"],
+                                             arrays[weightClipboard.POINTS],
+                                             arrays.get(weightClipboard.TRIANGLES))
+        return locator.transferMap(spatialTransfer.getMeshPoints(mesh), method)
+
+    def pasteWeights(self, operation, weightClip=None, mapping=BY_NAME, searchReplace=None, channels=(),
+                     transfer=None, factor=1.0):
+        """Paste every copied influence in one read and one write of the destination layer,
+        the destination buffer is combined in place
+
+        :param operation: str
+            REPLACE, ADD, SUBTRACT, MULTIPLY, or SCALE to scale the destination weights of the copied influences
+        :param weightClip: tuple
+            (header, arrays) of a clip kept in memory, the disk clipboard if None
+        :param mapping: str
+            BY_NAME or BY_ORDER
+        :param searchReplace: list
+            pairs of search and replace strings applied to the names before matching
+        :param channels: list
+            the copied channels to paste among MASK and DQ, they replace the layer ones
+        :param transfer: str
+            spatialTransfer.CLOSEST_POINT or spatialTransfer.BARYCENTRIC to resample the weights
+            by position, the vertex order has to match if None
+        :param factor: float
+            the factor of SCALE
+        """
+        if weightClip is None:
+            weightClip = self.readClipboard()
+        header, arrays = weightClip
+        if header is None:
+            cmds.warning("The weight clipboard is empty")
+            return
+
+        adapter, layer, selected = self._getCurrentTarget()
+        rows, dstInfluences = self.mapInfluences(header, layer.mesh, selected, mapping, searchReplace)
+        if not dstInfluences:
+            cmds.warning("None of the copied influences match {}".format(layer.mesh))
+            return
+
+        # the destination block is dense, the copied rows are combined into its columns in place
+        weights = adapter.load(layer.mesh, layer.id, dstInfluences, channels=())
+        copyRows = weightClipboard.SparseRows.fromArrays(arrays, header["numberOfVertices"])
+        copyChannels = dict((channel, arrays[channel]) for channel in channels if channel in arrays)
+
+        if transfer:
+            transferMap = self.getTransferMap(header, arrays, layer.mesh, transfer)
+            if transferMap is None:
+                cmds.warning("The weights copied from {} have no vertex positions, "
+                             "copy them again with a transfer checked".format(header["mesh"]))
+                return
+
+            # the resampling mixes source vertices, only the mapped rows are made dense for it
+            resampled = transferMap.apply(copyRows.toDense(rows))
+            weightMath.applyColumns(weights.weights, resampled, list(range(len(rows))),
+                                    self.OPERATIONS[operation], factor)
+            for channel, values in copyChannels.items():
+                copyChannels[channel] = transferMap.apply(values)
+
+        elif header["numberOfVertices"] != weights.numberOfVertices:
+            cmds.warning("The weights copied from {} have {} vertices, {} has {}, paste with a transfer".format(
+                header["mesh"], header["numberOfVertices"], layer.mesh, weights.numberOfVertices))
+            return
+
+        else:
+            # the copied rows are read one at a time through their vertex indexes
+            weightMath.applySparseColumns(weights.weights, copyRows, rows, self.OPERATIONS[operation], factor)
+
+        for channel, values in copyChannels.items():
+            weights.setChannel(channel, values)
 
         # paste weights to the destination layer with a copied weights
-        layer.set_weights(influences[0], weightList)
+        adapter.store(layer.mesh, layer.id, weights, channels=channels)
 
         # update all influences in the list
         session.events.influencesListUpdated.emit()
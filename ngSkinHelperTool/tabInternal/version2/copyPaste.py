@@ -29,15 +29,14 @@ import logging
 from maya import cmds
 
 # Reelfx modules
-from rig_tools.tool import ngSkinUtils, ngSkinUtils2
-
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, layerWeights
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 from rig_tools.tool.ngSkinHelperTool.tabInternal.copyPasteBase import CopyPasteInfluence
 
 # ngSkinTools2 modules
-import ngSkinTools2.mllInterface
-from ngSkinTools2.api import layers
-from ngSkinTools2.api.session import session
+ngSkinTools2 = LazyModule("ngSkinTools2", submodules=["ngSkinTools2.mllInterface", "ngSkinTools2.api"])
+layers = LazyModule("ngSkinTools2.api.layers")
+session = LazyModule("ngSkinTools2.api.session", attribute="session")
 
 
 class NgSkinControlV2(CopyPasteInfluence):
@@ -46,6 +45,7 @@ class NgSkinControlV2(CopyPasteInfluence):
     def __init__(self):
         super(NgSkinControlV2, self).__init__()
         self.mll2 = ngSkinTools2.mllInterface.MllInterface()
+        self.adapter = layerWeights.LayersAdapterV2()
 
     def __str__(self):
         return self.VERSION
@@ -62,6 +62,7 @@ class NgSkinControlV2(CopyPasteInfluence):
 
     def getLayerData(self):
         layerDict = {}
+        self.mll2.setCurrentMesh(self.mesh)
         layers = self.mll2.listLayers()
         for i in layers:
             layerDict[i["name"]] = i["id"]
@@ -73,49 +74,16 @@ class NgSkinControlV2(CopyPasteInfluence):
         infName = [indentKey[idInt] for idInt in infId]
         return infName, infId
 
-    def copyWeights(self, srcInfID):
-        # copy or cut weights from a specific joint on the source layer
-        srcLayer = layers.Layer(self.mesh, self.srcLayerID)
-
-        operation = self._getPasteOperation()
-        weightClip = ngSkinTools2.api.copy_paste_weights
-        if operation is "cut":
-            weightClip.cut_weights(srcLayer, [srcInfID])
-        else:
-            weightClip.copy_weights(srcLayer, [srcInfID])
+    def suspendUpdates(self):
+        return ngSkinTools2.api.suspend_updates(self.mesh)
 
-        maskWeight = None
-        if self.mask:
-            maskWeight = srcLayer.get_weights("mask")
-        return weightClip, maskWeight
+    def getWeightsAdapter(self):
+        # keeps its Layer objects between runs
+        return self.adapter
 
-    def pasteWeights(self, weightClip, maskWeight, dstInfID):
-        operation = self._getPasteOperation()
-        dstLayer = layers.Layer(self.mesh, self.dstLayerID)
-
-        # paste weights to the destination layer with a copied weights
-        weightClip.paste_weights(dstLayer, operation, influences=[dstInfID])
-
-        # apply mask weighs if checked
-        if maskWeight:
-            self.mll2.setLayerMask(self.dstLayerID, maskWeight)
-
-        # update all influences in the list
+    def emitInfluencesChanged(self):
         session.events.influencesListUpdated.emit()
 
-    def _getPasteOperation(self):
-        operation = None
-        func = ngSkinTools2.api.copy_paste_weights
-        if self.operation == "replace":
-            operation = func.PasteOperation.replace
-        elif self.operation == "add":
-            operation = func.PasteOperation.add
-        elif self.operation == "subtract":
-            operation = func.PasteOperation.subtract
-        elif self.operation == "cut":
-            operation = self.op
-        return operation
-
     def getCurrentLayer(self):
         mesh = utils.getNgSkinnedMesh(mode=1)[0]
         if mesh is None:
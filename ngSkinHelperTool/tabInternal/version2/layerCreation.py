@@ -26,7 +26,7 @@
 from PySide2 import QtCore
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, progress
 from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
 
 # ngSkinTools2 modules
@@ -37,67 +37,47 @@ from ngSkinTools2.api import layers
 
 class NgLayerControlV2(object):
 
-    def __init__(self, treeWidget, parent):
+    def __init__(self, treeWidget, parent, reporter=None):
         self.tree = treeWidget
         self.mll2 = ngSkinTools2.mllInterface.MllInterface()
         self.parent = parent
-        self.progressStatus = False
 
-    def isProgressStatus(self):
-        if self.progressStatus:
-            return False
-        return True
+        # the progress goes to the progress bar of the parent, nowhere when headless
+        self.reporter = reporter or progress.getReporter(parent)
 
-    def toggleVisibilityInfomationBar(self):
-        if self.progressStatus:
-            self.parent.progressBar.setVisible(True)
-        else:
-            self.parent.progressBar.setVisible(False)
-
-    def preProcess(self):
-        self.progressStatus = self.isProgressStatus()
-
-        # show the progress bar
-        self.toggleVisibilityInfomationBar()
-
-        # set value
-        self.parent.progressBar.setValue(0)
+    def preProcess(self, numberOfLayers=0):
+        self.reporter.start(numberOfLayers, "build layers")
 
     def postProcess(self):
-        # hide information bar
-        self.progressStatus = False
-        self.toggleVisibilityInfomationBar()
-
-    def createLayer(self, mesh):
-        self.preProcess()
+        self.reporter.finish()
 
+    def createLayer(self, mesh, index=None):
         num = self.tree.topLevelItemCount()
         if num == 0:
             return None
 
-        if not utils.hasLayerData(mesh, version=2):
+        self.preProcess(num)
+
+        if not utils.hasLayerData(mesh, version=2, index=index):
             layerData = layers.init_layers(mesh)
         else:
             layerData = layers.Layers(mesh)
 
-        for i in range(num):
-            # display the current progress on the screen
-            currentNum = float(i)
-            progressVal = 100.0 * (currentNum / num)
-            self.parent.progressBar.setValue(progressVal)
-
-            topItemInt = num - (i + 1)
-            topItem = self.tree.topLevelItem(topItemInt)
-            topItemData = topItem.data(0, QtCore.Qt.UserRole)
-
-            layer = layerData.add(name=topItemData["name"])
-            layer.effects.configure_mirror(everything=True)
-            layerId = layers.as_layer_id(layer)
-
-            # Create each children of top-item layers
-            self.createSubTreeLayers(mesh, topItem, layerId)
-
-        self.postProcess()
+        try:
+            for i in range(num):
+                topItemInt = num - (i + 1)
+                topItem = self.tree.topLevelItem(topItemInt)
+                topItemData = topItem.data(0, QtCore.Qt.UserRole)
+
+                layer = layerData.add(name=topItemData["name"])
+                layer.effects.configure_mirror(everything=True)
+                layerId = layers.as_layer_id(layer)
+
+                # Create each children of top-item layers
+                self.createSubTreeLayers(mesh, topItem, layerId)
+                self.reporter.advance()
+        finally:
+            self.postProcess()
 
         # Update the layers widget
         session.events.targetChanged.emitIfChanged()
@@ -28,15 +28,14 @@ import json
 import maya.OpenMaya as om
 import maya.cmds as cmds
 
-from rig_tools.tool.ngSkinHelperTool.util import utils
+from rig_tools.tool.ngSkinHelperTool.util import utils, progress
 from rig_tools.tool.ngSkinHelperTool.tabInternal.mirrorHelperBase import MirrorBase, PrintStatus
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
 
 # ngSkinTools2 modules
-import ngSkinTools2.mllInterface
-import ngSkinTools2.api
-import ngSkinTools2.signal
-from ngSkinTools2.api import mirror
-from ngSkinTools2.api.session import session
+ngSkinTools2 = LazyModule("ngSkinTools2", submodules=["ngSkinTools2.mllInterface", "ngSkinTools2.api"])
+mirror = LazyModule("ngSkinTools2.api.mirror")
+session = LazyModule("ngSkinTools2.api.session", attribute="session")
 
 
 class NgControlV2(MirrorBase):
@@ -109,72 +108,52 @@ class NgControlV2(MirrorBase):
     def mirror(self, geo, numberOfAllLayers):
         """Mirror all layers on a selected mesh in ngSkinTools2
         """
-        self.preProcess(geo)
+        self.preProcess(geo, numberOfAllLayers)
 
         data = self.mll2.listLayers()
 
         trigger = True
-        with ngSkinTools2.api.suspend_updates(geo):
-            for i, lay in enumerate(data, 1):
-                # display the current progress on the screen
-                currentNum = float(i)
-                progressVal = 100.0 * (currentNum / numberOfAllLayers)
-                self.parent.progressBar.setValue(progressVal)
-
-                for noMirror in self.noMirrorList:
-                    if noMirror in lay["name"]:
-                        trigger = False
-                        continue
-
-                if trigger:
-                    cmds.ngst2Layers(geo,
-                                     id=lay['id'],
-                                     mirrorLayerWeights=mirror.MirrorOptions().mirrorWeights,
-                                     mirrorLayerMask=mirror.MirrorOptions().mirrorMask,
-                                     mirrorLayerDq=mirror.MirrorOptions().mirrorDq,
-                                     mirrorDirection=mirror.MirrorOptions().direction,
-                                     )
-
-                trigger = True
-
-        # update all influences in the list
-        session.events.influencesListUpdated.emit()
-
-        self.postProcess()
+        try:
+            with ngSkinTools2.api.suspend_updates(geo):
+                for lay in data:
+                    for noMirror in self.noMirrorList:
+                        if noMirror in lay["name"]:
+                            trigger = False
+                            continue
+
+                    if trigger:
+                        cmds.ngst2Layers(geo,
+                                         id=lay['id'],
+                                         mirrorLayerWeights=mirror.MirrorOptions().mirrorWeights,
+                                         mirrorLayerMask=mirror.MirrorOptions().mirrorMask,
+                                         mirrorLayerDq=mirror.MirrorOptions().mirrorDq,
+                                         mirrorDirection=mirror.MirrorOptions().direction,
+                                         )
+
+                    trigger = True
+                    self.reporter.advance()
+
+            # update all influences in the list
+            session.events.influencesListUpdated.emit()
+        finally:
+            self.postProcess()
 
 
 class MirrorLayerEffects(object):
 
-    def __init__(self, selectType, parent):
+    def __init__(self, selectType, parent, reporter=None):
         self.selectType = selectType
         self.mll2 = ngSkinTools2.mllInterface.MllInterface()
         self.parent = parent
-        self.progressStatus = False
 
-    def isProgressStatus(self):
-        if self.progressStatus:
-            return False
-        return True
+        # the progress goes to the progress bar of the parent, nowhere when headless
+        self.reporter = reporter or progress.getReporter(parent)
 
-    def toggleVisibilityInfomationBar(self):
-        if self.progressStatus:
-            self.parent.progressBar.setVisible(True)
-        else:
-            self.parent.progressBar.setVisible(False)
-
-    def preProcess(self):
-        self.progressStatus = self.isProgressStatus()
-
-        # show the progress bar
-        self.toggleVisibilityInfomationBar()
-
-        # set value
-        self.parent.progressBar.setValue(0)
+    def preProcess(self, numberOfLayers=0):
+        self.reporter.start(numberOfLayers, "mirror layer effects")
 
     def postProcess(self):
-        # hide information bar
-        self.progressStatus = False
-        self.toggleVisibilityInfomationBar()
+        self.reporter.finish()
 
         # Update mirror layer effects on UI
         selection = cmds.ls(sl=True)
@@ -207,8 +186,6 @@ class MirrorLayerEffects(object):
         if not geo:
             return
 
-        self.preProcess()
-
         data = None
         if self.selectType == "all":
             data = self.getAllLayers(geo[0])
@@ -218,21 +195,19 @@ class MirrorLayerEffects(object):
 
         numberOfAllLayers = len(data)
 
-        with ngSkinTools2.api.suspend_updates(geo):
-            for i, layer in enumerate(data, 1):
-                # display the current progress on the screen
-                currentNum = float(i)
-                progressVal = 100.0 * (currentNum / numberOfAllLayers)
-                self.parent.progressBar.setValue(progressVal)
-
-                if everything:
-                    layer.effects.configure_mirror(everything=status)
-                elif weight:
-                    layer.effects.configure_mirror(mirror_weights=status)
-                elif dq:
-                    layer.effects.configure_mirror(mirror_dq=status)
-                elif mask:
-                    layer.effects.configure_mirror(mirror_mask=status)
-
-        self.postProcess()
+        self.preProcess(numberOfAllLayers)
+        try:
+            with ngSkinTools2.api.suspend_updates(geo):
+                for layer in data:
+                    if everything:
+                        layer.effects.configure_mirror(everything=status)
+                    elif weight:
+                        layer.effects.configure_mirror(mirror_weights=status)
+                    elif dq:
+                        layer.effects.configure_mirror(mirror_dq=status)
+                    elif mask:
+                        layer.effects.configure_mirror(mirror_mask=status)
+                    self.reporter.advance()
+        finally:
+            self.postProcess()
         return numberOfAllLayers
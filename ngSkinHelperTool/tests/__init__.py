@@ -0,0 +1,32 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Unit tests of the tool, run with pytest from the root of this repository or under mayapy.
+
+            python -m pytest ngSkinHelperTool/tests
+            mayapy -m pytest ngSkinHelperTool/tests
+
+        conftest.py makes the repository importable as rig_tools.tool.ngSkinHelperTool when the
+        studio rig_tools package isn't on the path. The modules reading Maya are only imported
+        under mayapy, their tests are skipped elsewhere.
+        None of the tests needs a scene or the ngSkinTools plugins.
+
+:Revisions:
+"""
@@ -0,0 +1,69 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Lets pytest import the tool by its studio path from a plain checkout.
+
+        Features:
+        - The tests import rig_tools.tool.ngSkinHelperTool like the tool itself does.
+        - Without the studio rig_tools package on the path, rig_tools.tool is pointed at the directory
+          holding this repository, the other rig_tools modules stay missing and their tests skip.
+
+:Revisions:
+"""
+# Build-in
+import importlib
+import os
+import sys
+import types
+
+# ----------------------------------------------------------------- GLOBALS --#
+PACKAGE_NAME = "rig_tools.tool.ngSkinHelperTool"
+
+# the directory holding the ngSkinHelperTool package
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _addPackage(name, path=None):
+    # an installed package is kept, a missing one is made empty
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        module.__path__ = []
+        sys.modules[name] = module
+
+        parentName, _, childName = name.rpartition(".")
+        if parentName:
+            setattr(sys.modules[parentName], childName, module)
+
+    if path is not None and path not in module.__path__:
+        module.__path__.append(path)
+    return module
+
+
+def _installPackagePath():
+    try:
+        __import__(PACKAGE_NAME)
+    except ImportError:
+        _addPackage("rig_tools")
+        _addPackage("rig_tools.tool", ROOT)
+
+
+_installPackagePath()
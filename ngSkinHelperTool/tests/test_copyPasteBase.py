@@ -0,0 +1,116 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the paste operations of the influence copy paste on sparse weights.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.tabInternal import copyPasteBase
+    from rig_tools.tool.ngSkinHelperTool.util import layerWeights
+except ImportError:
+    # the modules read Maya, only mayapy runs these tests
+    copyPasteBase = None
+
+NUMBER_OF_VERTICES = 30
+OPERATIONS = ("replace", "add", "subtract", "cut")
+
+
+def denseCombine(operation, srcMatrix, srcInfluences, dstMatrix, dstInfluences, remapData):
+    # the paste on full vertices x influences matrices
+    result = np.zeros_like(dstMatrix)
+    for column, dstID in enumerate(dstInfluences):
+        sources = [srcInfluences.index(srcID) for srcID in srcInfluences if remapData[srcID] == dstID]
+        if operation == "add":
+            weights = dstMatrix[:, column] + srcMatrix[:, sources].sum(axis=1)
+        elif operation == "subtract":
+            weights = dstMatrix[:, column] - srcMatrix[:, sources].sum(axis=1)
+        else:
+            weights = srcMatrix[:, sources[-1]]
+        result[:, column] = np.clip(weights, 0.0, 1.0)
+    return result
+
+
+def randomMatrix(rng, numberOfInfluences):
+    matrix = rng.rand(NUMBER_OF_VERTICES, numberOfInfluences).astype(np.float32)
+    matrix[rng.rand(NUMBER_OF_VERTICES, numberOfInfluences) < 0.7] = 0.0
+    return matrix
+
+
+@unittest.skipIf(copyPasteBase is None, "needs mayapy")
+class CombineWeightsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.srcInfluences = [0, 1, 2]
+        self.dstInfluences = [5, 6]
+        # 0 and 1 both go to 5
+        self.remapData = {0: 5, 1: 5, 2: 6}
+        self.srcMatrix = randomMatrix(rng, 3)
+        self.dstMatrix = randomMatrix(rng, 2)
+        self.mask = rng.rand(NUMBER_OF_VERTICES).astype(np.float32)
+
+    def combine(self, operation):
+        srcWeights = layerWeights.LayerWeights(NUMBER_OF_VERTICES, self.srcInfluences, self.srcMatrix,
+                                               mask=self.mask).toSparse()
+        dstWeights = layerWeights.LayerWeights(NUMBER_OF_VERTICES, self.dstInfluences, self.dstMatrix).toSparse()
+        combined = copyPasteBase.CopyPasteInfluence(operation=operation).combineWeights(srcWeights, dstWeights,
+                                                                                         self.remapData)
+        # the inputs are left as they were
+        np.testing.assert_array_equal(dstWeights.toDense().weights, self.dstMatrix)
+        return combined
+
+    def test_sameAsDense(self):
+        for operation in OPERATIONS:
+            combined = self.combine(operation)
+            self.assertIsInstance(combined, layerWeights.SparseLayerWeights)
+            self.assertEqual(combined.influences, self.dstInfluences)
+
+            expected = denseCombine(operation, self.srcMatrix, self.srcInfluences, self.dstMatrix,
+                                    self.dstInfluences, self.remapData)
+            np.testing.assert_allclose(combined.toDense().weights, expected, atol=1e-6, err_msg=operation)
+
+    def test_onlyNonZeroKept(self):
+        for operation in OPERATIONS:
+            combined = self.combine(operation)
+            for influence in combined.influences:
+                self.assertTrue(np.all(combined.getSparse(influence)[1] > 0.0), operation)
+
+    def test_mask(self):
+        # the destination takes the mask of the source
+        for operation in OPERATIONS:
+            np.testing.assert_array_equal(self.combine(operation).mask, self.mask, err_msg=operation)
+
+    def test_clamped(self):
+        self.srcMatrix[:] = 0.75
+        self.dstMatrix[:] = 0.5
+        self.assertTrue(np.all(self.combine("add").toDense().weights == 1.0))
+        self.assertEqual(self.combine("subtract").numberOfNonZero(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the snapshot write, verify and read round trip, on a temporary directory.
+
+:Revisions:
+"""
+# Build-in
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.util import layerSnapshot, layerWeights
+    from rig_tools.tool.ngSkinHelperTool.util.layerStack import LayerRecord
+except ImportError:
+    # the modules read Maya, only mayapy runs these tests
+    layerSnapshot = None
+
+NUMBER_OF_VERTICES = 8
+INFLUENCE_NAMES = {0: "root_JNT", 1: "spine_JNT", 2: "arm_L_JNT", 3: "arm_R_JNT"}
+
+
+def makeLayers():
+    base = layerWeights.SparseLayerWeights(NUMBER_OF_VERTICES, mask=np.linspace(0.0, 1.0, NUMBER_OF_VERTICES))
+    base.setSparse(0, [0, 1, 2], [1.0, 0.5, 0.25])
+    base.setSparse(3, [7], [0.75])
+    # stored without weights, it isn't written
+    base.setSparse(2, [], [])
+
+    matrix = np.zeros((NUMBER_OF_VERTICES, 2), dtype=np.float32)
+    matrix[4:, 0] = 0.5
+    arm = layerWeights.LayerWeights(NUMBER_OF_VERTICES, [1, 2], matrix)
+
+    return [(LayerRecord(1, "base", None, 1.0, True), base),
+            (LayerRecord(2, "arm", 1, 0.5, False), arm)]
+
+
+@unittest.skipIf(layerSnapshot is None, "needs mayapy")
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="ngSkinHelperTool_snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, layers, name="snapshot", unchanged=None):
+        directory = os.path.join(self.directory, name)
+        writer = layerSnapshot.SnapshotWriter(directory, "body_GEO", NUMBER_OF_VERTICES, INFLUENCE_NAMES,
+                                              sourceVersion="1", unchanged=unchanged)
+        for record, weights in layers:
+            writer.addLayer(record, weights)
+        writer.close()
+        return layerSnapshot.Snapshot(directory)
+
+
+class RoundTripTest(SnapshotTestCase):
+
+    def test_manifest(self):
+        snapshot = self.write(makeLayers())
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(snapshot.mesh, "body_GEO")
+        self.assertEqual(snapshot.numberOfVertices, NUMBER_OF_VERTICES)
+        self.assertEqual(snapshot.influenceNames, INFLUENCE_NAMES)
+        self.assertEqual(snapshot.listLayers(), [record for record, _ in makeLayers()])
+
+    def test_verify(self):
+        snapshot = self.write(makeLayers())
+        self.assertEqual(snapshot.verify(), 3 + 1 + 4)
+
+    def test_readStack(self):
+        snapshot = self.write(makeLayers())
+        for (record, weights), (expectedRecord, expected) in zip(snapshot.readStack(), makeLayers()):
+            self.assertEqual(record, expectedRecord)
+            self.assertIsInstance(weights, layerWeights.SparseLayerWeights)
+            self.assertEqual(weights.usedInfluences(), expected.usedInfluences())
+            for influence in expected.usedInfluences():
+                np.testing.assert_array_equal(weights.denseInfluence(influence), expected.denseInfluence(influence))
+
+        (_, base), (_, arm) = snapshot.readStack()
+        np.testing.assert_allclose(base.mask, np.linspace(0.0, 1.0, NUMBER_OF_VERTICES))
+        self.assertIsNone(base.dq)
+        self.assertIsNone(arm.mask)
+
+    def test_chunks(self):
+        chunkInfluences = layerSnapshot.CHUNK_INFLUENCES
+        layerSnapshot.CHUNK_INFLUENCES = 1
+        try:
+            snapshot = self.write(makeLayers())
+        finally:
+            layerSnapshot.CHUNK_INFLUENCES = chunkInfluences
+
+        self.assertEqual([len(entry["chunks"]) for entry in snapshot.manifest["layers"]], [2, 1])
+        self.assertEqual(snapshot.verify(), 3 + 1 + 4)
+        _, base = next(snapshot.readStack())
+        self.assertEqual(base.getSparse(3)[1].tolist(), [0.75])
+
+    def test_influenceMap(self):
+        snapshot = self.write(makeLayers())
+        targetNames = {10: "arm_R_JNT", 11: "root_JNT", 12: "spine_JNT", 13: "arm_L_JNT", 14: "head_JNT"}
+        influenceMap = snapshot.influenceMap(targetNames)
+        self.assertEqual(influenceMap, {0: 11, 1: 12, 2: 13, 3: 10})
+
+        _, base = next(snapshot.readStack(influenceMap))
+        self.assertEqual(sorted(base.usedInfluences()), [10, 11])
+        self.assertEqual(base.getSparse(10)[1].tolist(), [0.75])
+
+    def test_missingInfluences(self):
+        snapshot = self.write(makeLayers())
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            snapshot.influenceMap({0: "root_JNT", 1: "spine_JNT"})
+
+
+class BrokenSnapshotTest(SnapshotTestCase):
+
+    def test_noManifest(self):
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            layerSnapshot.Snapshot(self.directory)
+
+    def test_unknownVersion(self):
+        snapshot = self.write(makeLayers())
+        snapshot.manifest["version"] = layerSnapshot.FORMAT_VERSION + 1
+        with open(os.path.join(snapshot.directory, layerSnapshot.MANIFEST_NAME), "w") as f:
+            json.dump(snapshot.manifest, f)
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            layerSnapshot.Snapshot(snapshot.directory)
+
+    def test_changedWeights(self):
+        snapshot = self.write(makeLayers())
+        fileName = snapshot.manifest["layers"][0]["chunks"][0]["file"]
+        arrays = snapshot._load(fileName)
+        arrays["values"][0] = 0.0
+        np.savez_compressed(os.path.join(snapshot.directory, fileName), **arrays)
+
+        with self.assertRaises(layerSnapshot.SnapshotError) as raised:
+            snapshot.verify()
+        self.assertIn("checksum", str(raised.exception))
+
+    def test_missingChunk(self):
+        snapshot = self.write(makeLayers())
+        os.remove(os.path.join(snapshot.directory, snapshot.manifest["layers"][1]["chunks"][0]["file"]))
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            snapshot.verify()
+
+    def test_changedChannels(self):
+        snapshot = self.write(makeLayers())
+        fileName = snapshot.manifest["layers"][0]["channels"]["file"]
+        np.savez_compressed(os.path.join(snapshot.directory, fileName), mask=np.ones(3, dtype=np.float32))
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            snapshot.verify()
+
+
+class LayerHashTest(SnapshotTestCase):
+
+    def test_sameContentSameHash(self):
+        first = self.write(makeLayers(), "first").layerHashes()
+        second = self.write(makeLayers(), "second").layerHashes()
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(first), [1, 2])
+        self.assertNotEqual(first[1], first[2])
+
+    def test_denseAndSparseHashTheSame(self):
+        layers = makeLayers()
+        sparse = [(record, weights if index == 0 else weights.toSparse()) for index, (record, weights)
+                  in enumerate(layers)]
+        self.assertEqual(self.write(layers, "dense").layerHashes(), self.write(sparse, "sparse").layerHashes())
+
+    def test_changes(self):
+        hashes = self.write(makeLayers(), "first").layerHashes()
+
+        layers = makeLayers()
+        layers[0][1].setSparse(0, [0, 1, 2], [1.0, 0.5, 0.5])
+        changedWeights = self.write(layers, "weights").layerHashes()
+        self.assertNotEqual(changedWeights[1], hashes[1])
+        self.assertEqual(changedWeights[2], hashes[2])
+
+        layers = makeLayers()
+        layers[1] = (layers[1][0]._replace(opacity=0.25), layers[1][1])
+        changedOpacity = self.write(layers, "opacity").layerHashes()
+        self.assertEqual(changedOpacity[1], hashes[1])
+        self.assertNotEqual(changedOpacity[2], hashes[2])
+
+        layers = makeLayers()
+        layers[0][1].mask[0] = 1.0
+        self.assertNotEqual(self.write(layers, "mask").layerHashes()[1], hashes[1])
+
+    def test_unchangedLayersAreNotStored(self):
+        hashes = self.write(makeLayers(), "first").layerHashes()
+        snapshot = self.write(makeLayers(), "second", unchanged={1: hashes[1], 2: "edited"})
+
+        self.assertEqual([entry["stored"] for entry in snapshot.manifest["layers"]], [False, True])
+        self.assertEqual(snapshot.unchangedLayerIds(), {1})
+        self.assertEqual(snapshot.layerHashes(), hashes)
+        self.assertFalse([name for name in os.listdir(snapshot.directory) if name.startswith("layer0000")])
+
+        # only the stored layers are checked and read
+        self.assertEqual(snapshot.verify(), 4)
+        stack = list(snapshot.readStack(skip=snapshot.unchangedLayerIds()))
+        self.assertIsNone(stack[0][1])
+        self.assertEqual(stack[1][1].usedInfluences(), [1])
+
+        with self.assertRaises(layerSnapshot.SnapshotError):
+            list(snapshot.readStack())
+
+
+@unittest.skipIf(layerSnapshot is None, "needs mayapy")
+class FingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.record = LayerRecord(1, "base", None, 1.0, True)
+
+    def makeWeights(self, **channels):
+        weights = layerWeights.SparseLayerWeights(4, **channels)
+        weights.setSparse(0, [0, 1], [1.0, 0.5])
+        weights.setSparse(2, [3], [0.25])
+        return weights
+
+    def test_defaultChannels(self):
+        fingerprint = layerSnapshot.fingerprintLayer(self.record, self.makeWeights())
+        self.assertEqual(layerSnapshot.fingerprintLayer(self.record, self.makeWeights(mask=np.ones(4))),
+                         fingerprint)
+        self.assertEqual(layerSnapshot.fingerprintLayer(self.record, self.makeWeights(dq=np.zeros(4))),
+                         fingerprint)
+        self.assertNotEqual(layerSnapshot.fingerprintLayer(self.record, self.makeWeights(mask=[1, 1, 0, 1])),
+                            fingerprint)
+
+    def test_influenceOrder(self):
+        weights = layerWeights.SparseLayerWeights(4, [2, 0, 1])
+        weights.setSparse(2, [3], [0.25])
+        weights.setSparse(0, [0, 1], [1.0, 0.5])
+        self.assertEqual(layerSnapshot.fingerprintLayer(self.record, weights),
+                         layerSnapshot.fingerprintLayer(self.record, self.makeWeights()))
+
+    def test_properties(self):
+        fingerprint = layerSnapshot.fingerprintLayer(self.record, self.makeWeights())
+        for change in ({"name": "arm"}, {"parentId": 3}, {"opacity": 0.5}, {"enabled": False}):
+            self.assertNotEqual(layerSnapshot.fingerprintLayer(self.record._replace(**change), self.makeWeights()),
+                                fingerprint, change)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the dense and sparse layer weights, no scene is needed.
+
+:Revisions:
+"""
+# Build-in
+import contextlib
+import unittest
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.util import layerStack, layerWeights, progress
+    from rig_tools.tool.ngSkinHelperTool.util.layerStack import LayerRecord
+except ImportError:
+    # the modules read Maya, only mayapy runs these tests
+    layerStack = None
+
+NUMBER_OF_VERTICES = 4
+
+
+class MemoryAdapter(layerWeights.WeightsAdapter if layerStack else object):
+    """Keeps the weights of each layer and target, failOn makes the writes of a layer fail."""
+
+    def __init__(self):
+        self.layers = {}
+        self.failOn = None
+
+    def listInfluences(self, mesh, layerId):
+        return [target for target in self.layers.get(layerId, {}) if not isinstance(target, str)]
+
+    def getWeights(self, mesh, layerId, target):
+        return self.layers.get(layerId, {}).get(target, [])
+
+    def setWeights(self, mesh, layerId, target, weights):
+        if layerId == self.failOn:
+            raise RuntimeError("can't write the layer {}".format(layerId))
+        self.layers.setdefault(layerId, {})[target] = weights
+
+
+class MemoryWriter(layerStack.StackWriterBase if layerStack else object):
+    """Makes the layers in a dictionary instead of a plugin."""
+
+    def __init__(self):
+        self.adapter = MemoryAdapter()
+        self.records = {}
+        self.parents = {}
+        self.nextId = 1
+
+    @contextlib.contextmanager
+    def updateContext(self, mesh):
+        yield
+
+    def listLayerIds(self, mesh):
+        return list(self.records)
+
+    def createLayer(self, mesh, record):
+        layerId = self.nextId
+        self.nextId += 1
+        self.records[layerId] = record
+        return layerId
+
+    def setProperties(self, mesh, layerId, record):
+        self.records[layerId] = record
+
+    def setParent(self, mesh, layerId, parentId):
+        self.parents[layerId] = parentId
+
+    def deleteLayer(self, mesh, layerId):
+        del self.records[layerId]
+        self.adapter.layers.pop(layerId, None)
+
+
+def makeStack(numberOfLayers):
+    stack = []
+    for i in range(numberOfLayers):
+        weights = layerWeights.SparseLayerWeights(NUMBER_OF_VERTICES)
+        weights.setSparse(0, [i], [1.0])
+        stack.append((LayerRecord(i + 10, "layer{}".format(i), None, 1.0, True), weights))
+    return stack
+
+
+@unittest.skipIf(layerStack is None, "needs mayapy")
+class StackWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = MemoryWriter()
+
+    def test_write(self):
+        layerIdMap = self.writer.write("body_GEO", makeStack(3))
+        self.assertEqual(layerIdMap, {10: 1, 11: 2, 12: 3})
+        self.assertEqual([self.writer.records[i].name for i in (1, 2, 3)], ["layer0", "layer1", "layer2"])
+        self.assertEqual(self.writer.adapter.layers[2][0], [0.0, 1.0, 0.0, 0.0])
+
+    def test_failedWriteDeletesTheNewLayers(self):
+        # the second layer is made, then its weights fail
+        self.writer.adapter.failOn = 2
+        with self.assertRaises(RuntimeError):
+            self.writer.write("body_GEO", makeStack(3))
+        self.assertEqual(self.writer.records, {})
+        self.assertEqual(self.writer.adapter.layers, {})
+
+    def test_cancelledWriteDeletesTheNewLayers(self):
+        def cancel(record):
+            if record.id == 11:
+                raise progress.CancelledError("cancelled")
+
+        with self.assertRaises(progress.CancelledError):
+            self.writer.write("body_GEO", makeStack(3), progressCallback=cancel)
+        self.assertEqual(self.writer.records, {})
+
+    def test_failedUpdateKeepsThePreviousLayers(self):
+        layerIdMap = self.writer.write("body_GEO", makeStack(2))
+
+        # the previous layers are written in place, the third one is new and fails
+        self.writer.adapter.failOn = 3
+        with self.assertRaises(RuntimeError):
+            self.writer.write("body_GEO", makeStack(3), previous=layerIdMap)
+        self.assertEqual(sorted(self.writer.records), [1, 2])
+
+        # the next write finds them again, nothing is made twice
+        self.writer.adapter.failOn = None
+        self.assertEqual(self.writer.write("body_GEO", makeStack(3), previous=layerIdMap), {10: 1, 11: 2, 12: 4})
+        self.assertEqual(sorted(self.writer.records), [1, 2, 4])
+
+    def test_unchangedLayersKept(self):
+        layerIdMap = self.writer.write("body_GEO", makeStack(2))
+        stack = [(record, None) for record, _ in makeStack(2)]
+        self.assertEqual(self.writer.write("body_GEO", stack, previous=layerIdMap), layerIdMap)
+        self.assertEqual(self.writer.adapter.layers[1][0], [1.0, 0.0, 0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
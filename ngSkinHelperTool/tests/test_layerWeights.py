@@ -0,0 +1,166 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the dense and sparse layer weights, no scene is needed.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.util import layerWeights
+except ImportError:
+    # the module reads Maya, only mayapy runs these tests
+    layerWeights = None
+
+
+@unittest.skipIf(layerWeights is None, "needs mayapy")
+class LayerWeightsTest(unittest.TestCase):
+
+    def test_zeros(self):
+        weights = layerWeights.LayerWeights.zeros(4, [0, 3])
+        self.assertEqual(weights.weights.shape, (4, 2))
+        self.assertEqual(weights.weights.dtype, np.float32)
+        self.assertIn(3, weights)
+        self.assertNotIn(1, weights)
+
+    def test_influenceIsAView(self):
+        weights = layerWeights.LayerWeights.zeros(4, [0, 3])
+        weights.getInfluence(3)[[1, 2]] = 1.0
+        self.assertEqual(weights.weights[:, 1].tolist(), [0.0, 1.0, 1.0, 0.0])
+
+    def test_setInfluenceAddsTheColumn(self):
+        weights = layerWeights.LayerWeights.zeros(3, [0])
+        weights.setInfluence(5, [0.0, 0.5, 1.0])
+        self.assertEqual(weights.influences, [0, 5])
+        self.assertEqual(weights.getInfluence(5).tolist(), [0.0, 0.5, 1.0])
+        self.assertEqual(weights.getInfluence(0).tolist(), [0.0, 0.0, 0.0])
+
+    def test_subset(self):
+        weights = layerWeights.LayerWeights(2, [0, 1], [[0.5, 1.0], [0.25, 0.0]], mask=[1.0, 0.0])
+        subset = weights.subset([1, 7])
+        self.assertEqual(subset.influences, [1, 7])
+        self.assertEqual(subset.weights.tolist(), [[1.0, 0.0], [0.0, 0.0]])
+        self.assertEqual(subset.mask.tolist(), [1.0, 0.0])
+
+    def test_usedInfluences(self):
+        weights = layerWeights.LayerWeights(2, [0, 1, 2], [[0.0, 1.0, 0.0], [0.0, 0.0, 0.5]])
+        self.assertEqual(weights.usedInfluences(), [1, 2])
+
+    def test_copy(self):
+        weights = layerWeights.LayerWeights(2, [0], [[0.5], [0.0]], mask=[1.0, 1.0])
+        copied = weights.copy()
+        copied.weights[0, 0] = 1.0
+        copied.mask[0] = 0.0
+        self.assertEqual(weights.weights[0, 0], 0.5)
+        self.assertEqual(weights.mask[0], 1.0)
+
+    def test_emptyChannel(self):
+        # the plugins return an empty list for a channel that was never painted
+        weights = layerWeights.LayerWeights(2, mask=[], dq=[0.5, 0.5])
+        self.assertIsNone(weights.getChannel(layerWeights.MASK))
+        self.assertEqual(weights.getChannel(layerWeights.DQ).tolist(), [0.5, 0.5])
+
+
+@unittest.skipIf(layerWeights is None, "needs mayapy")
+class SparseLayerWeightsTest(unittest.TestCase):
+
+    def test_setDenseKeepsTheNonZero(self):
+        weights = layerWeights.SparseLayerWeights(5)
+        weights.setDense(2, [0.0, 0.5, 0.0, 0.0, 1.0])
+        indexes, values = weights.getSparse(2)
+        self.assertEqual(indexes.tolist(), [1, 4])
+        self.assertEqual(values.tolist(), [0.5, 1.0])
+        self.assertEqual(weights.denseInfluence(2).tolist(), [0.0, 0.5, 0.0, 0.0, 1.0])
+
+    def test_missingInfluence(self):
+        weights = layerWeights.SparseLayerWeights(3)
+        indexes, values = weights.getSparse(9)
+        self.assertEqual((len(indexes), len(values)), (0, 0))
+        self.assertEqual(weights.denseInfluence(9).tolist(), [0.0, 0.0, 0.0])
+
+    def test_usedInfluences(self):
+        weights = layerWeights.SparseLayerWeights(3, [0, 1])
+        weights.setSparse(1, [2], [0.5])
+        self.assertEqual(weights.influences, [0, 1])
+        self.assertEqual(weights.usedInfluences(), [1])
+        self.assertEqual(weights.numberOfNonZero(), 1)
+
+    def test_nbytes(self):
+        weights = layerWeights.SparseLayerWeights(4, mask=[1.0, 1.0, 1.0, 1.0])
+        weights.setSparse(0, [1, 2], [0.5, 0.5])
+        self.assertEqual(weights.nbytes(), 2 * 4 + 2 * 4 + 4 * 4)
+
+    def test_denseRoundTrip(self):
+        rng = np.random.RandomState(0)
+        matrix = rng.rand(6, 3).astype(np.float32)
+        matrix[rng.rand(6, 3) < 0.5] = 0.0
+        dense = layerWeights.LayerWeights(6, [4, 0, 2], matrix, mask=np.ones(6))
+
+        sparse = dense.toSparse()
+        self.assertEqual(sparse.influences, [4, 0, 2])
+        np.testing.assert_array_equal(sparse.toDense().weights, matrix)
+        np.testing.assert_array_equal(sparse.toDense([2, 4]).weights, matrix[:, [2, 0]])
+        self.assertEqual(sparse.mask.tolist(), [1.0] * 6)
+
+    def test_copyAndSubset(self):
+        weights = layerWeights.SparseLayerWeights(3, mask=[0.5, 0.5, 0.5])
+        weights.setSparse(0, [0], [1.0])
+        weights.setSparse(1, [1], [1.0])
+
+        copied = weights.copy()
+        copied.getSparse(0)[1][0] = 0.0
+        self.assertEqual(weights.getSparse(0)[1].tolist(), [1.0])
+
+        subset = weights.subset([1, 5])
+        self.assertEqual(subset.influences, [1, 5])
+        self.assertEqual(subset.usedInfluences(), [1])
+        self.assertIs(subset.mask, weights.mask)
+
+
+@unittest.skipIf(layerWeights is None, "needs mayapy")
+class StoreTest(unittest.TestCase):
+
+    def test_store(self):
+
+        class MemoryAdapter(layerWeights.WeightsAdapter):
+            # keeps the weights written per target
+            written = {}
+
+            def setWeights(self, mesh, layerId, target, weights):
+                self.written[target] = weights
+
+        weights = layerWeights.SparseLayerWeights(3, mask=[1.0, 0.0, 1.0])
+        weights.setSparse(4, [2], [0.5])
+        adapter = MemoryAdapter()
+        progressCalls = []
+        adapter.store("body_GEO", 1, weights, progressCallback=lambda *args: progressCalls.append(args))
+
+        self.assertEqual(adapter.written, {4: [0.0, 0.0, 0.5], layerWeights.MASK: [1.0, 0.0, 1.0]})
+        self.assertEqual(progressCalls, [(1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
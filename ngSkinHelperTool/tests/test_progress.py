@@ -0,0 +1,277 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the throttling, time estimate and cancellation of the progress reporter.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import progress
+
+
+class Clock(object):
+    """Stands for the time module of progress, the tests move the time by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class RecordingSubscriber(progress.ProgressSubscriber):
+
+    def __init__(self):
+        self.calls = []
+
+    def started(self, state):
+        self.calls.append(("started", state))
+
+    def update(self, state):
+        self.calls.append(("update", state))
+
+    def finished(self, state):
+        self.calls.append(("finished", state))
+
+    def updates(self):
+        return [state for method, state in self.calls if method == "update"]
+
+
+class Widget(object):
+    """Stands for a QWidget, with the few methods the progress bar subscriber calls."""
+
+    def __init__(self, parent=None, enabled=True):
+        self.parent = parent
+        self.enabled = enabled
+        self.visible = False
+        self.value = None
+        self._children = []
+        if parent is not None:
+            parent._children.append(self)
+
+    def parentWidget(self):
+        return self.parent
+
+    def children(self):
+        return list(self._children)
+
+    def isWidgetType(self):
+        return True
+
+    def isEnabled(self):
+        return self.enabled
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def setVisible(self, visible):
+        self.visible = visible
+
+    def setValue(self, value):
+        self.value = value
+
+
+class ProgressTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self._time = progress.time
+        progress.time = self.clock
+
+    def tearDown(self):
+        progress.time = self._time
+
+
+class ProgressReporterTest(ProgressTestCase):
+
+    def setUp(self):
+        super(ProgressReporterTest, self).setUp()
+        self.subscriber = RecordingSubscriber()
+        self.reporter = progress.ProgressReporter([self.subscriber], interval=0.1)
+
+    def test_throttling(self):
+        self.reporter.start(10, "mirror")
+        for _ in range(8):
+            self.clock.now += 0.04
+            self.reporter.advance()
+
+        # the first unit is sent, then one update per interval
+        self.assertEqual([state.done for state in self.subscriber.updates()], [1, 4, 7])
+
+    def test_lastUpdateAlwaysSent(self):
+        self.reporter.start(3)
+        for _ in range(3):
+            self.clock.now += 0.001
+            self.reporter.advance()
+        self.assertEqual([state.done for state in self.subscriber.updates()], [1, 3])
+        self.assertEqual(self.subscriber.updates()[-1].percent, 100.0)
+
+    def test_eta(self):
+        self.reporter.start(10)
+        self.assertIsNone(self.reporter.state().eta)
+
+        self.clock.now += 1.0
+        self.reporter.advance()
+        self.assertAlmostEqual(self.reporter.state().eta, 1.0 * 9)
+
+        # the average follows the latest unit by the smoothing weight
+        self.clock.now += 2.0
+        self.reporter.advance()
+        unitSeconds = 1.0 + progress._SMOOTHING * (2.0 - 1.0)
+        self.assertAlmostEqual(self.reporter.state().eta, unitSeconds * 8)
+
+        # several units at once count as their mean time
+        self.clock.now += 4.0
+        self.reporter.advance(4)
+        unitSeconds += progress._SMOOTHING * (1.0 - unitSeconds)
+        self.assertAlmostEqual(self.reporter.state().eta, unitSeconds * 4)
+
+    def test_state(self):
+        self.reporter.start(4, "convert")
+        self.clock.now += 2.0
+        self.reporter.advance()
+        state = self.reporter.state()
+        self.assertEqual((state.label, state.done, state.total, state.percent), ("convert", 1, 4, 25.0))
+        self.assertAlmostEqual(state.elapsed, 2.0)
+
+        self.reporter.setTotal(2)
+        self.reporter.advance(5)
+        self.assertEqual(self.reporter.state().percent, 100.0)
+        self.assertEqual(self.reporter.state().eta, 0.0)
+
+    def test_taskFinishesOnError(self):
+        with self.assertRaises(RuntimeError):
+            with self.reporter.task(2):
+                raise RuntimeError("failed")
+        self.assertEqual([method for method, _ in self.subscriber.calls], ["started", "finished"])
+
+    def test_withoutSubscribers(self):
+        reporter = progress.ProgressReporter()
+        reporter.start(2)
+        reporter.advance(2)
+        self.assertEqual(reporter.done, 2)
+
+    def test_subscribe(self):
+        other = RecordingSubscriber()
+        self.reporter.subscribe(other)
+        self.reporter.subscribe(other)
+        self.assertEqual(len(self.reporter.subscribers), 2)
+        self.reporter.unsubscribe(other)
+        self.assertEqual(self.reporter.subscribers, [self.subscriber])
+
+
+class CancellationTest(ProgressTestCase):
+
+    def test_cancel(self):
+        token = progress.CancellationToken()
+        reporter = progress.ProgressReporter(token=token)
+        reporter.start(3)
+        reporter.advance()
+
+        token.cancel()
+        with self.assertRaises(progress.CancelledError):
+            reporter.advance()
+        self.assertEqual(reporter.done, 1)
+
+    def test_startResetsTheToken(self):
+        token = progress.CancellationToken()
+        token.cancel()
+        reporter = progress.ProgressReporter(token=token)
+        reporter.start(1)
+        self.assertFalse(token.isCancelled)
+        reporter.advance()
+
+    def test_timeout(self):
+        token = progress.TimeoutToken(5.0)
+        reporter = progress.ProgressReporter(token=token)
+
+        # the deadline counts from the start of the operation
+        self.clock.now += 10.0
+        reporter.start(3)
+        self.clock.now += 4.0
+        reporter.advance()
+
+        self.clock.now += 2.0
+        self.assertTrue(token.isCancelled)
+        with self.assertRaises(progress.CancelledError):
+            reporter.advance()
+
+    def test_timeoutCancel(self):
+        token = progress.TimeoutToken(5.0)
+        token.cancel()
+        self.assertTrue(token.isCancelled)
+        token.reset()
+        self.assertFalse(token.isCancelled)
+
+
+class ProgressBarSubscriberTest(unittest.TestCase):
+
+    def setUp(self):
+        self.window = Widget()
+        self.progressBar = Widget(self.window)
+        self.cancelButton = Widget(self.window)
+        self.tabs = Widget(self.window)
+        self.menu = Widget(self.window)
+        self.reporter = progress.ProgressReporter([progress.ProgressBarSubscriber(self.progressBar,
+                                                                                  self.cancelButton)])
+
+    def test_windowDisabledWhileRunning(self):
+        self.reporter.start(3, "mirror")
+        self.assertTrue(self.progressBar.visible and self.cancelButton.visible)
+        self.assertTrue(self.cancelButton.enabled and self.progressBar.enabled)
+        self.assertFalse(self.tabs.enabled or self.menu.enabled)
+
+        self.reporter.finish()
+        self.assertFalse(self.progressBar.visible or self.cancelButton.visible)
+        self.assertTrue(self.tabs.enabled and self.menu.enabled)
+
+    def test_disabledWidgetStaysDisabled(self):
+        self.menu.enabled = False
+        with self.reporter.task(3, "mirror"):
+            # a second start doesn't forget the widgets of the first one
+            self.reporter.start(3, "mirror")
+            self.assertFalse(self.tabs.enabled)
+        self.assertTrue(self.tabs.enabled)
+        self.assertFalse(self.menu.enabled)
+
+    def test_withoutCancelButton(self):
+        reporter = progress.ProgressReporter([progress.ProgressBarSubscriber(self.progressBar)])
+        with reporter.task(3, "mirror"):
+            self.assertTrue(self.progressBar.visible)
+            self.assertTrue(self.tabs.enabled)
+
+
+class GetReporterTest(unittest.TestCase):
+
+    def test_headless(self):
+        reporter = progress.getReporter()
+        self.assertEqual(reporter.subscribers, [])
+        self.assertIsInstance(reporter.token, progress.CancellationToken)
+
+    def test_token(self):
+        token = progress.TimeoutToken(1.0)
+        self.assertIs(progress.getReporter(token=token).token, token)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the search/replace tokens and the remap tables.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import remapCompiler
+
+
+class RemapTokenTest(unittest.TestCase):
+
+    def test_literal(self):
+        token = remapCompiler.RemapToken("_L", "_R")
+        self.assertEqual(token.kind, remapCompiler.LITERAL)
+        self.assertEqual(token.apply("arm_L_JNT"), "arm_R_JNT")
+        self.assertEqual(token.apply("spine_JNT"), "spine_JNT")
+
+    def test_regex(self):
+        token = remapCompiler.RemapToken("re:^(\\w+)_L$", "\\1_R")
+        self.assertEqual(token.kind, remapCompiler.REGEX)
+        self.assertEqual(token.apply("arm_L"), "arm_R")
+        self.assertEqual(token.apply("arm_L_JNT"), "arm_L_JNT")
+
+    def test_capture(self):
+        token = remapCompiler.RemapToken("*_L_*_JNT", "*_R_*_JNT")
+        self.assertEqual(token.kind, remapCompiler.CAPTURE)
+        self.assertEqual(token.apply("arm_L_01_JNT"), "arm_R_01_JNT")
+        # the search string matches the whole name
+        self.assertEqual(token.apply("arm_L_01_JNT_end"), "arm_L_01_JNT_end")
+
+    def test_captureWithMoreWildcards(self):
+        token = remapCompiler.RemapToken("*_L", "*_R_*")
+        self.assertEqual(token.apply("arm_L"), "arm_R_")
+
+    def test_invalidRegex(self):
+        with self.assertRaises(remapCompiler.RemapError) as raised:
+            remapCompiler.RemapToken("re:(arm", "leg")
+        self.assertEqual(raised.exception.search, "re:(arm")
+        self.assertIsInstance(raised.exception, ValueError)
+
+
+class CompiledRemapTest(unittest.TestCase):
+
+    def test_tokensInOrder(self):
+        remap = remapCompiler.CompiledRemap([["_L", "_R"], ["re:(\\d+)$", "Back\\1"]])
+        self.assertEqual(remap("arm_L1"), "arm_RBack1")
+
+    def test_noneKeepsTheNames(self):
+        remap = remapCompiler.CompiledRemap([["_L", "_R"], None, ["arm", "leg"]])
+        self.assertEqual(remap("arm_L"), "arm_R")
+
+    def test_emptyTable(self):
+        self.assertIsNone(remapCompiler.CompiledRemap([])("arm_L"))
+        self.assertIsNone(remapCompiler.CompiledRemap(None)("arm_L"))
+
+    def test_remap(self):
+        remap = remapCompiler.CompiledRemap([["_L", "_R"]])
+        nameKey = {"arm_L": 0, "arm_R": 1, "leg_L": 2}
+        remapData, missing = remap.remap([0, 2], ["arm_L", "leg_L"], nameKey)
+        self.assertEqual(remapData, {0: 1})
+        self.assertEqual(missing, ["leg_R"])
+
+
+class ValidateTokensTest(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(remapCompiler.validateTokens([["_L", "_R"], ["re:^a", "b"]]), [])
+        self.assertEqual(remapCompiler.validateTokens(None), [])
+
+    def test_everyInvalidToken(self):
+        errors = remapCompiler.validateTokens([["re:(", "a"], ["_L", "_R"], ["re:[", "b"]])
+        self.assertEqual([error.search for error in errors], ["re:(", "re:["])
+
+    def test_stopsAtNone(self):
+        self.assertEqual(remapCompiler.validateTokens([["_L", "_R"], None, ["re:(", "a"]]), [])
+
+
+class CompileRemapTest(unittest.TestCase):
+
+    def test_compiledOnce(self):
+        tokens = [["_L", "_R"]]
+        self.assertIs(remapCompiler.compileRemap(tokens), remapCompiler.compileRemap([["_L", "_R"]]))
+        self.assertIsNot(remapCompiler.compileRemap(tokens), remapCompiler.compileRemap([["_L", "_X"]]))
+
+
+class RemapCacheTest(unittest.TestCase):
+
+    def test_get(self):
+        cache = remapCompiler.RemapCache()
+        nameKey = {"arm_L": 0, "arm_R": 1}
+        remapData, missing = cache.get([["_L", "_R"]], [0], ["arm_L"], nameKey)
+        self.assertEqual(remapData, {0: 1})
+        self.assertEqual(missing, [])
+
+        # a caller changing its table doesn't change the cached one
+        remapData[5] = 5
+        self.assertEqual(cache.get([["_L", "_R"]], [0], ["arm_L"], nameKey)[0], {0: 1})
+
+    def test_newInfluenceSet(self):
+        cache = remapCompiler.RemapCache()
+        cache.get([["_L", "_R"]], [0], ["arm_L"], {"arm_L": 0, "arm_R": 1})
+        remapData, _ = cache.get([["_L", "_R"]], [0], ["arm_L"], {"arm_L": 0, "arm_R": 4})
+        self.assertEqual(remapData, {0: 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the comparison of the skinCluster weights read before and after a conversion.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.util import skinVerification
+except ImportError:
+    # the module reads Maya, only mayapy runs these tests
+    skinVerification = None
+
+
+def skinWeights(influences, weights):
+    return skinVerification.SkinWeights("skinCluster1", influences, np.array(weights, dtype=np.float32))
+
+
+@unittest.skipIf(skinVerification is None, "needs mayapy")
+class CompareSkinWeightsTest(unittest.TestCase):
+
+    def test_identical(self):
+        before = skinWeights(["a", "b"], [[1.0, 0.0], [0.5, 0.5]])
+        result = skinVerification.compareSkinWeights("body_GEO", before, before)
+        self.assertTrue(result.passed)
+        self.assertEqual((result.maxDeviation, result.meanDeviation), (0.0, 0.0))
+        self.assertEqual((result.addedInfluences, result.removedInfluences), ([], []))
+
+    def test_influenceOrder(self):
+        # the columns are matched by name, not by position
+        before = skinWeights(["a", "b"], [[1.0, 0.0], [0.25, 0.75]])
+        after = skinWeights(["b", "a"], [[0.0, 1.0], [0.75, 0.25]])
+        result = skinVerification.compareSkinWeights("body_GEO", before, after)
+        self.assertEqual(result.maxDeviation, 0.0)
+
+    def test_addedAndRemovedInfluences(self):
+        before = skinWeights(["a", "b"], [[1.0, 0.0], [0.5, 0.5]])
+        after = skinWeights(["c", "a"], [[0.0, 1.0], [0.5, 0.5]])
+        result = skinVerification.compareSkinWeights("body_GEO", before, after, numberOfWorst=3)
+
+        self.assertEqual(result.addedInfluences, ["c"])
+        self.assertEqual(result.removedInfluences, ["b"])
+        # b lost 0.5 on vertex 1, c gained 0.5 there, a is unchanged
+        self.assertEqual(result.maxDeviation, 0.5)
+        self.assertAlmostEqual(result.meanDeviation, 1.0 / 6)
+        self.assertEqual(result.worstVertices, [(1, 0.5), (0, 0.0)])
+        self.assertEqual(sorted(result.worstInfluences), [("a", 0.0), ("b", 0.5), ("c", 0.5)])
+        self.assertFalse(result.passed)
+
+    def test_inputsUnchanged(self):
+        before = skinWeights(["a"], [[1.0], [0.5]])
+        after = skinWeights(["a"], [[0.5], [0.5]])
+        skinVerification.compareSkinWeights("body_GEO", before, after)
+        self.assertEqual(after.weights.tolist(), [[0.5], [0.5]])
+        self.assertEqual(before.weights.tolist(), [[1.0], [0.5]])
+
+    def test_worst(self):
+        before = skinWeights(["a", "b", "c"], np.zeros((5, 3)))
+        weights = np.zeros((5, 3))
+        weights[3, 1] = 0.5
+        weights[1, 2] = 0.25
+        weights[4, 0] = 0.002
+        result = skinVerification.compareSkinWeights("body_GEO", before, skinWeights(["a", "b", "c"], weights),
+                                                     numberOfWorst=2)
+        self.assertEqual([vertex for vertex, _ in result.worstVertices], [3, 1])
+        self.assertEqual([name for name, _ in result.worstInfluences], ["b", "c"])
+
+    def test_tolerance(self):
+        before = skinWeights(["a"], [[1.0]])
+        after = skinWeights(["a"], [[0.9995]])
+        self.assertTrue(skinVerification.compareSkinWeights("body_GEO", before, after).passed)
+        self.assertFalse(skinVerification.compareSkinWeights("body_GEO", before, after, tolerance=1e-4).passed)
+
+    def test_vertexCount(self):
+        before = skinWeights(["a"], [[1.0], [1.0]])
+        after = skinWeights(["a"], [[1.0]])
+        with self.assertRaises(ValueError):
+            skinVerification.compareSkinWeights("body_GEO", before, after)
+
+    def test_noWeights(self):
+        empty = skinWeights([], np.zeros((3, 0)))
+        result = skinVerification.compareSkinWeights("body_GEO", empty, empty)
+        self.assertTrue(result.passed)
+        self.assertEqual((result.worstVertices, result.worstInfluences), ([], []))
+
+    def test_report(self):
+        before = skinWeights(["a", "b"], [[1.0, 0.0]])
+        after = skinWeights(["a"], [[0.5]])
+        result = skinVerification.compareSkinWeights("body_GEO", before, after)
+        report = result.formatReport()
+        self.assertIn("FAILED", report)
+        self.assertIn("removed influences: b", report)
+        self.assertEqual(result.toData()["passed"], False)
+
+    def test_unverified(self):
+        # a mesh that lost its skinCluster fails whatever the tolerance
+        result = skinVerification.VerificationResult.unverified("body_GEO", 1.0, "no skinCluster after the conversion")
+        self.assertFalse(result.passed)
+        self.assertEqual(result.toData()["reason"], "no skinCluster after the conversion")
+        self.assertIn("no skinCluster after the conversion", result.formatReport())
+
+
+if __name__ == "__main__":
+    unittest.main()
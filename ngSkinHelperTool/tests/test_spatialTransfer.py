@@ -0,0 +1,138 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the closest point and barycentric transfer between two point sets.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+try:
+    from rig_tools.tool.ngSkinHelperTool.util import spatialTransfer
+except ImportError:
+    # the module reads Maya, only mayapy runs these tests
+    spatialTransfer = None
+
+
+def makeGrid(size):
+    # a flat grid of size x size vertices, two triangles per quad
+    x, z = np.meshgrid(np.arange(size, dtype=np.float32), np.arange(size, dtype=np.float32))
+    points = np.stack([x.ravel(), np.zeros(size * size, dtype=np.float32), z.ravel()], axis=1)
+
+    triangles = []
+    for row in range(size - 1):
+        for column in range(size - 1):
+            a = row * size + column
+            triangles.append((a, a + 1, a + size))
+            triangles.append((a + 1, a + size + 1, a + size))
+    return points, np.array(triangles, dtype=np.int32)
+
+
+@unittest.skipIf(spatialTransfer is None, "needs mayapy")
+class TransferMapTest(unittest.TestCase):
+
+    def test_apply(self):
+        transferMap = spatialTransfer.TransferMap(np.array([[2, 0], [1, 1]]),
+                                                  np.array([[0.5, 0.5], [1.0, 0.0]], dtype=np.float32))
+        self.assertEqual(transferMap.numberOfVertices, 2)
+        self.assertEqual(transferMap.apply([0.0, 0.25, 1.0]).tolist(), [0.5, 0.25])
+
+        # rows x vertices
+        rows = transferMap.apply([[0.0, 0.25, 1.0], [1.0, 0.0, 0.0]])
+        self.assertEqual(rows.tolist(), [[0.5, 0.25], [0.5, 0.0]])
+
+
+@unittest.skipIf(spatialTransfer is None, "needs mayapy")
+class PointLocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.points, self.triangles = makeGrid(4)
+        self.locator = spatialTransfer.PointLocator(self.points, self.triangles)
+
+    def test_closestVertices(self):
+        points = self.points + np.float32(0.1)
+        self.assertEqual(self.locator.closestVertices(points).tolist(), list(range(len(self.points))))
+        self.assertEqual(self.locator.closestVertices([[2.9, 5.0, 0.2]]).tolist(), [3])
+
+    def test_closestVerticesWithoutTree(self):
+        locator = spatialTransfer.PointLocator(self.points)
+        locator._tree = None
+        points = np.array([[0.4, 0.0, 0.4], [2.6, 1.0, 1.2], [-5.0, 0.0, 9.0]], dtype=np.float32)
+        self.assertEqual(locator.closestVertices(points).tolist(), [0, 7, 12])
+
+    def test_closestPointOnTheSamePoints(self):
+        values = np.random.RandomState(0).rand(len(self.points)).astype(np.float32)
+        transferMap = self.locator.transferMap(self.points, spatialTransfer.CLOSEST_POINT)
+        self.assertEqual(transferMap.indexes.shape, (len(self.points), 1))
+        np.testing.assert_array_equal(transferMap.apply(values), values)
+
+    def test_barycentricOnTheSamePoints(self):
+        values = np.random.RandomState(1).rand(len(self.points)).astype(np.float32)
+        transferMap = self.locator.transferMap(self.points, spatialTransfer.BARYCENTRIC)
+        np.testing.assert_allclose(transferMap.apply(values), values, atol=1e-5)
+
+    def test_barycentricInterpolates(self):
+        # a linear field is reproduced inside the triangles and clamped to them outside
+        values = self.points[:, 0] * 0.25
+        points = np.array([[0.5, 0.0, 0.25], [1.75, 0.3, 2.5], [5.0, 0.0, 1.0]], dtype=np.float32)
+        transferMap = self.locator.transferMap(points, spatialTransfer.BARYCENTRIC)
+        np.testing.assert_allclose(transferMap.weights.sum(axis=1), 1.0, atol=1e-6)
+        np.testing.assert_allclose(transferMap.apply(values), [0.125, 0.4375, 0.75], atol=1e-5)
+
+    def test_barycentricWithoutTriangles(self):
+        locator = spatialTransfer.PointLocator(self.points)
+        transferMap = locator.transferMap([[0.9, 0.0, 0.1]], spatialTransfer.BARYCENTRIC)
+        self.assertEqual(transferMap.indexes.tolist(), [[1]])
+
+    def test_vertexWithoutFaces(self):
+        points = np.vstack([self.points, [[10.0, 0.0, 10.0]]])
+        locator = spatialTransfer.PointLocator(points, self.triangles)
+        transferMap = locator.transferMap([[10.0, 1.0, 10.0]], spatialTransfer.BARYCENTRIC)
+        self.assertEqual(transferMap.apply(np.arange(len(points), dtype=np.float32)).tolist(), [len(points) - 1])
+
+
+@unittest.skipIf(spatialTransfer is None, "needs mayapy")
+class GetLocatorTest(unittest.TestCase):
+
+    def tearDown(self):
+        spatialTransfer._LOCATORS.clear()
+
+    def test_builtOncePerKey(self):
+        points, triangles = makeGrid(2)
+        locator = spatialTransfer.getLocator("stamp", points, triangles)
+        self.assertIs(spatialTransfer.getLocator("stamp", None), locator)
+        self.assertIsNot(spatialTransfer.getLocator("other", points), locator)
+
+    def test_oldestDropped(self):
+        points, _ = makeGrid(2)
+        first = spatialTransfer.getLocator(0, points)
+        for key in range(1, spatialTransfer._MAX_LOCATORS + 1):
+            spatialTransfer.getLocator(key, points)
+        self.assertEqual(len(spatialTransfer._LOCATORS), spatialTransfer._MAX_LOCATORS)
+        self.assertIsNot(spatialTransfer.getLocator(0, points), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
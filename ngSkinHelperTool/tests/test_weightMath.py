@@ -0,0 +1,129 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Tests of the in-place paste operations, dense and sparse.
+
+:Revisions:
+"""
+# Build-in
+import unittest
+
+# Third Party
+import numpy as np
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import weightMath, weightClipboard
+
+
+def _sparse(dense):
+    indexes = np.flatnonzero(dense).astype(np.int32)
+    return indexes, dense[indexes]
+
+
+class ApplyInPlaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.target = np.array([0.0, 0.25, 0.5, 1.0], dtype=np.float32)
+        self.values = np.array([0.5, 0.0, 0.75, 0.5], dtype=np.float32)
+
+    def apply(self, operation, factor=1.0):
+        result = weightMath.applyInPlace(self.target, self.values, operation, factor)
+        self.assertIs(result, self.target)
+        return result.tolist()
+
+    def test_replace(self):
+        self.assertEqual(self.apply(weightMath.REPLACE), [0.5, 0.0, 0.75, 0.5])
+
+    def test_addIsClamped(self):
+        self.assertEqual(self.apply(weightMath.ADD), [0.5, 0.25, 1.0, 1.0])
+
+    def test_subtractIsClamped(self):
+        self.assertEqual(self.apply(weightMath.SUBTRACT), [0.0, 0.25, 0.0, 0.5])
+
+    def test_multiply(self):
+        self.assertEqual(self.apply(weightMath.MULTIPLY), [0.0, 0.0, 0.375, 0.5])
+
+    def test_scale(self):
+        self.assertEqual(self.apply(weightMath.SCALE, 2.0), [0.0, 0.5, 1.0, 1.0])
+
+    def test_unknownOperation(self):
+        with self.assertRaises(ValueError):
+            weightMath.applyInPlace(self.target, self.values, "divide")
+
+
+class ApplySparseTest(unittest.TestCase):
+
+    def test_sameAsDense(self):
+        rng = np.random.RandomState(0)
+        for operation in weightMath.OPERATIONS:
+            target = rng.rand(50).astype(np.float32)
+            values = rng.rand(50).astype(np.float32)
+            values[rng.rand(50) < 0.6] = 0.0
+
+            dense = weightMath.applyInPlace(target.copy(), values, operation, 0.5)
+            indexes, nonZero = _sparse(values)
+            sparse = weightMath.applySparse(target.copy(), indexes, nonZero, operation, 0.5)
+            np.testing.assert_allclose(sparse, dense, atol=1e-6, err_msg=operation)
+
+    def test_emptyRow(self):
+        target = np.array([0.5, 1.0], dtype=np.float32)
+        indexes, values = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        self.assertEqual(weightMath.applySparse(target.copy(), indexes, values, weightMath.REPLACE).tolist(),
+                         [0.0, 0.0])
+        self.assertEqual(weightMath.applySparse(target.copy(), indexes, values, weightMath.ADD).tolist(),
+                         [0.5, 1.0])
+
+    def test_unknownOperation(self):
+        with self.assertRaises(ValueError):
+            weightMath.applySparse(np.zeros(2, dtype=np.float32), [0], [1.0], "divide")
+
+
+class ApplyColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.sourceRows = rng.rand(3, 20).astype(np.float32)
+        self.sourceRows[rng.rand(3, 20) < 0.5] = 0.0
+        self.targetBlock = rng.rand(20, 2).astype(np.float32)
+
+    def test_columns(self):
+        # the rows are picked per column, in any order
+        block = weightMath.applyColumns(self.targetBlock.copy(), self.sourceRows, [2, 0], weightMath.ADD)
+        np.testing.assert_allclose(block[:, 0], np.clip(self.targetBlock[:, 0] + self.sourceRows[2], 0.0, 1.0))
+        np.testing.assert_allclose(block[:, 1], np.clip(self.targetBlock[:, 1] + self.sourceRows[0], 0.0, 1.0))
+
+    def test_sparseColumnsSameAsDense(self):
+        entries = [_sparse(row) for row in self.sourceRows]
+        offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(indexes) for indexes, _ in entries])
+        rows = weightClipboard.SparseRows(offsets,
+                                          np.concatenate([indexes for indexes, _ in entries]),
+                                          np.concatenate([values for _, values in entries]),
+                                          self.sourceRows.shape[1])
+        np.testing.assert_array_equal(rows.toDense(), self.sourceRows)
+
+        for operation in weightMath.OPERATIONS:
+            dense = weightMath.applyColumns(self.targetBlock.copy(), self.sourceRows, [1, 2], operation, 0.5)
+            sparse = weightMath.applySparseColumns(self.targetBlock.copy(), rows, [1, 2], operation, 0.5)
+            np.testing.assert_allclose(sparse, dense, atol=1e-6, err_msg=operation)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,261 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Keeps the scriptJob ids and MMessage callback ids the tool creates
+        so they can be removed without scanning every scriptJob in the session.
+
+        Features:
+        - Every job and callback is recorded under an owner key and the callable it runs.
+        - Removing the callbacks of an owner only touches the ids recorded for it.
+        - A diagnostic lists recorded ids that no longer exist and session scriptJobs nobody recorded.
+
+:Revisions:
+"""
+# Build-in
+import logging
+from collections import namedtuple
+
+# Maya modules
+import maya.cmds as cmds
+import maya.OpenMaya as om
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+SCRIPT_JOB = "scriptJob"
+MESSAGE = "MMessage"
+
+CallbackRecord = namedtuple("CallbackRecord", ["owner", "function", "kind", "callbackId", "event"])
+
+
+def _functionName(function):
+    """Get a readable name of the callable, the bound class is included for methods
+
+    :param function: callable
+    :return: str
+    """
+    # bound methods are named by the class defining them, not the class of the instance
+    method = getattr(function, "__func__", None)
+    if method is not None and getattr(method, "__qualname__", None):
+        return method.__qualname__
+
+    name = getattr(function, "__name__", None) or repr(function)
+    instance = getattr(function, "__self__", None)
+    if instance is not None:
+        name = "{}.{}".format(type(instance).__name__, name)
+    return name
+
+
+class CallbackRegistry(object):
+    """Process-wide record of the scriptJobs and MMessage callbacks made by the tool.
+
+        CALLBACK_REGISTRY.addScriptJob("ngSkin2 Helper Tool", self.selectionChangedCallback,
+                                       event="SelectionChanged")
+        CALLBACK_REGISTRY.addMessageCallback("SkinVersionCache", self.invalidate,
+                                             om.MDGMessage.addNodeAddedCallback)
+        CALLBACK_REGISTRY.removeOwner("ngSkin2 Helper Tool")
+        print(CALLBACK_REGISTRY.formatReport())
+    """
+
+    def __init__(self):
+        self._records = {}
+
+    def addScriptJob(self, owner, function, event, **kwargs):
+        """Make a scriptJob running the callable on the event and record its id
+
+        :param owner: str
+            key the job is removed with
+        :param function: callable
+        :param event: str
+            name of the scriptJob event
+        :param kwargs: extra flags given to cmds.scriptJob
+        :return: int
+            the job id
+        """
+        jobId = cmds.scriptJob(event=(event, function), **kwargs)
+        self._add(CallbackRecord(owner, function, SCRIPT_JOB, jobId, event))
+        return jobId
+
+    def addMessageCallback(self, owner, function, addCallback, *args):
+        """Register an MMessage callback and record its id
+
+        :param owner: str
+            key the callback is removed with
+        :param function: callable
+        :param addCallback: callable
+            the MMessage function adding the callback, e.g. om.MDGMessage.addNodeAddedCallback
+        :param args: extra arguments given to addCallback before the callable
+        :return: MCallbackId
+        """
+        callbackArgs = list(args) + [function]
+        callbackId = addCallback(*callbackArgs)
+        self._add(CallbackRecord(owner, function, MESSAGE, callbackId, addCallback.__name__))
+        return callbackId
+
+    def _add(self, record):
+        self._records.setdefault(record.owner, []).append(record)
+
+    def records(self, owner=None, function=None):
+        """Get the recorded callbacks
+
+        :param owner: str
+            all owners if None
+        :param function: callable
+            all callables if None
+        :return: list
+            a list of CallbackRecord
+        """
+        if owner is None:
+            records = [record for owned in self._records.values() for record in owned]
+        else:
+            records = list(self._records.get(owner, []))
+
+        if function is not None:
+            records = [record for record in records if record.function == function]
+        return records
+
+    def remove(self, owner, function=None, deferred=False):
+        """Remove the callbacks recorded for the owner
+
+        :param owner: str
+        :param function: callable
+            only the callbacks running this callable, all of them if None
+        :param deferred: bool
+            kill the scriptJobs on idle, needed when called from inside one of them
+        :return: list
+            the removed records
+        """
+        return self.discard(self.records(owner, function), deferred)
+
+    def discard(self, records, deferred=False):
+        """Remove the callbacks of the records and forget them
+
+        :param records: list
+            a list of CallbackRecord
+        :param deferred: bool
+            kill the scriptJobs on idle, needed when called from inside one of them
+        :return: list
+            the removed records
+        """
+        removed = []
+        for record in records:
+            owned = self._records.get(record.owner, [])
+            if record not in owned:
+                continue
+
+            owned.remove(record)
+            if not owned:
+                del self._records[record.owner]
+
+            self._kill(record, deferred)
+            removed.append(record)
+        return removed
+
+    def removeOwner(self, owner, deferred=False):
+        return self.remove(owner, deferred=deferred)
+
+    def removeAll(self):
+        """Remove every recorded callback
+        """
+        for owner in list(self._records):
+            self.remove(owner)
+
+    def _kill(self, record, deferred):
+        if record.kind == MESSAGE:
+            try:
+                om.MMessage.removeCallback(record.callbackId)
+            except RuntimeError:
+                log.debug("Callback %s of %s was already removed", record.event, record.owner)
+            return
+
+        if not cmds.scriptJob(exists=record.callbackId):
+            return
+
+        if deferred:
+            cmds.evalDeferred("cmds.scriptJob(kill={}, force=True)".format(record.callbackId))
+        else:
+            cmds.scriptJob(kill=record.callbackId, force=True)
+
+    def isAlive(self, record):
+        """Check if the scriptJob of the record still exists, MMessage callbacks can't be queried
+
+        :param record: CallbackRecord
+        :return: bool
+        """
+        if record.kind == MESSAGE:
+            return True
+        return bool(cmds.scriptJob(exists=record.callbackId))
+
+    def findLeaks(self):
+        """Find the callbacks that got out of sync with the session
+
+        :return: tuple
+            (records whose scriptJob was killed behind the registry,
+             scriptJob strings running a recorded callable but not recorded)
+        """
+        records = self.records()
+        stale = [record for record in records if not self.isAlive(record)]
+
+        jobIds = set(record.callbackId for record in records if record.kind == SCRIPT_JOB)
+        names = set(_functionName(record.function) for record in records)
+
+        untracked = []
+        if names:
+            for job in cmds.scriptJob(listJobs=True) or []:
+                jobId, _, body = job.partition(":")
+                try:
+                    if int(jobId) in jobIds:
+                        continue
+                except ValueError:
+                    continue
+                if any(name in body for name in names):
+                    untracked.append(job)
+
+        return stale, untracked
+
+    def formatReport(self):
+        """Make a readable report of the recorded callbacks and the leaks
+
+        :return: str
+        """
+        lines = []
+        for owner in sorted(self._records):
+            lines.append("{} ({} callbacks)".format(owner, len(self._records[owner])))
+            for record in self._records[owner]:
+                lines.append("    {:<10} {:>8}  {:<30} {}".format(record.kind,
+                                                                 record.callbackId
+                                                                 if record.kind == SCRIPT_JOB else "-",
+                                                                 record.event,
+                                                                 _functionName(record.function)))
+
+        stale, untracked = self.findLeaks()
+        for record in stale:
+            lines.append("stale: {} job {} of {} no longer exists".format(record.event,
+                                                                         record.callbackId,
+                                                                         record.owner))
+        for job in untracked:
+            lines.append("leaked: {}".format(job))
+
+        if not lines:
+            lines.append("No callbacks recorded")
+        return "\n".join(lines)
+
+
+CALLBACK_REGISTRY = CallbackRegistry()
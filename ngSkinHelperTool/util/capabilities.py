@@ -0,0 +1,193 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Probes the ngSkinTools plugins once and imports the version-specific
+        ngSkinTools1 / ngSkinTools2 packages only when a tab or an operation first touches them.
+
+        Features:
+        - The plugin probe of each version is memoized for the session.
+        - LazyModule stands in for a module at import time and imports it on the first attribute access.
+        - Every probe and import is timed for the startup report.
+
+:Revisions:
+"""
+# Build-in
+import contextlib
+import importlib
+import logging
+import sys
+import time
+
+# Maya modules
+import maya.cmds as cmds
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+NG1_VERSION = "ngSkinTools1"
+NG2_VERSION = "ngSkinTools2"
+
+PLUGIN_NAMES = {NG1_VERSION: "ngSkinTools",
+                NG2_VERSION: "ngSkinTools2"}
+
+
+class CapabilityRegistry(object):
+    """Memoized plugin probes and module imports of the ngSkinTools versions.
+
+        REGISTRY.hasPlugin(NG2_VERSION)
+        # True
+        REGISTRY.importModule("ngSkinTools2.api")
+        print(REGISTRY.formatReport())
+    """
+
+    def __init__(self):
+        self._plugins = {}
+        self._modules = {}
+        self.timings = []
+
+    def _record(self, label, start):
+        self.timings.append((label, time.time() - start))
+
+    def hasPlugin(self, ngVersion, load=True):
+        """Check if the plugin of the ngSkinTools version is available, probed once per session
+
+        :param ngVersion: str
+            NG1_VERSION or NG2_VERSION
+        :param load: bool
+            try loading the plugin when it is not loaded yet
+        :return: bool
+        """
+        if ngVersion in self._plugins:
+            return self._plugins[ngVersion]
+
+        pluginName = PLUGIN_NAMES.get(ngVersion)
+        if pluginName is None:
+            return False
+
+        start = time.time()
+        available = bool(cmds.pluginInfo(pluginName, query=True, loaded=True))
+        if not available and load:
+            try:
+                cmds.loadPlugin(pluginName, quiet=True)
+                available = True
+            except RuntimeError:
+                pass
+        self._record("plugin {}".format(pluginName), start)
+
+        # a probe that didn't try loading may still succeed with a load later
+        if available or load:
+            self._plugins[ngVersion] = available
+        return available
+
+    @contextlib.contextmanager
+    def timed(self, label):
+        """Time the block into the report
+
+        :param label: str
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._record(label, start)
+
+    def refresh(self):
+        """Forget the plugin probes so they run again on the next query
+        """
+        self._plugins = {}
+
+    def importModule(self, name):
+        """Import the module once and time it
+
+        :param name: str
+            full name of the module
+        :return: module
+        """
+        module = self._modules.get(name)
+        if module is not None:
+            return module
+
+        alreadyLoaded = name in sys.modules
+        start = time.time()
+        module = importlib.import_module(name)
+        if not alreadyLoaded:
+            self._record("import {}".format(name), start)
+
+        self._modules[name] = module
+        return module
+
+    def isImported(self, name):
+        return name in self._modules
+
+    def formatReport(self):
+        """Make a readable report of the plugin probes and imports in the order they ran
+
+        Import times include the submodules a module pulls in on its own.
+
+        :return: str
+        """
+        lines = ["{:>9.1f} ms  {}".format(seconds * 1000.0, label) for label, seconds in self.timings]
+        total = sum(seconds for _, seconds in self.timings)
+        lines.append("{:>9.1f} ms  total".format(total * 1000.0))
+        return "\n".join(lines)
+
+
+REGISTRY = CapabilityRegistry()
+
+
+class LazyModule(object):
+    """Stand-in for a module that is imported on the first attribute access.
+
+        # same as "import ngSkinTools.ui.events" but deferred
+        ngSkinTools = LazyModule("ngSkinTools", submodules=["ngSkinTools.ui.events"])
+
+        # same as "from ngSkinTools2.api.session import session" but deferred
+        session = LazyModule("ngSkinTools2.api.session", attribute="session")
+    """
+
+    def __init__(self, name, attribute=None, submodules=()):
+        self.__dict__["_name"] = name
+        self.__dict__["_attribute"] = attribute
+        self.__dict__["_submodules"] = tuple(submodules)
+        self.__dict__["_target"] = None
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_target"] is not None else "not loaded"
+        return "<LazyModule {} ({})>".format(self.__dict__["_name"], state)
+
+    def _load(self):
+        target = self.__dict__["_target"]
+        if target is not None:
+            return target
+
+        module = REGISTRY.importModule(self.__dict__["_name"])
+        for submodule in self.__dict__["_submodules"]:
+            REGISTRY.importModule(submodule)
+
+        attribute = self.__dict__["_attribute"]
+        target = getattr(module, attribute) if attribute else module
+        self.__dict__["_target"] = target
+        return target
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __setattr__(self, item, value):
+        setattr(self._load(), item, value)
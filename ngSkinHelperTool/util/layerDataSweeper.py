@@ -0,0 +1,270 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Classifies every ngSkinLayerData / ngst2SkinLayerData node in the scene
+        and reports how much each one weighs in a saved file before deleting the orphans.
+
+        Features:
+        - One connection query classifies every layer data node of both versions.
+        - The serialized size is measured from the setAttr commands Maya writes for the node in a .ma file.
+        - Layer and vertex counts are read from the layer data node itself, an orphan has no mesh to ask.
+        - Only the records asked for are measured, the orphans before a sweep.
+        - Orphans are deleted in one batched call.
+
+:Revisions:
+"""
+# Build-in
+import logging
+
+# Maya modules
+import maya.cmds as cmds
+from maya.api import OpenMaya
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import utils
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+
+class LayerDataRecord(object):
+
+    def __init__(self, node, ngVersion, skinCluster=None):
+        """Size accounting of one layer data node.
+
+        Args:
+            node (str): Name of the ngSkinLayerData / ngst2SkinLayerData node.
+            ngVersion (str): Version name of ngSkinTools the node belongs to.
+            skinCluster (str): The skinCluster driving the node, None for an orphan.
+
+        Attributes:
+            mesh (str): The mesh of the skinCluster, None for an orphan.
+            sizeBytes (int): Estimated size of the node in a .ma file.
+            layerCount (int): Number of layers, None when the plugin can't read the node.
+            vertexCount (int): Number of vertices, None when the plugin can't read the node.
+        """
+        self.node = node
+        self.ngVersion = ngVersion
+        self.skinCluster = skinCluster
+
+        self.mesh = None
+        self.sizeBytes = 0
+        self.layerCount = None
+        self.vertexCount = None
+
+    def __repr__(self):
+        return "LayerDataRecord({}, {}, {})".format(self.node, self.ngVersion, formatSize(self.sizeBytes))
+
+    def isOrphan(self):
+        return self.skinCluster is None
+
+
+def formatSize(sizeBytes):
+    """Format the number of bytes into a readable string
+
+    :param sizeBytes: int
+    :return: str
+    """
+    size = float(sizeBytes)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024.0:
+            return "{:.1f} {}".format(size, unit)
+        size /= 1024.0
+    return "{:.1f} GB".format(size)
+
+
+def estimateSerializedSize(node):
+    """Estimate the number of bytes the node takes up in a .ma file.
+
+    Sums the setAttr commands Maya would write for every top-level attribute
+    holding a non-default value, which includes the layer data blob of the plugin.
+
+    :param node: str
+    :return: int
+    """
+    selection = OpenMaya.MSelectionList()
+    selection.add(node)
+    mObject = selection.getDependNode(0)
+    fnNode = OpenMaya.MFnDependencyNode(mObject)
+
+    # the createNode line
+    size = len('createNode {} -n "{}";\n'.format(fnNode.typeName, node))
+
+    for i in range(fnNode.attributeCount()):
+        attr = fnNode.attribute(i)
+
+        # compound children are written by their parent
+        if not OpenMaya.MFnAttribute(attr).parent.isNull():
+            continue
+
+        plug = OpenMaya.MPlug(mObject, attr)
+        try:
+            setAttrCmds = plug.getSetAttrCmds(OpenMaya.MPlug.kNonDefault, False)
+        except RuntimeError:
+            continue
+
+        for cmd in setAttrCmds:
+            # each command is written indented on its own line
+            size += len(cmd) + 2
+
+    return size
+
+
+class LayerDataSweeper(object):
+    """Garbage collection report of the layer data nodes in the scene.
+
+        sweeper = LayerDataSweeper()
+        sweeper.scan(measure=False)
+        sweeper.measure(sweeper.orphans())
+        print(sweeper.formatReport(sweeper.orphans()))
+        sweeper.sweep()
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def scan(self, measure=True):
+        """Classify every layer data node of the loaded ngSkinTools versions
+
+        :param measure: bool
+            estimate the serialized size and the layer/vertex counts of each node
+        :return: list
+            a list of LayerDataRecord
+        """
+        nodeVersions = {}
+        for ngVersion, nodeType in utils.LAYER_DATA_TYPES:
+            if not utils.isVersionAvailable(ngVersion):
+                continue
+            for node in cmds.ls(type=nodeType) or []:
+                nodeVersions[node] = ngVersion
+
+        if not nodeVersions:
+            self.records = []
+            return self.records
+
+        # a single connection query for the nodes of both versions
+        skinClusters = {}
+        pairs = cmds.listConnections(list(nodeVersions), source=True, destination=False,
+                                     connections=True, type="skinCluster") or []
+        for plug, scls in zip(pairs[0::2], pairs[1::2]):
+            skinClusters.setdefault(plug.split(".")[0], scls)
+
+        self.records = [LayerDataRecord(node, nodeVersions[node], skinClusters.get(node))
+                        for node in sorted(nodeVersions)]
+
+        if measure:
+            self.measure()
+
+        return self.records
+
+    def measure(self, records=None):
+        """Estimate the serialized size and read the layer/vertex counts of the records
+
+        :param records: list
+            all scanned records if None
+        :return: list
+            the measured records
+        """
+        if records is None:
+            records = self.records
+
+        mlls = {}
+        for record in records:
+            if record.ngVersion not in mlls:
+                mlls[record.ngVersion] = utils.getMllInterface(record.ngVersion)
+            self._measure(record, mlls[record.ngVersion])
+        return records
+
+    def _measure(self, record, mll):
+        record.sizeBytes = estimateSerializedSize(record.node)
+
+        if not record.isOrphan():
+            shapes = cmds.skinCluster(record.skinCluster, query=True, geometry=True) or []
+            if shapes:
+                record.mesh = (cmds.listRelatives(shapes[0], parent=True) or [shapes[0]])[0]
+
+        # the counts are stored on the data node, an orphan is read the same way as an attached one
+        try:
+            mll.setCurrentMesh(record.node)
+            record.vertexCount = mll.getVertCount()
+            record.layerCount = len(list(mll.listLayers() or []))
+        except RuntimeError as e:
+            log.debug("Can't read the layers of %s: %s", record.node, e)
+
+    def orphans(self):
+        return [record for record in self.records if record.isOrphan()]
+
+    def totalSize(self, records=None):
+        """Get the total estimated size in bytes
+
+        :param records: list
+            all scanned records if None
+        :return: int
+        """
+        if records is None:
+            records = self.records
+        return sum(record.sizeBytes for record in records)
+
+    def formatReport(self, records=None):
+        """Make a readable report sorted by size, heaviest first
+
+        :param records: list
+            all scanned records if None
+        :return: str
+        """
+        if records is None:
+            records = self.records
+
+        lines = []
+        for record in sorted(records, key=lambda r: r.sizeBytes, reverse=True):
+            status = "orphan" if record.isOrphan() else "used by {}".format(record.mesh)
+            lines.append("{:>10}  {}  [{}]  layers: {}  vertices: {}  ({})".format(
+                formatSize(record.sizeBytes),
+                record.node,
+                record.ngVersion,
+                "?" if record.layerCount is None else record.layerCount,
+                "?" if record.vertexCount is None else record.vertexCount,
+                status))
+
+        lines.append("{:>10}  total in {} nodes".format(formatSize(self.totalSize(records)), len(records)))
+        return "\n".join(lines)
+
+    def sweep(self, records=None):
+        """Delete the orphaned layer data nodes in one batched call
+
+        :param records: list
+            records to delete, all scanned orphans if None
+        :return: list
+            the deleted records
+        """
+        if records is None:
+            records = self.orphans()
+
+        records = [record for record in records if record.isOrphan()]
+        if not records:
+            return []
+
+        cmds.delete([record.node for record in records])
+        log.info("Removed %d unused ngSkinLayerData nodes, %s",
+                 len(records), formatSize(self.totalSize(records)))
+
+        deleted = set(id(record) for record in records)
+        self.records = [record for record in self.records if id(record) not in deleted]
+        return records
@@ -0,0 +1,628 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Saves the full layer stack of a mesh to a directory, in a format that doesn't depend
+        on the version of ngSkinTools, and writes it back with either version.
+
+        Features:
+        - manifest.json holds the mesh, vertex count, influence names and the layer hierarchy,
+          names, opacity and enabled state.
+        - The weights of each layer are compressed .npz chunks of up to CHUNK_INFLUENCES influences,
+          an influence is stored as the indexes and values of its non-zero vertices.
+        - The mask and dq of a layer are a chunk of their own.
+        - Layers are exported and imported one at a time, the whole stack is never in memory.
+        - verify() reads every chunk back and checks it against the checksums of the manifest.
+        - Each layer has a content hash of its weights, mask, dq, name, opacity, enabled state and parent.
+        - The target layers of an import are fingerprinted as they read back, the next import checks them
+          before exporting: a layer with the same hash whose target layer is intact isn't saved,
+          verified or written again, the source layer is still read to hash it.
+          The state is only worth saving while the source layers are kept, a conversion that deletes
+          them has no next conversion from the same layers.
+
+:Revisions:
+"""
+# Build-in
+import hashlib
+import json
+import logging
+import os
+import zlib
+
+# Maya modules
+from maya import cmds
+
+# Third Party
+import numpy as np
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import layerWeights, skinVerification
+from rig_tools.tool.ngSkinHelperTool.util.layerStack import LayerRecord
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CHUNK_INFLUENCES = 64
+
+# string attribute of the skinCluster keeping the layers of the last import
+STATE_ATTRIBUTE = "ngSkinHelperConvertState"
+
+INDEX_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _checksum(*arrays):
+    crc = 0
+    for array in arrays:
+        crc = zlib.crc32(np.ascontiguousarray(array).tobytes(), crc)
+    return crc & 0xffffffff
+
+
+def fingerprintLayer(record, weights):
+    """Hash a layer as it reads back from the plugin, to tell later whether it was edited
+
+    A full mask and an empty dq hash the same as no channel, the writers reset a channel that way.
+
+    :param record: LayerRecord
+    :param weights: SparseLayerWeights
+    :return: str
+    """
+    digest = hashlib.sha1()
+    properties = json.dumps([record.name, record.parentId, repr(record.opacity), bool(record.enabled)])
+    digest.update(properties.encode("utf-8"))
+
+    for influence in sorted(weights.usedInfluences()):
+        indexes, values = weights.getSparse(influence)
+        digest.update(np.asarray([influence], dtype=INDEX_DTYPE).tobytes())
+        digest.update(np.ascontiguousarray(indexes, dtype=INDEX_DTYPE).tobytes())
+        digest.update(np.ascontiguousarray(values, dtype=layerWeights.ChannelWeights.DTYPE).tobytes())
+
+    for channel, default in ((layerWeights.MASK, 1.0), (layerWeights.DQ, 0.0)):
+        values = weights.getChannel(channel)
+        if values is None or np.all(values == default):
+            continue
+        digest.update(channel.encode("utf-8"))
+        digest.update(np.ascontiguousarray(values, dtype=layerWeights.ChannelWeights.DTYPE).tobytes())
+
+    return digest.hexdigest()
+
+
+def _layerHash(entry):
+    # the chunk checksums already cover the influence indexes and weights
+    content = json.dumps([[chunk["checksum"] for chunk in entry["chunks"]],
+                          entry["channels"]["checksum"] if entry["channels"] else None,
+                          entry["name"],
+                          entry["parentId"],
+                          repr(entry["opacity"]),
+                          bool(entry["enabled"])])
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class SnapshotWriter(object):
+
+    def __init__(self, directory, mesh, numberOfVertices, influenceNames, sourceVersion=None, unchanged=None):
+        """Writes a layer stack to a snapshot directory, a layer at a time.
+
+        writer = SnapshotWriter("C:/temp/body_snapshot", "body_GEO", 12000, {0: "root_JNT", 1: "spine_JNT"})
+        for record, weights in StackReaderV1().readStack("body_GEO"):
+            writer.addLayer(record, weights)
+        writer.close()
+
+        Args:
+            directory (str): The snapshot directory, made if it doesn't exist.
+            mesh (str): The mesh of the layers.
+            numberOfVertices (int): Number of vertices of the mesh.
+            influenceNames (dict): Influence name of each influence index.
+            sourceVersion (str): The ngSkinTools version the layers come from.
+            unchanged (dict): Content hash of the layers already imported to an intact target layer,
+                a layer with the same hash is listed in the manifest without its files.
+        """
+        self.directory = directory
+        self.unchanged = unchanged or {}
+        self.manifest = {"version": FORMAT_VERSION,
+                         "mesh": mesh,
+                         "sourceVersion": sourceVersion,
+                         "numberOfVertices": int(numberOfVertices),
+                         "influences": dict((str(index), name) for index, name in influenceNames.items()),
+                         "layers": []}
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _saveChunk(self, fileName, arrays):
+        np.savez_compressed(os.path.join(self.directory, fileName), **arrays)
+
+    def addLayer(self, record, weights):
+        """Write the weights of a layer as compressed chunks
+
+        :param record: LayerRecord
+        :param weights: SparseLayerWeights or LayerWeights
+        :return: dict
+            the manifest entry of the layer
+        """
+        layerNumber = len(self.manifest["layers"])
+        influences = weights.usedInfluences()
+
+        # the files are saved once the hash tells the layer changed
+        files = {}
+        chunks = []
+        for chunkNumber, start in enumerate(range(0, len(influences), CHUNK_INFLUENCES)):
+            chunkInfluences = influences[start:start + CHUNK_INFLUENCES]
+
+            indexList = []
+            valueList = []
+            for influence in chunkInfluences:
+                if isinstance(weights, layerWeights.SparseLayerWeights):
+                    indexes, values = weights.getSparse(influence)
+                else:
+                    values = weights.getInfluence(influence)
+                    indexes = np.flatnonzero(values)
+                    values = values[indexes]
+                indexList.append(np.asarray(indexes, dtype=INDEX_DTYPE))
+                valueList.append(np.asarray(values, dtype=layerWeights.ChannelWeights.DTYPE))
+
+            offsets = np.zeros(len(chunkInfluences) + 1, dtype=OFFSET_DTYPE)
+            offsets[1:] = np.cumsum([len(indexes) for indexes in indexList])
+            arrays = {"influences": np.asarray(chunkInfluences, dtype=INDEX_DTYPE),
+                      "offsets": offsets,
+                      "indexes": np.concatenate(indexList),
+                      "values": np.concatenate(valueList)}
+
+            fileName = "layer{:04d}_{:03d}.npz".format(layerNumber, chunkNumber)
+            files[fileName] = arrays
+            chunks.append({"file": fileName,
+                           "influences": len(chunkInfluences),
+                           "nonZero": int(offsets[-1]),
+                           "checksum": _checksum(arrays["influences"], offsets,
+                                                 arrays["indexes"], arrays["values"])})
+
+        channels = {}
+        for channel in layerWeights.CHANNELS:
+            values = weights.getChannel(channel)
+            if values is not None:
+                channels[channel] = np.asarray(values, dtype=layerWeights.ChannelWeights.DTYPE)
+
+        channelEntry = None
+        if channels:
+            fileName = "layer{:04d}_channels.npz".format(layerNumber)
+            files[fileName] = channels
+            channelEntry = {"file": fileName,
+                            "names": sorted(channels),
+                            "checksum": _checksum(*[channels[name] for name in sorted(channels)])}
+
+        entry = {"id": record.id,
+                 "name": record.name,
+                 "parentId": record.parentId,
+                 "opacity": record.opacity,
+                 "enabled": record.enabled,
+                 "chunks": chunks,
+                 "channels": channelEntry}
+        entry["hash"] = _layerHash(entry)
+        entry["stored"] = self.unchanged.get(record.id) != entry["hash"]
+
+        if entry["stored"]:
+            for fileName, arrays in files.items():
+                self._saveChunk(fileName, arrays)
+
+        self.manifest["layers"].append(entry)
+        return entry
+
+    def close(self):
+        """Write the manifest, a snapshot without one is incomplete
+
+        :return: str
+            the manifest path
+        """
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path, "w") as f:
+            json.dump(self.manifest, f, indent=4)
+        return path
+
+
+class Snapshot(object):
+
+    def __init__(self, directory):
+        """A layer stack saved by SnapshotWriter.
+
+        snapshot = Snapshot("C:/temp/body_snapshot")
+        snapshot.verify()
+        StackWriterV2().write("body_GEO", snapshot.readStack())
+
+        Args:
+            directory (str): The snapshot directory.
+        """
+        self.directory = directory
+
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.isfile(path):
+            raise SnapshotError("{} has no manifest, the snapshot is incomplete".format(directory))
+
+        with open(path, "r") as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise SnapshotError("Unknown snapshot version {}".format(self.manifest.get("version")))
+
+    def __len__(self):
+        return len(self.manifest["layers"])
+
+    @property
+    def mesh(self):
+        return self.manifest["mesh"]
+
+    @property
+    def numberOfVertices(self):
+        return self.manifest["numberOfVertices"]
+
+    @property
+    def influenceNames(self):
+        return dict((int(index), name) for index, name in self.manifest["influences"].items())
+
+    def listLayers(self):
+        """Get the layers in the order they were exported
+
+        :return: list
+            a list of LayerRecord
+        """
+        return [LayerRecord(entry["id"], entry["name"], entry["parentId"], entry["opacity"], entry["enabled"])
+                for entry in self.manifest["layers"]]
+
+    def _load(self, fileName):
+        with np.load(os.path.join(self.directory, fileName)) as data:
+            return dict((name, data[name]) for name in data.files)
+
+    def readLayer(self, entry, influenceMap=None):
+        """Read the weights of a layer
+
+        :param entry: dict
+            the manifest entry of the layer
+        :param influenceMap: dict
+            target influence index of each saved influence index, the saved indexes if None
+        :return: SparseLayerWeights
+        """
+        weights = layerWeights.SparseLayerWeights(self.numberOfVertices)
+
+        for chunk in entry["chunks"]:
+            arrays = self._load(chunk["file"])
+            offsets = arrays["offsets"]
+            for i, influence in enumerate(arrays["influences"]):
+                influence = int(influence)
+                if influenceMap is not None:
+                    influence = influenceMap[influence]
+                weights.setSparse(influence,
+                                  arrays["indexes"][offsets[i]:offsets[i + 1]],
+                                  arrays["values"][offsets[i]:offsets[i + 1]])
+
+        if entry["channels"]:
+            for channel, values in self._load(entry["channels"]["file"]).items():
+                weights.setChannel(channel, values)
+        return weights
+
+    def unchangedLayerIds(self):
+        """Get the layers saved without their files, unchanged since the last import
+
+        :return: set
+            saved layer ids
+        """
+        return set(entry["id"] for entry in self.manifest["layers"] if not entry.get("stored", True))
+
+    def layerHashes(self):
+        """Get the content hash of each layer
+
+        :return: dict
+            content hash of each saved layer id
+        """
+        return dict((entry["id"], entry["hash"]) for entry in self.manifest["layers"])
+
+    def readStack(self, influenceMap=None, skip=()):
+        """Read the layers one at a time
+
+        :param influenceMap: dict
+            target influence index of each saved influence index, the saved indexes if None
+        :param skip: set
+            saved layer ids that are not read, their weights are None
+        :return: generator
+            (LayerRecord, SparseLayerWeights) of each layer
+        """
+        for record, entry in zip(self.listLayers(), self.manifest["layers"]):
+            if record.id in skip:
+                yield record, None
+                continue
+
+            if not entry.get("stored", True):
+                raise SnapshotError("The weights of {} were not saved, it was unchanged".format(entry["name"]))
+            yield record, self.readLayer(entry, influenceMap)
+
+    def influenceMap(self, targetNames):
+        """Match the saved influences to the influences of another skinCluster by name
+
+        :param targetNames: dict
+            influence name of each influence index of the target
+        :return: dict
+            target influence index of each saved influence index
+        """
+        targetIndexes = dict((name, index) for index, name in targetNames.items())
+
+        influenceMap = {}
+        missing = []
+        for index, name in self.influenceNames.items():
+            if name in targetIndexes:
+                influenceMap[index] = targetIndexes[name]
+            else:
+                missing.append(name)
+
+        if missing:
+            raise SnapshotError("Influences missing on the target: {}".format(", ".join(sorted(missing))))
+        return influenceMap
+
+    def verify(self):
+        """Read every chunk back and check it against the manifest
+
+        :return: int
+            the number of weights checked
+        """
+        problems = []
+        numberOfWeights = 0
+        numberOfVertices = self.numberOfVertices
+        influences = self.influenceNames
+
+        for entry in self.manifest["layers"]:
+            if not entry.get("stored", True):
+                continue
+
+            label = entry["name"]
+            for chunk in entry["chunks"]:
+                try:
+                    arrays = self._load(chunk["file"])
+                except (IOError, OSError, ValueError) as e:
+                    problems.append("{}: can't read {}: {}".format(label, chunk["file"], e))
+                    continue
+
+                offsets = arrays["offsets"]
+                indexes = arrays["indexes"]
+                values = arrays["values"]
+                if _checksum(arrays["influences"], offsets, indexes, values) != chunk["checksum"]:
+                    problems.append("{}: {} doesn't match its checksum".format(label, chunk["file"]))
+                if len(arrays["influences"]) != chunk["influences"] or int(offsets[-1]) != chunk["nonZero"]:
+                    problems.append("{}: {} doesn't have the weights of the manifest".format(label, chunk["file"]))
+                if np.any(np.diff(offsets) < 0) or len(indexes) != len(values):
+                    problems.append("{}: {} has broken offsets".format(label, chunk["file"]))
+                if len(indexes) and (indexes.min() < 0 or indexes.max() >= numberOfVertices):
+                    problems.append("{}: {} has vertices out of range".format(label, chunk["file"]))
+                if not np.all(np.isfinite(values)):
+                    problems.append("{}: {} has invalid weights".format(label, chunk["file"]))
+
+                unknown = [int(i) for i in arrays["influences"] if int(i) not in influences]
+                if unknown:
+                    problems.append("{}: unknown influences {}".format(label, unknown))
+                numberOfWeights += len(values)
+
+            channelEntry = entry["channels"]
+            if channelEntry:
+                try:
+                    channels = self._load(channelEntry["file"])
+                except (IOError, OSError, ValueError) as e:
+                    problems.append("{}: can't read {}: {}".format(label, channelEntry["file"], e))
+                    continue
+
+                names = channelEntry["names"]
+                if _checksum(*[channels[name] for name in names if name in channels]) != channelEntry["checksum"]:
+                    problems.append("{}: {} doesn't match its checksum".format(label, channelEntry["file"]))
+                if any(len(channels[name]) != numberOfVertices for name in names if name in channels):
+                    problems.append("{}: {} doesn't have a weight per vertex".format(label, channelEntry["file"]))
+
+        if problems:
+            raise SnapshotError("The snapshot {} is broken:\n{}".format(self.directory, "\n".join(problems)))
+        return numberOfWeights
+
+
+def exportStack(reader, mesh, directory, sourceVersion=None, progressCallback=None, unchanged=None):
+    """Save the layer stack of the mesh, a layer at a time
+
+    :param reader: StackReaderV1 or StackReaderV2
+        the reader of the version of the layers
+    :param mesh: str
+    :param directory: str
+        the snapshot directory
+    :param sourceVersion: str
+    :param progressCallback: callable
+        called with the record of each saved layer
+    :param unchanged: dict
+        content hash of each saved layer id whose target layer is intact, see findIntactLayers(),
+        the layers still with that hash are read and hashed but their files aren't saved
+    :return: Snapshot
+    """
+    records = reader.listLayers(mesh)
+    writer = SnapshotWriter(directory,
+                            mesh,
+                            cmds.polyEvaluate(mesh, vertex=True),
+                            reader.influenceNames(mesh),
+                            sourceVersion,
+                            unchanged)
+
+    for record, weights in reader.readStack(mesh, records):
+        writer.addLayer(record, weights)
+        if progressCallback:
+            progressCallback(record)
+
+    writer.close()
+    return Snapshot(directory)
+
+
+def importStack(snapshot, writer, mesh, targetNames=None, progressCallback=None, previous=None):
+    """Write the saved layer stack to the mesh, a layer at a time
+
+    :param snapshot: Snapshot
+    :param writer: StackWriterV1 or StackWriterV2
+        the writer of the version of the new layers
+    :param mesh: str
+    :param targetNames: dict
+        influence name of each influence index of the mesh, to match the influences by name
+        when the mesh isn't the one the snapshot was saved from
+    :param progressCallback: callable
+        called with the record of each written layer
+    :param previous: dict
+        {"layerId": target layer id, ...} of each saved layer id of the last import, see readImportState(),
+        the target layers that still exist are written in place, the layers the snapshot
+        didn't save as unchanged are not written again
+    :return: dict
+        new layer id of each saved layer id
+    """
+    if cmds.polyEvaluate(mesh, vertex=True) != snapshot.numberOfVertices:
+        raise SnapshotError("{} doesn't have the {} vertices of the snapshot".format(mesh, snapshot.numberOfVertices))
+
+    targetIds = {}
+    if previous:
+        existing = set(writer.listLayerIds(mesh))
+        for layerId, state in previous.items():
+            if state["layerId"] in existing:
+                targetIds[layerId] = state["layerId"]
+
+    skip = snapshot.unchangedLayerIds()
+    lost = [layerId for layerId in skip if layerId not in targetIds]
+    if lost:
+        raise SnapshotError("The target layers of the unchanged layers {} are gone".format(sorted(lost)))
+    log.debug("%s: %s of %s layers unchanged", mesh, len(skip), len(snapshot))
+
+    influenceMap = snapshot.influenceMap(targetNames) if targetNames is not None else None
+    return writer.write(mesh, snapshot.readStack(influenceMap, skip), progressCallback, targetIds)
+
+
+def findIntactLayers(reader, mesh, previous):
+    """Find the target layers of the last import that are still as they were written
+
+    :param reader: StackReaderV1 or StackReaderV2
+        the reader of the version of the target layers
+    :param mesh: str
+    :param previous: dict
+        the last import, see readImportState()
+    :return: tuple(dict, dict)
+        content hash and target layer fingerprint of each saved layer id whose target layer
+        wasn't edited since, the fingerprints are passed on to writeImportState()
+    """
+    if not previous:
+        return {}, {}
+
+    try:
+        records = dict((record.id, record) for record in reader.listLayers(mesh))
+    except RuntimeError:
+        # the mesh has no layer data of the target version anymore
+        return {}, {}
+
+    hashes = {}
+    fingerprints = {}
+    for layerId, state in previous.items():
+        record = records.get(state["layerId"])
+        if record is None or not state.get("fingerprint"):
+            continue
+        if fingerprintLayer(record, reader.readLayer(mesh, record)) == state["fingerprint"]:
+            hashes[layerId] = state["hash"]
+            fingerprints[layerId] = state["fingerprint"]
+
+    log.debug("%s: %s of %s target layers intact", mesh, len(hashes), len(previous))
+    return hashes, fingerprints
+
+
+def readImportState(mesh, key):
+    """Get the layers of the last import saved on the skinCluster of the mesh
+
+    :param mesh: str
+    :param key: str
+        the kind of import, e.g. the version the layers come from
+    :return: dict
+        {"layerId": target layer id, "hash": content hash, "fingerprint": target layer hash}
+        of each saved layer id
+    """
+    skinCluster = skinVerification.getSkinCluster(mesh)
+    if skinCluster is None or not cmds.attributeQuery(STATE_ATTRIBUTE, node=skinCluster, exists=True):
+        return {}
+
+    data = json.loads(cmds.getAttr("{}.{}".format(skinCluster, STATE_ATTRIBUTE)) or "{}")
+    # json keys are strings
+    return dict((int(layerId), state) for layerId, state in data.get(key, {}).items())
+
+
+def writeImportState(mesh, key, snapshot, layerIdMap, reader, fingerprints=None):
+    """Save the layers of an import on the skinCluster of the mesh, for the next import.
+    Only the written target layers are read back for their fingerprint.
+
+    :param mesh: str
+    :param key: str
+        the kind of import, e.g. the version the layers come from
+    :param snapshot: Snapshot
+    :param layerIdMap: dict
+        new layer id of each saved layer id, as returned by importStack()
+    :param reader: StackReaderV1 or StackReaderV2
+        the reader of the version of the target layers
+    :param fingerprints: dict
+        fingerprint of the intact target layers read before the import, see findIntactLayers(),
+        the layers not written again keep theirs
+    """
+    skinCluster = skinVerification.getSkinCluster(mesh)
+    if skinCluster is None:
+        return
+
+    unchanged = snapshot.unchangedLayerIds()
+    fingerprints = dict((layerId, fingerprint) for layerId, fingerprint in (fingerprints or {}).items()
+                        if layerId in unchanged)
+
+    written = [(layerId, newLayerId) for layerId, newLayerId in layerIdMap.items() if layerId not in fingerprints]
+    if written:
+        records = dict((record.id, record) for record in reader.listLayers(mesh))
+        for layerId, newLayerId in written:
+            if newLayerId in records:
+                fingerprints[layerId] = fingerprintLayer(records[newLayerId],
+                                                         reader.readLayer(mesh, records[newLayerId]))
+
+    plug = "{}.{}".format(skinCluster, STATE_ATTRIBUTE)
+    if not cmds.attributeQuery(STATE_ATTRIBUTE, node=skinCluster, exists=True):
+        cmds.addAttr(skinCluster, longName=STATE_ATTRIBUTE, dataType="string")
+        data = {}
+    else:
+        data = json.loads(cmds.getAttr(plug) or "{}")
+
+    hashes = snapshot.layerHashes()
+    data[key] = dict((str(layerId), {"layerId": newLayerId,
+                                     "hash": hashes[layerId],
+                                     "fingerprint": fingerprints.get(layerId)})
+                     for layerId, newLayerId in layerIdMap.items())
+    cmds.setAttr(plug, json.dumps(data), type="string")
+
+
+def clearImportState(mesh, key):
+    """Forget the last import of this kind, e.g. once its source layers are deleted
+
+    :param mesh: str
+    :param key: str
+        the kind of import, e.g. the version the layers come from
+    """
+    skinCluster = skinVerification.getSkinCluster(mesh)
+    if skinCluster is None or not cmds.attributeQuery(STATE_ATTRIBUTE, node=skinCluster, exists=True):
+        return
+
+    plug = "{}.{}".format(skinCluster, STATE_ATTRIBUTE)
+    data = json.loads(cmds.getAttr(plug) or "{}")
+    if data.pop(key, None) is not None:
+        cmds.setAttr(plug, json.dumps(data), type="string")
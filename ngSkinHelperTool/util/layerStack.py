@@ -0,0 +1,451 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Reads and writes the whole layer stack of a mesh with either version of ngSkinTools,
+        the conversion reads it with one version and writes it with the other.
+
+        Features:
+        - The layers, their parents, opacity and enabled state come from one listLayers query
+          and the python api, no MEL command string is built or evaluated.
+        - The stack is read one layer at a time, only the layer being converted is in memory.
+        - The writers make the new layers inside one batch update and reparent them by the new ids.
+        - Given the layers of the last write, the writers only write the changed layers again.
+        - benchmarkV1Extraction() compares the throughput with the MEL based extraction it replaces.
+
+:Revisions:
+"""
+# Build-in
+from collections import namedtuple
+import json
+import logging
+import time
+
+# Maya modules
+from maya import cmds, mel
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util import layerWeights
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
+
+# ngSkinTools2 modules
+ngSkinTools2 = LazyModule("ngSkinTools2", submodules=["ngSkinTools2.mllInterface"])
+ngst_api = LazyModule("ngSkinTools2.api")
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+LayerRecord = namedtuple("LayerRecord", ["id", "name", "parentId", "opacity", "enabled"])
+
+
+class StackReaderV1(object):
+
+    def __init__(self, adapter=None):
+        """Bulk reader of the ngSkinTools1 layer stack of a mesh.
+
+        reader = StackReaderV1()
+        for record, weights in reader.readStack("body_GEO"):
+            print(record.name, len(weights.usedInfluences()))
+
+        Args:
+            adapter (MllAdapterV1): The adapter reading the weights, made if None.
+        """
+        self.adapter = adapter or layerWeights.MllAdapterV1()
+
+    @property
+    def mll(self):
+        return self.adapter.mll
+
+    def influenceNames(self, mesh):
+        """Get the influence name of each influence index
+
+        :param mesh: str
+        :return: dict
+        """
+        self.mll.setCurrentMesh(mesh)
+        return dict((info.logicalIndex, info.path.rsplit("|", 1)[-1]) for info in self.mll.listInfluenceInfo())
+
+    def listLayers(self, mesh):
+        """Get the layers of the mesh sorted by id
+
+        :param mesh: str
+        :return: list
+            a list of LayerRecord
+        """
+        mll = self.mll
+        mll.setCurrentMesh(mesh)
+
+        records = []
+        for layerId, layerName, parentId in mll.listLayers():
+            layerId = int(layerId)
+            records.append(LayerRecord(layerId,
+                                       layerName,
+                                       int(parentId) or None,
+                                       mll.getLayerOpacity(layerId),
+                                       mll.isLayerEnabled(layerId)))
+        return sorted(records, key=lambda record: record.id)
+
+    def readLayer(self, mesh, record, channels=layerWeights.CHANNELS):
+        """Read the active influences and channels of a layer, only the non-zero weights are kept
+
+        :param mesh: str
+        :param record: LayerRecord
+        :param channels: list
+        :return: SparseLayerWeights
+        """
+        return self.adapter.load(mesh, record.id, channels=channels, sparse=True)
+
+    def readStack(self, mesh, records=None):
+        """Read the layers one at a time
+
+        :param mesh: str
+        :param records: list
+            the layers to read, every layer of the mesh if None
+        :return: generator
+            (LayerRecord, SparseLayerWeights) of each layer
+        """
+        if records is None:
+            records = self.listLayers(mesh)
+
+        for record in records:
+            yield record, self.readLayer(mesh, record)
+
+
+class StackReaderV2(StackReaderV1):
+
+    def __init__(self, adapter=None):
+        """Bulk reader of the ngSkinTools2 layer stack of a mesh, the same interface as StackReaderV1.
+
+        Args:
+            adapter (LayersAdapterV2): The adapter reading the weights, made if None.
+        """
+        super(StackReaderV2, self).__init__(adapter or layerWeights.LayersAdapterV2())
+        self._mll2 = None
+
+    @property
+    def mll(self):
+        if self._mll2 is None:
+            self._mll2 = ngSkinTools2.mllInterface.MllInterface()
+        return self._mll2
+
+    def influenceNames(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+        listInfInfo = json.loads(self.mll.ngSkinLayerCmd(q=True, influenceInfo=True))
+        return dict((info["index"], info["path"].split("|")[-1]) for info in listInfInfo)
+
+    def listLayers(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+
+        records = []
+        for layer in self.mll.listLayers():
+            records.append(LayerRecord(layer["id"],
+                                       layer["name"],
+                                       layer["parentId"],
+                                       layer["opacity"],
+                                       layer["enabled"]))
+        return sorted(records, key=lambda record: record.id)
+
+
+class StackWriterBase(object):
+    """Writes a layer stack as the layers of a mesh through self.adapter,
+    the subclasses talk to the plugin of each version.
+
+    The first write makes every layer. Given the target layer of each read layer of the last write,
+    a layer read without weights is kept as it is, the others are written again in place
+    and the target layers of the read layers that are gone are deleted.
+    A write that fails or is cancelled deletes the layers it made, the next write doesn't find them twice.
+    """
+
+    def getReader(self):
+        """Get the reader of the layers this writer makes
+
+        :return: StackReaderV1 or StackReaderV2
+        """
+        pass
+
+    def initLayers(self, mesh):
+        pass
+
+    def updateContext(self, mesh):
+        pass
+
+    def listLayerIds(self, mesh):
+        pass
+
+    def createLayer(self, mesh, record):
+        pass
+
+    def setProperties(self, mesh, layerId, record):
+        pass
+
+    def setParent(self, mesh, layerId, parentId):
+        pass
+
+    def deleteLayer(self, mesh, layerId):
+        pass
+
+    def replaceWeights(self, mesh, layerId, weights):
+        """Write the weights over the ones of an existing layer, the influences and channels
+        the new weights don't have are reset
+
+        :param mesh: str
+        :param layerId: int
+        :param weights: SparseLayerWeights or LayerWeights
+        """
+        adapter = self.adapter
+        numberOfVertices = weights.numberOfVertices
+
+        for influence in adapter.listInfluences(mesh, layerId):
+            if influence not in weights:
+                adapter.setWeights(mesh, layerId, influence, [0.0] * numberOfVertices)
+
+        # a full mask and an empty dq deform the same as no channel at all
+        for channel, value in ((layerWeights.MASK, 1.0), (layerWeights.DQ, 0.0)):
+            if weights.getChannel(channel) is None and adapter.getWeights(mesh, layerId, channel):
+                adapter.setWeights(mesh, layerId, channel, [value] * numberOfVertices)
+
+        adapter.store(mesh, layerId, weights)
+
+    def write(self, mesh, stack, progressCallback=None, previous=None):
+        """Make or update a layer for each read layer inside one update
+
+        :param mesh: str
+        :param stack: iterable
+            (LayerRecord, SparseLayerWeights) of each layer, parented once they are all made,
+            the weights are None for a layer unchanged since the last write
+        :param progressCallback: callable
+            called with the record of each written layer
+        :param previous: dict
+            target layer id of each read layer id of the last write, the target layers must exist
+        :return: dict
+            new layer id of each read layer id
+        """
+        previous = previous or {}
+        self.initLayers(mesh)
+
+        layerIdMap = {}
+        parents = []
+        created = set()
+        createdIds = []
+        changed = set()
+        try:
+            with self.updateContext(mesh):
+                for record, weights in stack:
+                    layerId = previous.get(record.id)
+                    if layerId is None:
+                        layerId = self.createLayer(mesh, record)
+                        createdIds.append(layerId)
+                        self.adapter.store(mesh, layerId, weights)
+                        created.add(record.id)
+                    elif weights is not None:
+                        self.replaceWeights(mesh, layerId, weights)
+
+                    if weights is not None:
+                        self.setProperties(mesh, layerId, record)
+                        changed.add(record.id)
+
+                    layerIdMap[record.id] = layerId
+                    parents.append((record.id, record.parentId))
+                    if progressCallback:
+                        progressCallback(record)
+
+                # the new layers may not get the ids of the old ones,
+                # a kept layer only moves when its parent was made again
+                for layerId, parentId in parents:
+                    if layerId in changed or parentId in created:
+                        self.setParent(mesh, layerIdMap[layerId], layerIdMap.get(parentId))
+
+                for layerId, targetId in previous.items():
+                    if layerId not in layerIdMap:
+                        self.deleteLayer(mesh, targetId)
+        except Exception:
+            # the layers written in place are still the targets of the last write, the new ones go
+            self._deleteLayers(mesh, createdIds)
+            raise
+
+        return layerIdMap
+
+    def _deleteLayers(self, mesh, layerIds):
+        for layerId in reversed(layerIds):
+            try:
+                self.deleteLayer(mesh, layerId)
+            except RuntimeError as e:
+                log.warning("Can't delete the layer %s of %s: %s", layerId, mesh, e)
+
+
+class StackWriterV1(StackWriterBase):
+
+    def __init__(self, adapter=None):
+        """Writes a layer stack as the ngSkinTools1 layers of a mesh.
+
+        StackWriterV1().write("body_GEO", StackReaderV2().readStack("body_GEO"))
+
+        Args:
+            adapter (MllAdapterV1): The adapter writing the weights, made if None.
+        """
+        self.adapter = adapter or layerWeights.MllAdapterV1()
+
+    @property
+    def mll(self):
+        return self.adapter.mll
+
+    def getReader(self):
+        return StackReaderV1(self.adapter)
+
+    def initLayers(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+        self.mll.initLayers()
+
+    def updateContext(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+        return self.mll.batchUpdateContext()
+
+    def listLayerIds(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+        try:
+            return [int(layerId) for layerId, _, _ in self.mll.listLayers()]
+        except RuntimeError:
+            # the mesh has no layer data yet
+            return []
+
+    def createLayer(self, mesh, record):
+        self.mll.setCurrentMesh(mesh)
+        return self.mll.createLayer(record.name, forceEmpty=True)
+
+    def setProperties(self, mesh, layerId, record):
+        mll = self.mll
+        mll.setCurrentMesh(mesh)
+        mll.setLayerName(layerId, record.name)
+        mll.setLayerOpacity(layerId, record.opacity)
+        mll.setLayerEnabled(layerId, record.enabled)
+
+    def setParent(self, mesh, layerId, parentId):
+        self.mll.setCurrentMesh(mesh)
+        self.mll.setLayerParent(layerId, parentId or 0)
+
+    def deleteLayer(self, mesh, layerId):
+        self.mll.setCurrentMesh(mesh)
+        self.mll.deleteLayer(layerId)
+
+
+class StackWriterV2(StackWriterBase):
+
+    def __init__(self):
+        """Writes a layer stack as the ngSkinTools2 layers of a mesh.
+
+        StackWriterV2().write("body_GEO", StackReaderV1().readStack("body_GEO"))
+        """
+        self._mll2 = None
+        self._layers = None
+        self.adapter = layerWeights.LayersAdapterV2()
+
+    @property
+    def mll(self):
+        if self._mll2 is None:
+            self._mll2 = ngSkinTools2.mllInterface.MllInterface()
+        return self._mll2
+
+    def getReader(self):
+        return StackReaderV2(self.adapter)
+
+    def initLayers(self, mesh):
+        self._layers = ngst_api.init_layers(mesh)
+
+    def updateContext(self, mesh):
+        return ngst_api.suspend_updates(mesh)
+
+    def listLayerIds(self, mesh):
+        self.mll.setCurrentMesh(mesh)
+        try:
+            return [layer["id"] for layer in self.mll.listLayers()]
+        except RuntimeError:
+            # the mesh has no layer data yet
+            return []
+
+    def createLayer(self, mesh, record):
+        return self._layers.add(name=record.name, forceEmpty=True).id
+
+    def setProperties(self, mesh, layerId, record):
+        layer = self.adapter.getLayer(mesh, layerId)
+        layer.name = record.name
+        layer.opacity = record.opacity
+        layer.enabled = record.enabled
+
+    def setParent(self, mesh, layerId, parentId):
+        self.mll.setCurrentMesh(mesh)
+        self.mll.setLayerParent(layerId, parentId or 0)
+
+    def deleteLayer(self, mesh, layerId):
+        cmds.ngst2Layers(mesh, removeLayer=True, id=layerId)
+
+
+def _melReadLayer(mesh, layerId):
+    # the extraction before StackReaderV1, kept for the benchmark
+    opacity = mel.eval("ngSkinLayer -id {0:d} -q -opacity {1:s}".format(layerId, mesh))
+    enabled = mel.eval("ngSkinLayer -id {0:d} -q -enabled {1:s}".format(layerId, mesh))
+
+    command = "ngSkinLayer -id {0:d} -paintTarget {1} -q -w {2:s}"
+    weights = {"mask": mel.eval(command.format(layerId, "mask", mesh)),
+               "dq": mel.eval(command.format(layerId, "dq", mesh))}
+
+    influences = mel.eval("ngSkinLayer -id {0} -q -listLayerInfluences -activeInfluences {1}".format(layerId,
+                                                                                                     mesh)) or []
+    for influence in influences[1::2]:
+        weights[int(influence)] = mel.eval(command.format(layerId, influence, mesh))
+    return opacity, enabled, weights
+
+
+def benchmarkV1Extraction(mesh, repeat=1):
+    """Compare the MEL based extraction with StackReaderV1 on the layers of the mesh, nothing is written
+
+        print(layerStack.benchmarkV1Extraction("face_GEO"))
+
+    :param mesh: str
+        a mesh with ngSkinTools1 layers
+    :param repeat: int
+    :return: str
+        a readable report
+    """
+    reader = StackReaderV1()
+    records = reader.listLayers(mesh)
+
+    start = time.time()
+    numberOfInfluences = 0
+    for _ in range(repeat):
+        for record in records:
+            _, _, weights = _melReadLayer(mesh, record.id)
+            numberOfInfluences += len(weights) - 2
+    melSeconds = (time.time() - start) / repeat
+    numberOfInfluences //= repeat
+
+    start = time.time()
+    for _ in range(repeat):
+        for _, weights in reader.readStack(mesh, records):
+            pass
+    apiSeconds = (time.time() - start) / repeat
+
+    def throughput(seconds):
+        return numberOfInfluences / seconds if seconds else 0.0
+
+    return "\n".join(["{}: {} layers, {} influences, {} runs".format(mesh, len(records),
+                                                                    numberOfInfluences, repeat),
+                      "{:<8} {:>9.3f} sec  {:>9.1f} influences/sec".format("mel", melSeconds,
+                                                                           throughput(melSeconds)),
+                      "{:<8} {:>9.3f} sec  {:>9.1f} influences/sec".format("api", apiSeconds,
+                                                                           throughput(apiSeconds))])
@@ -0,0 +1,471 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Holds the weights of a layer as one float32 vertices x influences matrix
+        with the mask and dual quaternion channels, and moves it in and out of
+        ngSkinTools1 / ngSkinTools2 layers in bulk.
+
+        Features:
+        - The copy paste, clipboard, convert and region weight code share the same matrix.
+        - SparseLayerWeights keeps only the non-zero weights of each influence for rigs with
+          hundreds of influences, a dense column is only made at the plugin boundary.
+        - The plugins are read and written once per influence, the lists they take and
+          return are converted to arrays as a whole.
+        - The adapter of each version hides whether the layer is reached
+          through the MllInterface of ngSkinTools1 or the api.layers of ngSkinTools2.
+
+:Revisions:
+"""
+# Build-in
+import logging
+
+# Maya modules
+import maya.cmds as cmds
+import numpy as np
+
+# Local modules
+from rig_tools.tool.ngSkinHelperTool.util.capabilities import LazyModule
+
+# ngSkinTools1 modules
+ngSkinTools = LazyModule("ngSkinTools", submodules=["ngSkinTools.mllInterface"])
+
+# ngSkinTools2 modules
+layers = LazyModule("ngSkinTools2.api.layers")
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+# paint targets of the channels, the same names in both versions
+MASK = "mask"
+DQ = "dq"
+CHANNELS = (MASK, DQ)
+
+
+class ChannelWeights(object):
+    """Mask and dual quaternion channels shared by the dense and sparse weights,
+    the channels stay dense as they usually cover the whole mesh.
+    """
+
+    DTYPE = np.float32
+
+    def __init__(self, numberOfVertices, mask=None, dq=None):
+        self.numberOfVertices = numberOfVertices
+        self.mask = self._asChannel(mask)
+        self.dq = self._asChannel(dq)
+
+    def _asChannel(self, values):
+        # the plugins return an empty list for a channel that was never painted
+        if values is None or not len(values):
+            return None
+        return np.asarray(values, dtype=self.DTYPE)
+
+    def getChannel(self, channel):
+        return self.mask if channel == MASK else self.dq
+
+    def setChannel(self, channel, values):
+        if channel == MASK:
+            self.mask = self._asChannel(values)
+        else:
+            self.dq = self._asChannel(values)
+
+
+class LayerWeights(ChannelWeights):
+
+    def __init__(self, numberOfVertices, influences=None, weights=None, mask=None, dq=None):
+        """Weights of a layer.
+
+        # weights of two influences on a 4 vertex mesh
+        layerWeights = LayerWeights.zeros(4, [0, 3])
+        layerWeights.getInfluence(3)[[1, 2]] = 1.0
+
+        Args:
+            numberOfVertices (int): Number of vertices of the mesh.
+            influences (list): Influence indexes, one column of the matrix each.
+            weights (numpy.ndarray): vertices x influences matrix, zeros if None.
+            mask (numpy.ndarray): Mask weights, None when the layer has no mask.
+            dq (numpy.ndarray): Dual quaternion weights, None when the layer has none.
+        """
+        super(LayerWeights, self).__init__(numberOfVertices, mask, dq)
+        self.influences = list(influences or [])
+
+        if weights is None:
+            weights = np.zeros((numberOfVertices, len(self.influences)), dtype=self.DTYPE)
+        self.weights = np.asarray(weights, dtype=self.DTYPE)
+
+        self._columns = dict((influence, column) for column, influence in enumerate(self.influences))
+
+    def __repr__(self):
+        return "LayerWeights({} vertices, {} influences)".format(self.numberOfVertices, len(self.influences))
+
+    def __len__(self):
+        return len(self.influences)
+
+    def __contains__(self, influence):
+        return influence in self._columns
+
+    @classmethod
+    def zeros(cls, numberOfVertices, influences):
+        return cls(numberOfVertices, influences)
+
+    def column(self, influence):
+        return self._columns[influence]
+
+    def setDense(self, influence, values):
+        self.setInfluence(influence, values)
+
+    def denseInfluence(self, influence):
+        return self.getInfluence(influence)
+
+    def getInfluence(self, influence):
+        """Get the weights of the influence, a view of the matrix column
+
+        :param influence: int
+        :return: numpy.ndarray
+        """
+        return self.weights[:, self._columns[influence]]
+
+    def setInfluence(self, influence, values):
+        """Set the weights of the influence, the column is added when missing
+
+        :param influence: int
+        :param values: list or numpy.ndarray
+        """
+        if influence not in self._columns:
+            self.addInfluences([influence])
+        self.weights[:, self._columns[influence]] = values
+
+    def addInfluences(self, influences):
+        """Add empty columns for the influences not in the matrix yet
+
+        :param influences: list
+        """
+        missing = [influence for influence in influences if influence not in self._columns]
+        if not missing:
+            return
+
+        for influence in missing:
+            self._columns[influence] = len(self.influences)
+            self.influences.append(influence)
+
+        extra = np.zeros((self.numberOfVertices, len(missing)), dtype=self.DTYPE)
+        self.weights = np.hstack([self.weights, extra])
+
+    def subset(self, influences):
+        """Get the weights of the influences as a new object, missing influences are zeros
+
+        :param influences: list
+        :return: LayerWeights
+        """
+        result = LayerWeights(self.numberOfVertices, influences, mask=self.mask, dq=self.dq)
+        for column, influence in enumerate(influences):
+            if influence in self._columns:
+                result.weights[:, column] = self.weights[:, self._columns[influence]]
+        return result
+
+    def usedInfluences(self):
+        """Get the influences with at least one non-zero weight
+
+        :return: list
+        """
+        used = np.any(self.weights != 0.0, axis=0)
+        return [influence for influence, isUsed in zip(self.influences, used) if isUsed]
+
+    def copy(self):
+        return LayerWeights(self.numberOfVertices,
+                            self.influences,
+                            self.weights.copy(),
+                            None if self.mask is None else self.mask.copy(),
+                            None if self.dq is None else self.dq.copy())
+
+    def toSparse(self):
+        sparse = SparseLayerWeights(self.numberOfVertices, mask=self.mask, dq=self.dq)
+        for column, influence in enumerate(self.influences):
+            sparse.setDense(influence, self.weights[:, column])
+        return sparse
+
+
+class SparseLayerWeights(ChannelWeights):
+
+    INDEX_DTYPE = np.int32
+
+    def __init__(self, numberOfVertices, influences=None, mask=None, dq=None):
+        """Weights of a layer stored per influence as the indexes and values of its non-zero vertices.
+        Rigs with hundreds of influences only touch a small region with each of them,
+        a dense column is only made when the weights go to the plugin.
+
+        # a joint weighting 3 vertices of a 300k vertex mesh keeps 3 indexes and 3 values
+        sparse = SparseLayerWeights(300000)
+        sparse.setSparse(12, [10, 11, 12], [1.0, 0.5, 0.25])
+
+        Args:
+            numberOfVertices (int): Number of vertices of the mesh.
+            influences (list): Influence indexes, empty until their weights are set.
+            mask (numpy.ndarray): Mask weights, None when the layer has no mask.
+            dq (numpy.ndarray): Dual quaternion weights, None when the layer has none.
+        """
+        super(SparseLayerWeights, self).__init__(numberOfVertices, mask, dq)
+        self.influences = []
+        self._entries = {}
+
+        for influence in influences or []:
+            self.setSparse(influence, [], [])
+
+    def __repr__(self):
+        return "SparseLayerWeights({} vertices, {} influences, {} non-zero)".format(self.numberOfVertices,
+                                                                                   len(self.influences),
+                                                                                   self.numberOfNonZero())
+
+    def __len__(self):
+        return len(self.influences)
+
+    def __contains__(self, influence):
+        return influence in self._entries
+
+    def setSparse(self, influence, indexes, values):
+        """Set the non-zero weights of the influence
+
+        :param influence: int
+        :param indexes: list or numpy.ndarray
+            vertex indexes
+        :param values: list or numpy.ndarray
+            weight of each vertex index
+        """
+        if influence not in self._entries:
+            self.influences.append(influence)
+        self._entries[influence] = (np.asarray(indexes, dtype=self.INDEX_DTYPE),
+                                    np.asarray(values, dtype=self.DTYPE))
+
+    def setDense(self, influence, values):
+        """Set the weights of the influence from a value per vertex, only the non-zero ones are kept
+
+        :param influence: int
+        :param values: list or numpy.ndarray
+        """
+        values = np.asarray(values, dtype=self.DTYPE)
+        indexes = np.flatnonzero(values)
+        self.setSparse(influence, indexes, values[indexes])
+
+    def getSparse(self, influence):
+        """Get the non-zero weights of the influence, empty arrays if it isn't stored
+
+        :param influence: int
+        :return: tuple
+            (vertex indexes, values)
+        """
+        entry = self._entries.get(influence)
+        if entry is None:
+            return np.zeros(0, dtype=self.INDEX_DTYPE), np.zeros(0, dtype=self.DTYPE)
+        return entry
+
+    def denseInfluence(self, influence):
+        """Make a value per vertex for the influence
+
+        :param influence: int
+        :return: numpy.ndarray
+        """
+        dense = np.zeros(self.numberOfVertices, dtype=self.DTYPE)
+        indexes, values = self.getSparse(influence)
+        dense[indexes] = values
+        return dense
+
+    def usedInfluences(self):
+        return [influence for influence in self.influences if len(self._entries[influence][0])]
+
+    def numberOfNonZero(self):
+        return sum(len(indexes) for indexes, _ in self._entries.values())
+
+    def nbytes(self):
+        """Get the memory used by the weights and channels
+
+        :return: int
+        """
+        size = sum(indexes.nbytes + values.nbytes for indexes, values in self._entries.values())
+        for channel in (self.mask, self.dq):
+            if channel is not None:
+                size += channel.nbytes
+        return size
+
+    def subset(self, influences):
+        result = SparseLayerWeights(self.numberOfVertices, mask=self.mask, dq=self.dq)
+        for influence in influences:
+            indexes, values = self.getSparse(influence)
+            result.setSparse(influence, indexes, values)
+        return result
+
+    def copy(self):
+        result = SparseLayerWeights(self.numberOfVertices,
+                                    mask=None if self.mask is None else self.mask.copy(),
+                                    dq=None if self.dq is None else self.dq.copy())
+        for influence in self.influences:
+            indexes, values = self._entries[influence]
+            result.setSparse(influence, indexes.copy(), values.copy())
+        return result
+
+    def toDense(self, influences=None):
+        """Make a dense LayerWeights, meant for small meshes or a few influences
+
+        :param influences: list
+            all of the stored influences if None
+        :return: LayerWeights
+        """
+        if influences is None:
+            influences = self.influences
+
+        dense = LayerWeights(self.numberOfVertices, influences, mask=self.mask, dq=self.dq)
+        for column, influence in enumerate(influences):
+            indexes, values = self.getSparse(influence)
+            dense.weights[indexes, column] = values
+        return dense
+
+
+class WeightsAdapter(object):
+    """Bulk load and store of LayerWeights and SparseLayerWeights, the subclasses talk to the plugin of each version.
+    """
+
+    def listInfluences(self, mesh, layerId):
+        pass
+
+    def getWeights(self, mesh, layerId, target):
+        pass
+
+    def setWeights(self, mesh, layerId, target, weights):
+        pass
+
+    def load(self, mesh, layerId, influences=None, channels=CHANNELS, sparse=False):
+        """Read the weights of a layer
+
+        :param mesh: str
+        :param layerId: int
+        :param influences: list
+            influence indexes to read, the influences used by the layer if None
+        :param channels: list
+            the channels to read among MASK and DQ
+        :param sparse: bool
+            keep only the non-zero weights of each influence as soon as it is read
+        :return: LayerWeights or SparseLayerWeights
+        """
+        if influences is None:
+            influences = self.listInfluences(mesh, layerId)
+
+        numberOfVertices = cmds.polyEvaluate(mesh, vertex=True)
+        if sparse:
+            layerWeights = SparseLayerWeights(numberOfVertices, influences)
+        else:
+            layerWeights = LayerWeights.zeros(numberOfVertices, influences)
+
+        for influence in influences:
+            values = self.getWeights(mesh, layerId, influence)
+
+            # an influence without weights on the layer reads as empty
+            if values is not None and len(values):
+                layerWeights.setDense(influence, values)
+
+        for channel in channels:
+            layerWeights.setChannel(channel, self.getWeights(mesh, layerId, channel))
+
+        return layerWeights
+
+    def store(self, mesh, layerId, layerWeights, influences=None, channels=CHANNELS, progressCallback=None):
+        """Write the weights to a layer
+
+        :param mesh: str
+        :param layerId: int
+        :param layerWeights: LayerWeights or SparseLayerWeights
+        :param influences: list
+            influence indexes to write, all of the influences of layerWeights if None
+        :param channels: list
+            the channels to write among MASK and DQ, a channel that is None is skipped
+        :param progressCallback: callable
+            called with the number of influences written and the total
+        """
+        if influences is None:
+            influences = layerWeights.influences
+
+        total = len(influences)
+        for i, influence in enumerate(influences, 1):
+            # the only place a sparse influence is made dense
+            self.setWeights(mesh, layerId, influence, layerWeights.denseInfluence(influence).tolist())
+            if progressCallback:
+                progressCallback(i, total)
+
+        for channel in channels:
+            values = layerWeights.getChannel(channel)
+            if values is not None:
+                self.setWeights(mesh, layerId, channel, values.tolist())
+
+
+class MllAdapterV1(WeightsAdapter):
+
+    def __init__(self, mll=None, undoEnabled=True):
+        """Adapter of the ngSkinTools1 MllInterface.
+
+        Args:
+            mll (MllInterface): made on the first use if None.
+            undoEnabled (bool): Record the writes in the undo queue.
+        """
+        self._mll = mll
+        self.undoEnabled = undoEnabled
+
+    @property
+    def mll(self):
+        if self._mll is None:
+            self._mll = ngSkinTools.mllInterface.MllInterface()
+        return self._mll
+
+    def listInfluences(self, mesh, layerId):
+        self.mll.setCurrentMesh(mesh)
+        return [index for _, index in self.mll.listLayerInfluences(layerId)]
+
+    def getWeights(self, mesh, layerId, target):
+        self.mll.setCurrentMesh(mesh)
+        return self.mll.getInfluenceWeights(layerId, target)
+
+    def setWeights(self, mesh, layerId, target, weights):
+        self.mll.setCurrentMesh(mesh)
+        self.mll.setInfluenceWeights(layerId, target, weights, self.undoEnabled)
+
+
+class LayersAdapterV2(WeightsAdapter):
+
+    def __init__(self, *layerObjects):
+        """Adapter of the ngSkinTools2 api.layers.
+
+        Args:
+            layerObjects (Layer): Layer objects already at hand, the others are made on the first use.
+        """
+        self._layers = {}
+        for layer in layerObjects:
+            self._layers[(layer.mesh, layer.id)] = layer
+
+    def getLayer(self, mesh, layerId):
+        # made once per mesh and layer instead of on every read and write
+        key = (mesh, layerId)
+        if key not in self._layers:
+            self._layers[key] = layers.Layer(mesh, layerId)
+        return self._layers[key]
+
+    def listInfluences(self, mesh, layerId):
+        return list(self.getLayer(mesh, layerId).get_used_influences())
+
+    def getWeights(self, mesh, layerId, target):
+        return self.getLayer(mesh, layerId).get_weights(target)
+
+    def setWeights(self, mesh, layerId, target, weights):
+        self.getLayer(mesh, layerId).set_weights(target, weights)
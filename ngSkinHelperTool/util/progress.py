@@ -0,0 +1,338 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Progress of the long operations, reported to subscribers instead of a widget.
+
+        Features:
+        - The operations count units of work, the subscribers get throttled updates of the progress.
+        - The estimated time left comes from the timing of the units done so far.
+        - A cancellation token stops an operation at the next unit, from the Cancel button of the window
+          or from a timeout in headless runs.
+        - ProgressBarSubscriber drives the progress bar of the UI and disables the rest of the window
+          while the operation runs, LoggingSubscriber writes to a logger,
+          a reporter without subscribers costs next to nothing in headless runs and benchmarks.
+
+:Revisions:
+"""
+# Build-in
+from collections import namedtuple
+import contextlib
+import logging
+import time
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+# seconds between two updates sent to the subscribers
+DEFAULT_INTERVAL = 0.1
+
+# weight of the latest unit in the average time of a unit
+_SMOOTHING = 0.3
+
+ProgressState = namedtuple("ProgressState", ["label", "done", "total", "percent", "elapsed", "eta"])
+
+
+class CancelledError(Exception):
+    pass
+
+
+class CancellationToken(object):
+    """Shared between the one asking to stop and the running operation.
+
+        token = CancellationToken()
+        reporter = ProgressReporter(token=token)
+        # from a button or another thread
+        token.cancel()
+    """
+
+    def __init__(self):
+        self._cancelled = False
+
+    @property
+    def isCancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def reset(self):
+        self._cancelled = False
+
+    def raiseIfCancelled(self):
+        if self.isCancelled:
+            raise CancelledError("The operation was cancelled")
+
+
+class TimeoutToken(CancellationToken):
+
+    def __init__(self, seconds):
+        """Cancels by itself when an operation runs longer than the seconds, counted from the last reset.
+        It is checked between two units, a single call to the plugin isn't interrupted.
+
+        Args:
+            seconds (float): The longest an operation may run.
+        """
+        super(TimeoutToken, self).__init__()
+        self.seconds = seconds
+        self._deadline = time.time() + seconds
+
+    @property
+    def isCancelled(self):
+        return self._cancelled or time.time() > self._deadline
+
+    def reset(self):
+        super(TimeoutToken, self).reset()
+        self._deadline = time.time() + self.seconds
+
+    def raiseIfCancelled(self):
+        if self._cancelled:
+            raise CancelledError("The operation was cancelled")
+        if time.time() > self._deadline:
+            raise CancelledError("The operation took more than {} sec".format(self.seconds))
+
+
+class ProgressSubscriber(object):
+    """Receives the progress of a reporter, this one ignores it."""
+
+    def started(self, state):
+        pass
+
+    def update(self, state):
+        pass
+
+    def finished(self, state):
+        pass
+
+
+class ProgressBarSubscriber(ProgressSubscriber):
+
+    def __init__(self, progressBar, cancelButton=None):
+        """Shows the progress on a progress bar of the UI while an operation runs.
+
+        Args:
+            progressBar (QProgressBar): The progress bar of the main window.
+            cancelButton (QPushButton): Shown next to the progress bar, the pending events are
+                processed on each update so a click reaches it. The other widgets of the window
+                are disabled meanwhile, nothing else can be run, edited or clicked.
+        """
+        self.progressBar = progressBar
+        self.cancelButton = cancelButton
+
+        # the widgets disabled by started, enabled again by finished
+        self._disabled = None
+
+    def _setVisible(self, visible):
+        self.progressBar.setVisible(visible)
+        if self.cancelButton is not None:
+            self.cancelButton.setVisible(visible)
+
+    def _setWindowEnabled(self, enabled):
+        if enabled:
+            for widget in self._disabled or []:
+                widget.setEnabled(True)
+            self._disabled = None
+            return
+
+        window = self.progressBar.parentWidget()
+        if window is None or self._disabled is not None:
+            return
+
+        # a disabled parent disables the cancel button too, only the widgets next to it are disabled
+        keep = (self.progressBar, self.cancelButton)
+        self._disabled = [child for child in window.children()
+                          if child.isWidgetType() and child not in keep and child.isEnabled()]
+        for widget in self._disabled:
+            widget.setEnabled(False)
+
+    def started(self, state):
+        self.progressBar.setValue(0)
+        self._setVisible(True)
+
+        if self.cancelButton is not None:
+            self._setWindowEnabled(False)
+
+    def update(self, state):
+        self.progressBar.setValue(state.percent)
+
+        if self.cancelButton is not None:
+            from PySide2 import QtWidgets
+            QtWidgets.QApplication.processEvents()
+
+    def finished(self, state):
+        self._setVisible(False)
+        self._setWindowEnabled(True)
+
+
+class LoggingSubscriber(ProgressSubscriber):
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """Writes the progress to a logger, for mayapy runs.
+
+        Args:
+            logger (logging.Logger): The logger, this module's logger if None.
+            level (int): The level of the messages.
+        """
+        self.logger = logger or log
+        self.level = level
+
+    def started(self, state):
+        self.logger.log(self.level, "%s: started, %d units", state.label, state.total)
+
+    def update(self, state):
+        self.logger.log(self.level, "%s: %d/%d (%.0f%%), %.1f sec left", state.label, state.done, state.total,
+                        state.percent, state.eta or 0.0)
+
+    def finished(self, state):
+        self.logger.log(self.level, "%s: %d/%d in %.1f sec", state.label, state.done, state.total, state.elapsed)
+
+
+class ProgressReporter(object):
+
+    def __init__(self, subscribers=None, token=None, interval=DEFAULT_INTERVAL):
+        """Counts the units of work of an operation and reports them to the subscribers.
+
+        reporter = ProgressReporter([LoggingSubscriber()])
+        with reporter.task(len(layers), "mirror"):
+            for layer in layers:
+                mirrorLayer(layer)
+                reporter.advance()
+
+        Args:
+            subscribers (list): The ProgressSubscriber objects to report to.
+            token (CancellationToken): Checked at each unit, made if None.
+            interval (float): The least seconds between two updates, the last one is always sent.
+        """
+        self.subscribers = list(subscribers or [])
+        self.token = token or CancellationToken()
+        self.interval = interval
+
+        self.label = ""
+        self.total = 0
+        self.done = 0
+        self._start = None
+        self._lastUnit = None
+        self._lastUpdate = None
+        self._unitSeconds = None
+
+    def subscribe(self, subscriber):
+        if subscriber not in self.subscribers:
+            self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def _notify(self, method):
+        state = self.state()
+        for subscriber in self.subscribers:
+            getattr(subscriber, method)(state)
+
+    def state(self):
+        """Get the progress of the current operation
+
+        :return: ProgressState
+        """
+        elapsed = time.time() - self._start if self._start is not None else 0.0
+        percent = 100.0 * self.done / self.total if self.total else 0.0
+
+        eta = None
+        if self._unitSeconds is not None:
+            eta = self._unitSeconds * max(0, self.total - self.done)
+        return ProgressState(self.label, self.done, self.total, min(percent, 100.0), elapsed, eta)
+
+    def start(self, total, label=""):
+        """Start counting the units of an operation, a cancel of the previous operation is forgotten
+
+        :param total: int
+            the number of units
+        :param label: str
+        """
+        self.token.reset()
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._start = self._lastUnit = time.time()
+        self._lastUpdate = None
+        self._unitSeconds = None
+        self._notify("started")
+
+    def setTotal(self, total):
+        """Change the number of units once the operation knows it
+
+        :param total: int
+        """
+        self.total = total
+
+    def advance(self, units=1):
+        """Count units as done, the subscribers are updated at most once per interval
+
+        Raises CancelledError when the token was cancelled.
+
+        :param units: int
+        """
+        self.token.raiseIfCancelled()
+
+        now = time.time()
+        if units:
+            seconds = (now - self._lastUnit) / units
+            if self._unitSeconds is None:
+                self._unitSeconds = seconds
+            else:
+                self._unitSeconds += _SMOOTHING * (seconds - self._unitSeconds)
+        self._lastUnit = now
+        self.done += units
+
+        if not self.subscribers:
+            return
+        if self._lastUpdate is None or now - self._lastUpdate >= self.interval or self.done >= self.total:
+            self._lastUpdate = now
+            self._notify("update")
+
+    def finish(self):
+        self._notify("finished")
+
+    @contextlib.contextmanager
+    def task(self, total, label=""):
+        """Count the units of an operation, finished even when it fails or is cancelled
+
+        :param total: int
+        :param label: str
+        """
+        self.start(total, label)
+        try:
+            yield self
+        finally:
+            self.finish()
+
+
+def getReporter(parent=None, token=None):
+    """Make the reporter of a controller, shown on the progress bar of the parent when it has one
+
+    :param parent: QWidget
+        the main window holding progressBar, cancelButton and cancelToken, None when headless
+    :param token: CancellationToken
+        the cancelToken of the parent if None
+    :return: ProgressReporter
+    """
+    subscribers = []
+    progressBar = getattr(parent, "progressBar", None)
+    if progressBar is not None:
+        subscribers.append(ProgressBarSubscriber(progressBar, getattr(parent, "cancelButton", None)))
+    return ProgressReporter(subscribers, token or getattr(parent, "cancelToken", None))
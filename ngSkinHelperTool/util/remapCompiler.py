@@ -0,0 +1,262 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Compiles the search/replace table of the CopyPaste tab into a reusable
+        function mapping a source influence name to a destination influence name.
+
+        Features:
+        - Literal tokens replace every occurrence of the search string.
+              "_L_"          ->  "_R_"
+        - Regex tokens start with "re:", the replace string can use the groups with \\1 or \\g<name>.
+              "re:^(\\w+)_L$"  ->  "\\1_R"
+        - Capture tokens use "*" as a wildcard matching the whole name,
+          each "*" of the replace string is filled in with the matching part in order.
+              "*_L_*_JNT"    ->  "*_R_*_JNT"
+        - The remap table of an influence set and a token list is computed once and cached.
+        - A token that doesn't compile raises RemapError when the table is compiled, before any weight is read.
+
+:Revisions:
+"""
+# Build-in
+import logging
+import re
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+REGEX_PREFIX = "re:"
+WILDCARD = "*"
+
+LITERAL = "literal"
+REGEX = "regex"
+CAPTURE = "capture"
+
+
+class RemapError(ValueError):
+
+    def __init__(self, search, reason):
+        super(RemapError, self).__init__("Invalid search pattern \"{}\": {}".format(search, reason))
+        self.search = search
+        self.reason = reason
+
+
+class RemapToken(object):
+
+    def __init__(self, search, replace):
+        """One row of the search/replace table.
+
+        Args:
+            search (str): The search string, a regex with the "re:" prefix or a "*" pattern.
+            replace (str): The replace string.
+        """
+        self.search = search
+        self.replace = replace
+        self.pattern = None
+
+        if search.startswith(REGEX_PREFIX):
+            self.kind = REGEX
+            try:
+                self.pattern = re.compile(search[len(REGEX_PREFIX):])
+            except re.error as e:
+                raise RemapError(search, e)
+        elif WILDCARD in search:
+            self.kind = CAPTURE
+            parts = [re.escape(part) for part in search.split(WILDCARD)]
+            self.pattern = re.compile("^{}$".format("(.*?)".join(parts)))
+            self._replaceParts = replace.split(WILDCARD)
+        else:
+            self.kind = LITERAL
+
+    def __repr__(self):
+        return "RemapToken({}, {!r} -> {!r})".format(self.kind, self.search, self.replace)
+
+    def apply(self, name):
+        """Apply the token to the name, a name the token doesn't match is returned as it is
+
+        :param name: str
+        :return: str
+        """
+        if self.kind == LITERAL:
+            return name.replace(self.search, self.replace)
+
+        if self.kind == REGEX:
+            return self.pattern.sub(self.replace, name)
+
+        match = self.pattern.match(name)
+        if match is None:
+            return name
+
+        groups = list(match.groups())
+        result = [self._replaceParts[0]]
+        for part in self._replaceParts[1:]:
+            # a replace string with more "*" than the search string gets empty strings
+            result.append(groups.pop(0) if groups else "")
+            result.append(part)
+        return "".join(result)
+
+
+class CompiledRemap(object):
+
+    def __init__(self, tokenList):
+        """Mapping function made from the token list of the search/replace table.
+
+        # the same rules as the table, rows are applied in order
+        remap = compileRemap([["_L", "_R"], ["re:(\\d+)$", "Back\\1"]])
+        remap("arm_L1")
+        # Result: "arm_RBack1"
+
+        Args:
+            tokenList (list): Pairs of search and replace strings, None in the list keeps the names as they are.
+        """
+        self.tokens = []
+
+        for token in tokenList or []:
+            if token is None:
+                # the names are kept as they are from this token on
+                break
+            self.tokens.append(RemapToken(*token))
+
+        self.enabled = bool(tokenList)
+
+    def __call__(self, name):
+        """Map the source influence name to the destination one
+
+        :param name: str
+        :return: str
+            None when the table is empty
+        """
+        if not self.enabled:
+            return None
+
+        for token in self.tokens:
+            name = token.apply(name)
+        return name
+
+    def remap(self, infIdList, infNameList, nameKey):
+        """Map the source influences to the destination influence indexes
+
+        :param infIdList: list
+            source influence indexes
+        :param infNameList: list
+            source influence names
+        :param nameKey: dict
+            influence index of each influence name of the mesh
+        :return: tuple
+            (destination index of each source index, missing destination names)
+        """
+        remapData = {}
+        missing = []
+        for srcId, srcName in zip(infIdList, infNameList):
+            dstName = self(srcName)
+            if not dstName:
+                continue
+
+            dstId = nameKey.get(dstName)
+            if dstId is None:
+                missing.append(dstName)
+                continue
+            remapData[srcId] = dstId
+        return remapData, missing
+
+
+def validateTokens(tokenList):
+    """Find the tokens of the table that don't compile, every token is checked
+
+    :param tokenList: list
+    :return: list
+        a RemapError per invalid token, empty when the table is valid
+    """
+    errors = []
+    for token in tokenList or []:
+        if token is None:
+            break
+        try:
+            RemapToken(*token)
+        except RemapError as e:
+            errors.append(e)
+    return errors
+
+
+def _tokenKey(tokenList):
+    return tuple(None if token is None else tuple(token) for token in tokenList or [])
+
+
+_COMPILED = {}
+_MAX_COMPILED = 256
+
+
+def compileRemap(tokenList):
+    """Get the compiled remap of the token list, compiled once per token list
+
+    :param tokenList: list
+    :return: CompiledRemap
+    """
+    key = _tokenKey(tokenList)
+    compiled = _COMPILED.get(key)
+    if compiled is None:
+        if len(_COMPILED) >= _MAX_COMPILED:
+            _COMPILED.clear()
+        compiled = CompiledRemap(tokenList)
+        _COMPILED[key] = compiled
+    return compiled
+
+
+class RemapCache(object):
+    """Remap tables memoized per influence set and token list.
+
+    The live match count asks for the same table on every edit of the search/replace table,
+    only a new influence set or a new token list computes it again.
+    """
+
+    MAX_SIZE = 64
+
+    def __init__(self):
+        self._tables = {}
+
+    def clear(self):
+        self._tables = {}
+
+    def get(self, tokenList, infIdList, infNameList, nameKey):
+        """Get the remap table of the influences
+
+        :param tokenList: list
+        :param infIdList: list
+            source influence indexes
+        :param infNameList: list
+            source influence names
+        :param nameKey: dict
+            influence index of each influence name of the mesh
+        :return: tuple
+            (destination index of each source index, missing destination names)
+        """
+        key = (_tokenKey(tokenList),
+               tuple(infIdList),
+               tuple(infNameList),
+               frozenset(nameKey.items()))
+
+        table = self._tables.get(key)
+        if table is None:
+            if len(self._tables) >= self.MAX_SIZE:
+                self._tables.clear()
+            table = compileRemap(tokenList).remap(infIdList, infNameList, nameKey)
+            self._tables[key] = table
+
+        remapData, missing = table
+        return dict(remapData), list(missing)
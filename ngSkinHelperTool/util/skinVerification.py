@@ -0,0 +1,221 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Checks that a converted mesh still deforms the same, by comparing the weights
+        of its skinCluster before and after the conversion.
+
+        Features:
+        - The skinCluster weights are read in one bulk call into a vertices x influences matrix.
+        - The influences are matched by name, an influence only on one side counts as zeros on the other.
+        - The report tells the max and mean deviation, the worst vertices and the worst influences.
+
+:Revisions:
+"""
+# Build-in
+from collections import namedtuple
+import logging
+
+# Maya modules
+from maya import cmds
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+
+# Third Party
+import numpy as np
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 1e-3
+NUMBER_OF_WORST = 10
+
+SkinWeights = namedtuple("SkinWeights", ["skinCluster", "influences", "weights"])
+
+
+def getSkinCluster(mesh):
+    skinClusters = cmds.ls(cmds.listHistory(mesh) or [], type="skinCluster")
+    return skinClusters[0] if skinClusters else None
+
+
+def readSkinWeights(mesh):
+    """Read the weights of every vertex and influence of the skinCluster of the mesh
+
+    :param mesh: str
+    :return: SkinWeights
+        None when the mesh has no skinCluster
+    """
+    skinCluster = getSkinCluster(mesh)
+    if skinCluster is None:
+        return None
+
+    selection = om2.MSelectionList()
+    selection.add(skinCluster)
+    selection.add(mesh)
+    skinFn = oma2.MFnSkinCluster(selection.getDependNode(0))
+    meshPath = selection.getDagPath(1)
+
+    componentFn = om2.MFnSingleIndexedComponent()
+    components = componentFn.create(om2.MFn.kMeshVertComponent)
+    componentFn.setCompleteData(om2.MFnMesh(meshPath).numVertices)
+
+    weights, numberOfInfluences = skinFn.getWeights(meshPath, components)
+    influences = [path.partialPathName().split("|")[-1] for path in skinFn.influenceObjects()]
+
+    matrix = np.array(weights, dtype=np.float32).reshape(-1, numberOfInfluences)
+    return SkinWeights(skinCluster, influences, matrix)
+
+
+class VerificationResult(object):
+
+    def __init__(self, mesh, tolerance, maxDeviation, meanDeviation, worstVertices, worstInfluences,
+                 addedInfluences=(), removedInfluences=(), reason=None):
+        """Deviation of the skinCluster weights of a mesh after its conversion.
+
+        Args:
+            mesh (str): The converted mesh.
+            tolerance (float): The largest deviation of a weight that passes.
+            maxDeviation (float): The largest deviation of a weight.
+            meanDeviation (float): The mean deviation of the weights.
+            worstVertices (list): (vertex index, deviation) of the vertices that changed the most.
+            worstInfluences (list): (influence name, deviation) of the influences that changed the most.
+            addedInfluences (list): Influences only found after the conversion.
+            removedInfluences (list): Influences only found before the conversion.
+            reason (str): Why the weights couldn't be compared, such a result fails.
+        """
+        self.mesh = mesh
+        self.tolerance = tolerance
+        self.maxDeviation = maxDeviation
+        self.meanDeviation = meanDeviation
+        self.worstVertices = list(worstVertices)
+        self.worstInfluences = list(worstInfluences)
+        self.addedInfluences = list(addedInfluences)
+        self.removedInfluences = list(removedInfluences)
+        self.reason = reason
+
+    @classmethod
+    def unverified(cls, mesh, tolerance, reason):
+        """Make the failed result of a mesh whose weights couldn't be compared
+
+        :param mesh: str
+        :param tolerance: float
+        :param reason: str
+        :return: VerificationResult
+        """
+        return cls(mesh, tolerance, 0.0, 0.0, [], [], reason=reason)
+
+    @property
+    def passed(self):
+        return self.reason is None and self.maxDeviation <= self.tolerance
+
+    def toData(self):
+        return {"mesh": self.mesh,
+                "passed": self.passed,
+                "tolerance": self.tolerance,
+                "maxDeviation": self.maxDeviation,
+                "meanDeviation": self.meanDeviation,
+                "worstVertices": self.worstVertices,
+                "worstInfluences": self.worstInfluences,
+                "addedInfluences": self.addedInfluences,
+                "removedInfluences": self.removedInfluences,
+                "reason": self.reason}
+
+    def formatReport(self):
+        """Make a readable report of the deviation
+
+        :return: str
+        """
+        if self.reason is not None:
+            return "{}: FAILED  {}".format(self.mesh, self.reason)
+
+        lines = ["{}: {}  max {:.6f}  mean {:.8f}  (tolerance {})".format(self.mesh,
+                                                                        "passed" if self.passed else "FAILED",
+                                                                        self.maxDeviation,
+                                                                        self.meanDeviation,
+                                                                        self.tolerance)]
+        if not self.passed:
+            lines.append("  worst vertices: " + ", ".join("vtx[{}] {:.6f}".format(vertex, deviation)
+                                                         for vertex, deviation in self.worstVertices))
+            lines.append("  worst influences: " + ", ".join("{} {:.6f}".format(name, deviation)
+                                                           for name, deviation in self.worstInfluences))
+        if self.addedInfluences:
+            lines.append("  added influences: " + ", ".join(self.addedInfluences))
+        if self.removedInfluences:
+            lines.append("  removed influences: " + ", ".join(self.removedInfluences))
+        return "\n".join(lines)
+
+
+def _worst(deviations, labels, count):
+    count = min(count, len(deviations))
+    if not count:
+        return []
+
+    worst = np.argpartition(deviations, -count)[-count:]
+    worst = worst[np.argsort(deviations[worst])[::-1]]
+    return [(labels[i] if labels is not None else int(i), float(deviations[i])) for i in worst]
+
+
+def compareSkinWeights(mesh, before, after, tolerance=DEFAULT_TOLERANCE, numberOfWorst=NUMBER_OF_WORST):
+    """Compare the skinCluster weights read before and after a conversion
+
+    :param mesh: str
+    :param before: SkinWeights
+    :param after: SkinWeights
+    :param tolerance: float
+        the largest deviation of a weight that passes
+    :param numberOfWorst: int
+        number of vertices and influences in the report
+    :return: VerificationResult
+    """
+    if before.weights.shape[0] != after.weights.shape[0]:
+        raise ValueError("{} has {} vertices before and {} after".format(mesh,
+                                                                         before.weights.shape[0],
+                                                                         after.weights.shape[0]))
+
+    names = list(before.influences)
+    names += [name for name in after.influences if name not in before.influences]
+
+    def aligned(skinWeights):
+        # a column per name of both sides, zeros for the influences the side doesn't have
+        if skinWeights.influences == names:
+            return skinWeights.weights
+        matrix = np.zeros((skinWeights.weights.shape[0], len(names)), dtype=np.float32)
+        columns = [names.index(name) for name in skinWeights.influences]
+        matrix[:, columns] = skinWeights.weights
+        return matrix
+
+    # the difference is made in the aligned copy of the after weights
+    deviations = np.array(aligned(after), dtype=np.float32)
+    np.subtract(deviations, aligned(before), out=deviations)
+    np.abs(deviations, out=deviations)
+
+    if deviations.size:
+        maxDeviation = float(deviations.max())
+        meanDeviation = float(deviations.mean())
+    else:
+        maxDeviation = meanDeviation = 0.0
+
+    return VerificationResult(mesh,
+                              tolerance,
+                              maxDeviation,
+                              meanDeviation,
+                              _worst(deviations.max(axis=1), None, numberOfWorst) if deviations.size else [],
+                              _worst(deviations.max(axis=0), names, numberOfWorst) if deviations.size else [],
+                              [name for name in after.influences if name not in before.influences],
+                              [name for name in before.influences if name not in after.influences])
@@ -0,0 +1,255 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Resamples weights copied from one mesh onto another one with a different topology,
+        by the vertex positions saved with the copy.
+
+        Features:
+        - Closest point takes the weights of the nearest source vertex.
+        - Barycentric interpolates the weights of the closest source triangle around the nearest vertex.
+        - The lookup tree of a source snapshot is built once and reused by the following pastes.
+        - scipy's KD-tree is used when it is available, a chunked numpy search otherwise.
+
+:Revisions:
+"""
+# Build-in
+import logging
+from collections import OrderedDict
+
+# Third Party
+import numpy as np
+
+# Maya modules
+import maya.api.OpenMaya as om2
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+CLOSEST_POINT = "closestPoint"
+BARYCENTRIC = "barycentric"
+
+# float32 budget of a distance block of the numpy search
+_SEARCH_BLOCK_SIZE = 1 << 24
+_MAX_LOCATORS = 4
+
+
+def _getMeshFn(mesh):
+    selection = om2.MSelectionList()
+    selection.add(mesh)
+    return om2.MFnMesh(selection.getDagPath(0))
+
+
+def getMeshPoints(mesh):
+    """Get the world positions of the vertices
+
+    :param mesh: str
+    :return: numpy.ndarray
+        vertices x 3 float32 array
+    """
+    # one array of x, y, z, w per vertex straight from the MPointArray
+    points = np.array(_getMeshFn(mesh).getPoints(om2.MSpace.kWorld), dtype=np.float32).reshape(-1, 4)
+    return np.ascontiguousarray(points[:, :3])
+
+
+def getMeshTriangles(mesh):
+    """Get the vertex indexes of the triangles of the mesh
+
+    :param mesh: str
+    :return: numpy.ndarray
+        triangles x 3 int32 array
+    """
+    _, vertices = _getMeshFn(mesh).getTriangles()
+    return np.array(vertices, dtype=np.int32).reshape(-1, 3)
+
+
+class TransferMap(object):
+
+    def __init__(self, indexes, weights):
+        """Source vertices and interpolation weights of each destination vertex.
+
+        Args:
+            indexes (numpy.ndarray): destination vertices x k source vertex indexes.
+            weights (numpy.ndarray): destination vertices x k interpolation weights.
+        """
+        self.indexes = indexes
+        self.weights = weights
+
+    @property
+    def numberOfVertices(self):
+        return len(self.indexes)
+
+    def apply(self, values):
+        """Resample the values of the source vertices to the destination vertices
+
+        :param values: numpy.ndarray
+            a value per source vertex, or rows x source vertices
+        :return: numpy.ndarray
+            a value per destination vertex, or rows x destination vertices
+        """
+        values = np.asarray(values, dtype=np.float32)
+        result = np.zeros(values.shape[:-1] + (self.numberOfVertices,), dtype=np.float32)
+        for k in range(self.indexes.shape[1]):
+            result += values[..., self.indexes[:, k]] * self.weights[:, k]
+        return result
+
+
+class PointLocator(object):
+
+    def __init__(self, points, triangles=None):
+        """Nearest vertex and closest triangle lookup over the vertices of a source mesh.
+
+        locator = PointLocator(getMeshPoints("body_GEO"), getMeshTriangles("body_GEO"))
+        transferMap = locator.transferMap(getMeshPoints("body_retopo_GEO"), BARYCENTRIC)
+        transferMap.apply(weights)
+
+        Args:
+            points (numpy.ndarray): vertices x 3 source positions.
+            triangles (numpy.ndarray): triangles x 3 source vertex indexes, needed by BARYCENTRIC.
+        """
+        # copied, the cached locator shouldn't keep a clipboard file mapped
+        self.points = np.array(points, dtype=np.float32)
+        self.triangles = None if triangles is None else np.array(triangles, dtype=np.int32)
+
+        self._tree = cKDTree(self.points) if cKDTree is not None else None
+        self._vertexTriangles = None
+
+    def closestVertices(self, points):
+        """Find the nearest source vertex of each point
+
+        :param points: numpy.ndarray
+            points x 3 positions
+        :return: numpy.ndarray
+            source vertex index of each point
+        """
+        points = np.asarray(points, dtype=np.float32)
+        if self._tree is not None:
+            _, indexes = self._tree.query(points)
+            return np.asarray(indexes, dtype=np.int32)
+
+        # |p - q|^2 = |p|^2 - 2 p.q + |q|^2, a block of points at a time
+        sourceNorms = np.einsum("ij,ij->i", self.points, self.points)
+        blockSize = max(1, _SEARCH_BLOCK_SIZE // max(1, len(self.points)))
+        indexes = np.empty(len(points), dtype=np.int32)
+        for start in range(0, len(points), blockSize):
+            block = points[start:start + blockSize]
+            distances = sourceNorms - 2.0 * np.dot(block, self.points.T)
+            indexes[start:start + blockSize] = np.argmin(distances, axis=1)
+        return indexes
+
+    def _getVertexTriangles(self):
+        # the triangles around each vertex padded to the highest valence with -1
+        if self._vertexTriangles is None:
+            flat = self.triangles.ravel()
+            order = np.argsort(flat, kind="mergesort")
+            counts = np.bincount(flat, minlength=len(self.points))
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+            valence = max(1, int(counts.max()) if len(counts) else 1)
+            slots = starts[:, np.newaxis] + np.arange(valence)
+            valid = np.arange(valence) < counts[:, np.newaxis]
+            vertexTriangles = np.where(valid, order[np.minimum(slots, len(order) - 1)] // 3, -1)
+            self._vertexTriangles = vertexTriangles.astype(np.int32)
+        return self._vertexTriangles
+
+    def transferMap(self, points, method=CLOSEST_POINT):
+        """Make the transfer map of the destination points
+
+        :param points: numpy.ndarray
+            destination vertices x 3 positions
+        :param method: str
+            CLOSEST_POINT or BARYCENTRIC
+        :return: TransferMap
+        """
+        points = np.asarray(points, dtype=np.float32)
+        nearest = self.closestVertices(points)
+
+        if method != BARYCENTRIC or self.triangles is None or not len(self.triangles):
+            return TransferMap(nearest[:, np.newaxis], np.ones((len(points), 1), dtype=np.float32))
+
+        # the closest triangle is searched among the ones around the nearest vertex
+        candidates = self._getVertexTriangles()[nearest]
+        corners = self.triangles[np.maximum(candidates, 0)]
+        a, b, c = (self.points[corners[..., i]] for i in range(3))
+        p = points[:, np.newaxis, :]
+
+        v0 = b - a
+        v1 = c - a
+        v2 = p - a
+        d00 = np.einsum("...i,...i", v0, v0)
+        d01 = np.einsum("...i,...i", v0, v1)
+        d11 = np.einsum("...i,...i", v1, v1)
+        d20 = np.einsum("...i,...i", v2, v0)
+        d21 = np.einsum("...i,...i", v2, v1)
+        denom = d00 * d11 - d01 * d01
+        degenerate = np.abs(denom) < 1e-12
+        denom = np.where(degenerate, 1.0, denom)
+
+        v = (d11 * d20 - d01 * d21) / denom
+        w = (d00 * d21 - d01 * d20) / denom
+        bary = np.stack([1.0 - v - w, v, w], axis=-1)
+
+        # a point outside the triangle is moved back onto it
+        np.clip(bary, 0.0, None, out=bary)
+        total = bary.sum(axis=-1, keepdims=True)
+        bary /= np.where(total > 0.0, total, 1.0)
+
+        closest = bary[..., 0:1] * a + bary[..., 1:2] * b + bary[..., 2:3] * c
+        distances = np.einsum("...i,...i", p - closest, p - closest)
+        distances[(candidates < 0) | degenerate] = np.inf
+
+        best = np.argmin(distances, axis=1)
+        rows = np.arange(len(points))
+        indexes = corners[rows, best]
+        weights = bary[rows, best].astype(np.float32)
+
+        # nothing around the nearest vertex, e.g. a vertex without faces
+        lost = ~np.isfinite(distances[rows, best])
+        if np.any(lost):
+            indexes[lost] = nearest[lost, np.newaxis]
+            weights[lost] = (1.0, 0.0, 0.0)
+        return TransferMap(indexes, weights)
+
+
+_LOCATORS = OrderedDict()
+
+
+def getLocator(key, points, triangles=None):
+    """Get the locator of a source snapshot, built once per key
+
+    :param key: str
+        key of the source snapshot, e.g. the stamp of a clip
+    :param points: numpy.ndarray
+    :param triangles: numpy.ndarray
+    :return: PointLocator
+    """
+    locator = _LOCATORS.pop(key, None)
+    if locator is None:
+        locator = PointLocator(points, triangles)
+        while len(_LOCATORS) >= _MAX_LOCATORS:
+            _LOCATORS.popitem(last=False)
+
+    # the latest used goes last
+    _LOCATORS[key] = locator
+    return locator
@@ -23,40 +23,353 @@
 """
 # Build-in
 import logging
-import re
+from collections import namedtuple
 
 # Maya modules
 import maya.cmds as cmds
 import maya.mel as mel
+import maya.OpenMaya as om
 
 # Reelfx modules
 from rig_tools.util import validate
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.util import common
+from rig_tools.tool.ngSkinHelperTool.util import common, capabilities, callbackRegistry
 
-NG1_VERSION = "ngSkinTools1"
-NG2_VERSION = "ngSkinTools2"
+NG1_VERSION = capabilities.NG1_VERSION
+NG2_VERSION = capabilities.NG2_VERSION
 
-# ngSkinTools1 modules
+# Updated by checkNgSkinToolsPlugins, the plugins are probed on first use through isVersionAvailable
 IS_NG1 = False
-if cmds.pluginInfo('ngSkinTools', query=True, registered=True):
-    IS_NG1 = True
-
-# ngSkinTools2 modules
 IS_NG2 = False
-if cmds.pluginInfo('ngSkinTools2', query=True, registered=True):
-    IS_NG2 = True
 
 log = logging.getLogger(__name__)
 
 
-def getSkinnedMesh(mode=1):
+# ngSkinLayerData node type for each version, in order of priority
+LAYER_DATA_TYPES = ((NG1_VERSION, "ngSkinLayerData"),
+                    (NG2_VERSION, "ngst2SkinLayerData"))
+
+SkinIndexEntry = namedtuple("SkinIndexEntry", ["skinCluster", "ngVersion", "layerData"])
+
+
+class SceneSkinIndex(object):
+    """Table of skinned meshes in the scene built with bulk queries.
+
+    The skinCluster -> geometry -> ngSkinLayerData connections are walked once,
+    instead of probing each mesh with findRelatedSkinCluster.
+
+        index = SceneSkinIndex()
+        index.get("body_REN")
+        # SkinIndexEntry(skinCluster='skinCluster1', ngVersion='ngSkinTools2', layerData='ngst2SkinLayerData1')
+    """
+
+    def __init__(self):
+        self._table = {}
+        self.build()
+
+    def __contains__(self, mesh):
+        return mesh in self._table
+
+    def __len__(self):
+        return len(self._table)
+
+    def build(self):
+        """Rebuild the mesh -> (skinCluster, ngVersion, layerData) table
+
+        :return: dict
+        """
+        table = {}
+        skinClusters = cmds.ls(type="skinCluster") or []
+        if skinClusters:
+            layerDataMap = self._mapLayerData()
+            for scls, meshes in self._mapGeometry(skinClusters).items():
+                ngVersion, layerData = layerDataMap.get(scls, (None, None))
+                for mesh in meshes:
+                    table[mesh] = SkinIndexEntry(scls, ngVersion, layerData)
+
+        self._table = table
+        return table
+
+    def _mapGeometry(self, skinClusters):
+        """Map each skinCluster to the transforms of its output meshes
+
+        :param skinClusters: list
+        :return: dict
+        """
+        geometryMap = dict((scls, []) for scls in skinClusters)
+
+        plugs = ["{}.outputGeometry".format(scls) for scls in skinClusters]
+        pairs = cmds.listConnections(plugs, source=False, destination=True,
+                                     connections=True, type="mesh") or []
+        for plug, mesh in zip(pairs[0::2], pairs[1::2]):
+            meshes = geometryMap[plug.split(".")[0]]
+            if mesh not in meshes:
+                meshes.append(mesh)
+
+        # other deformers stacked after the skinCluster hide the mesh from a direct connection
+        for scls, meshes in geometryMap.items():
+            if meshes:
+                continue
+            shapes = cmds.skinCluster(scls, query=True, geometry=True) or []
+            for shape in shapes:
+                meshes.extend(cmds.listRelatives(shape, parent=True) or [])
+
+        return geometryMap
+
+    def _mapLayerData(self):
+        """Map each skinCluster to the ngSkinLayerData node attached to it
+
+        :return: dict
+            {skinCluster: (ngVersion, layerData)}
+        """
+        layerDataMap = {}
+        for ngVersion, nodeType in LAYER_DATA_TYPES:
+            if not isVersionAvailable(ngVersion):
+                continue
+
+            nodes = cmds.ls(type=nodeType)
+            if not nodes:
+                continue
+
+            pairs = cmds.listConnections(nodes, source=True, destination=False,
+                                         connections=True, type="skinCluster") or []
+            for plug, scls in zip(pairs[0::2], pairs[1::2]):
+                # ngSkinTools1 data wins when a skinCluster carries both versions
+                layerDataMap.setdefault(scls, (ngVersion, plug.split(".")[0]))
+
+        return layerDataMap
+
+    def get(self, mesh):
+        """Get the index entry of the mesh
+
+        :param mesh: str
+        :return: SkinIndexEntry or None
+        """
+        return self._table.get(mesh)
+
+    def skinnedMeshes(self, meshes=None):
+        """Filter the meshes down to skinned ones, all skinned meshes if None
+
+        :param meshes: list
+        :return: list
+        """
+        if meshes is None:
+            return sorted(self._table)
+        return [m for m in meshes if m in self._table]
+
+    def ngSkinnedMeshes(self, meshes=None):
+        """Filter the meshes down to ones with ngSkinTools layer data
+
+        :param meshes: list
+        :return: list
+        """
+        return [m for m in self.skinnedMeshes(meshes) if self._table[m].ngVersion]
+
+    def items(self):
+        return self._table.items()
+
+
+class NamespacePolicy(object):
+    """Decides which namespaced nodes take part in the "all meshes" mode.
+
+        EXCLUDE_ALL: only nodes in the root namespace
+        INCLUDE_LISTED: the root namespace and the listed namespaces (nested ones included)
+        INCLUDE_REFERENCED: the root namespace and the namespaces of loaded references
+
+        policy = NamespacePolicy(NamespacePolicy.INCLUDE_LISTED, namespaces=["charA", "charB"])
+        getSkinnedMesh(mode=2, namespacePolicy=policy)
+    """
+
+    EXCLUDE_ALL = "excludeAll"
+    INCLUDE_LISTED = "includeListed"
+    INCLUDE_REFERENCED = "includeReferenced"
+
+    def __init__(self, mode=EXCLUDE_ALL, namespaces=None):
+        if mode not in (self.EXCLUDE_ALL, self.INCLUDE_LISTED, self.INCLUDE_REFERENCED):
+            raise ValueError("Unknown namespace policy: {}".format(mode))
+
+        self.mode = mode
+        self.namespaces = [ns.strip(":") for ns in common.asList(namespaces or [])]
+
+    def getAllowedNamespaces(self):
+        """Get the namespaces allowed by this policy, the root namespace is always allowed
+
+        :return: set
+        """
+        allowed = set([""])
+        if self.mode == self.INCLUDE_LISTED:
+            allowed.update(self.namespaces)
+        elif self.mode == self.INCLUDE_REFERENCED:
+            for refFile in cmds.file(query=True, reference=True) or []:
+                if not cmds.referenceQuery(refFile, isLoaded=True):
+                    continue
+                allowed.add(cmds.referenceQuery(refFile, namespace=True).strip(":"))
+        return allowed
+
+    def filter(self, nodes):
+        """Filter the nodes down to the ones in an allowed namespace
+
+        :param nodes: list
+        :return: list
+        """
+        allowed = self.getAllowedNamespaces()
+
+        # the verdict for each namespace is looked up once
+        verdicts = {}
+        result = []
+        for node in nodes:
+            namespace = node.rsplit("|", 1)[-1].rpartition(":")[0]
+            if namespace not in verdicts:
+                verdicts[namespace] = self._isAllowed(namespace, allowed)
+            if verdicts[namespace]:
+                result.append(node)
+        return result
+
+    def _isAllowed(self, namespace, allowed):
+        # a nested namespace is allowed when any of its parents is
+        while True:
+            if namespace in allowed:
+                return True
+            if not namespace:
+                return False
+            namespace = namespace.rpartition(":")[0]
+
+
+def listSceneMeshes(namespacePolicy=None):
+    """Get the transforms of all non-intermediate meshes in the scene
+
+    :param namespacePolicy: NamespacePolicy
+        meshes in the root namespace only if None
+    :return: list
+    """
+    if namespacePolicy is None:
+        namespacePolicy = NamespacePolicy()
+
+    shapes = namespacePolicy.filter(cmds.ls(type="mesh", noIntermediate=True) or [])
+    if not shapes:
+        return []
+
+    # a transform holding several shapes is listed once
+    parents = cmds.listRelatives(shapes, parent=True) or []
+    seen = set()
+    return [p for p in parents if not (p in seen or seen.add(p))]
+
+
+class SkinVersionCache(object):
+    """Memoized mesh -> ngSkinTools version lookup keyed by node UUID.
+
+    The table is dropped only when a DG node is added or removed, or a connection changes,
+    so asking for the version of the selection is a dictionary lookup until the scene changes.
+    """
+
+    CALLBACK_OWNER = "SkinVersionCache"
+
+    def __init__(self):
+        self._versions = None
+
+        # bumped on every invalidation, other caches tied to the scene compare it
+        self.generation = 0
+
+    def install(self):
+        """Register the DG callbacks that invalidate the cache
+        """
+        if self.isInstalled():
+            return
+
+        registry = callbackRegistry.CALLBACK_REGISTRY
+        for addCallback in (om.MDGMessage.addNodeAddedCallback,
+                            om.MDGMessage.addNodeRemovedCallback,
+                            om.MDGMessage.addConnectionCallback):
+            registry.addMessageCallback(self.CALLBACK_OWNER, self.invalidate, addCallback)
+
+    def uninstall(self):
+        """Remove the DG callbacks and drop the cache
+        """
+        callbackRegistry.CALLBACK_REGISTRY.removeOwner(self.CALLBACK_OWNER)
+        self.invalidate()
+
+    def isInstalled(self):
+        return bool(callbackRegistry.CALLBACK_REGISTRY.records(self.CALLBACK_OWNER))
+
+    def invalidate(self, *args):
+        self._versions = None
+        self.generation += 1
+
+    def _build(self):
+        """Map the UUID of every skinned mesh to its ngSkinTools version
+
+        :return: dict
+        """
+        index = SceneSkinIndex()
+        meshes = index.skinnedMeshes()
+
+        uuids = cmds.ls(meshes, uuid=True) or []
+        if len(uuids) != len(meshes):
+            uuids = [cmds.ls(m, uuid=True)[0] for m in meshes]
+
+        versions = {}
+        for mesh, uuid in zip(meshes, uuids):
+            versions[uuid] = index.get(mesh).ngVersion
+        return versions
+
+    def _getVersions(self):
+        # nothing invalidates the table without callbacks, so don't keep it
+        if self._versions is not None:
+            return self._versions
+
+        versions = self._build()
+        if self.isInstalled():
+            self._versions = versions
+        return versions
+
+    def getVersion(self, mesh):
+        """Get the ngSkinTools version of the mesh
+
+        :param mesh: str
+        :return: str or None
+        """
+        uuid = cmds.ls(mesh, uuid=True)
+        if not uuid:
+            return None
+        return self._getVersions().get(uuid[0])
+
+    def getSelectionVersion(self):
+        """Get the ngSkinTools version of the first ng-skinned mesh in the selection
+
+        :return: str or None
+        """
+        # components and shapes of a mesh count as its transform, the key of the cache
+        transforms = []
+        for node in cmds.ls(sl=True, objectsOnly=True, long=True) or []:
+            if cmds.objectType(node, isAType="shape"):
+                transforms.extend(cmds.listRelatives(node, parent=True, fullPath=True) or [])
+            else:
+                transforms.append(node)
+        if not transforms:
+            return None
+
+        versions = self._getVersions()
+        for uuid in cmds.ls(transforms, uuid=True) or []:
+            version = versions.get(uuid)
+            if version:
+                return version
+        return None
+
+
+SKIN_VERSION_CACHE = SkinVersionCache()
+
+
+def getSkinnedMesh(mode=1, index=None, namespacePolicy=None):
     """Function that retrieves the currently selected mesh object
 
     :param mode: int
         1: selection mode
         2: all meshs that search all skinned-mesh in the scene
+    :param index: SceneSkinIndex
+        reuse a prebuilt index, a new one is built if None
+    :param namespacePolicy: NamespacePolicy
+        namespaces searched in the mode 2, the root namespace only if None
     :return: list
         a list containing ng-skined mesh
     """
@@ -68,39 +381,43 @@ def getSkinnedMesh(mode=1):
 
     # all meshes mode that search all skinned-mesh in the scene
     elif mode == 2:
-        namespaces = [cmds.listRelatives(i, p=True)[0] for i in cmds.ls("*:*", type="mesh", ni=True)]
-        geoAll = [cmds.listRelatives(i, p=True)[0] for i in cmds.ls(type="mesh", ni=True)]
-
-        # remove geometries with namespace
-        for space in namespaces:
-            geoAll.remove(space)
-
-        geo = geoAll
+        geo = listSceneMeshes(namespacePolicy)
 
     if not geo:
         return None
 
-    skinGeo = [g for g in geo if isSkinnedMesh(g)]
+    if index is None:
+        index = SceneSkinIndex()
+
+    skinGeo = index.skinnedMeshes(geo)
     return skinGeo
 
 
-def getNgSkinnedMesh(mode=1):
-    skinGeo = getSkinnedMesh(mode)
+def getNgSkinnedMesh(mode=1, index=None, namespacePolicy=None):
+    if index is None:
+        index = SceneSkinIndex()
+
+    skinGeo = getSkinnedMesh(mode, index=index, namespacePolicy=namespacePolicy)
     if not skinGeo:
         return None
 
-    ngSkinGeo = [g for g in skinGeo if hasSkinLayer(g)]
+    ngSkinGeo = index.ngSkinnedMeshes(skinGeo)
 
     return ngSkinGeo
 
 
-def isSkinnedMesh(geo):
+def isSkinnedMesh(geo, index=None):
     """This function checks if the input mesh has any skinCluster nodes attached to it or not
 
     :param geo: str
         a skinned mesh
+    :param index: SceneSkinIndex
+        look the mesh up in a prebuilt index instead of querying its history
     :return: bool
     """
+    if index is not None:
+        return geo in index
+
     scls = mel.eval('findRelatedSkinCluster "{}"'.format(geo))
     if not scls:
         return False
@@ -112,45 +429,39 @@ def getUnusedNgSkinLayerData():
     :return: list
         a list for unusedNgLayerData
     """
-    ngData1, ngData2 = None, None
-    if IS_NG1:
-        ngData1 = getAllNgSkinLayerData(version=1, inactive=True)
-
-    if IS_NG2:
-        ngData2 = getAllNgSkinLayerData(version=2, inactive=True)
-
     data = []
-    if ngData1:
-        data.extend(ngData1)
-    elif ngData2:
-        data.extend(ngData2)
-    return data
-
+    if isVersionAvailable(NG1_VERSION):
+        data.extend(getAllNgSkinLayerData(version=1, inactive=True))
 
-def hasSkinLayer(mesh):
-    scls = mel.eval('findRelatedSkinCluster "{}"'.format(mesh))
-    if not scls:
-        return False
+    if isVersionAvailable(NG2_VERSION):
+        data.extend(getAllNgSkinLayerData(version=2, inactive=True))
+    return data
 
-    hasDataV1, hasDataV2 = False, False
-    if IS_NG1:
-        hasDataV1 = hasLayerData(mesh, version=1)
-    if IS_NG2:
-        hasDataV2 = hasLayerData(mesh, version=2)
 
-    ngVersion = []
-    if hasDataV1:
-        ngVersion.append(NG1_VERSION)
-    elif hasDataV2:
-        ngVersion.append(NG2_VERSION)
+def hasSkinLayer(mesh, index=None):
+    if index is None:
+        index = SceneSkinIndex()
 
-    if not hasDataV1 and not hasDataV2:
+    entry = index.get(mesh)
+    if entry is None or not entry.ngVersion:
         return False
-    return True, ngVersion[0]
+    return True, entry.ngVersion
 
 
-def hasLayerData(node, version=1):
-    """Return True if `mesh` has ngSkin layer data."""
+def hasLayerData(node, version=1, index=None):
+    """Return True if `mesh` has ngSkin layer data.
+
+    :param node: str
+        a mesh or a skinCluster
+    :param version: int
+        1 or 2
+    :param index: SceneSkinIndex
+        look the mesh up in a prebuilt index instead of asking the plugin
+    """
+    if index is not None:
+        entry = index.get(node)
+        ngVersion = NG1_VERSION if version == 1 else NG2_VERSION
+        return entry is not None and entry.ngVersion == ngVersion and bool(entry.layerData)
 
     if version == 1:
         from ngSkinTools.mllInterface import MllInterface
@@ -175,32 +486,46 @@ def hasLayerData(node, version=1):
         return plugin.ngst2Layers(node, q=True, layerDataAttach=True)
 
 
-def getToolVersion(mesh):
-    _, version = hasSkinLayer(mesh)
+def isVersionAvailable(ngVersion, load=False):
+    """Check if the plugin of the ngSkinTools version is loaded
+
+    :param ngVersion: str
+        NG1_VERSION or NG2_VERSION
+    :param load: bool
+        load the plugin when it isn't loaded yet, only the tools that need it ask for that
+    :return: bool
+    """
+    return capabilities.REGISTRY.hasPlugin(ngVersion, load=load)
+
+
+def getMllInterface(ngVersion):
+    """Make an MllInterface object of the ngSkinTools version
+
+    :param ngVersion: str
+        NG1_VERSION or NG2_VERSION
+    :return: MllInterface
+    """
+    if ngVersion == NG1_VERSION:
+        module = capabilities.REGISTRY.importModule("ngSkinTools.mllInterface")
+    elif ngVersion == NG2_VERSION:
+        module = capabilities.REGISTRY.importModule("ngSkinTools2.mllInterface")
+    else:
+        raise ValueError("Unknown ngSkinTools version: {}".format(ngVersion))
+    return module.MllInterface()
+
+
+def getToolVersion(mesh, index=None):
+    _, version = hasSkinLayer(mesh, index=index)
     return version
 
 
 def checkNgSkinToolsPlugins():
     global IS_NG1, IS_NG2
-    IS_NG1 = False
-    if cmds.pluginInfo('ngSkinTools', query=True, loaded=True):
-        IS_NG1 = True
-    else:
-        try:
-            cmds.pluginInfo('ngSkinTools', loaded=True)
-            IS_NG1 = True
-        except:
-            pass
-
-    IS_NG2 = False
-    if cmds.pluginInfo('ngSkinTools2', query=True, loaded=True):
-        IS_NG2 = True
-    else:
-        try:
-            cmds.pluginInfo('ngSkinTools2', loaded=True)
-            IS_NG2 = True
-        except:
-            pass
+    registry = capabilities.REGISTRY
+    registry.refresh()
+
+    IS_NG1 = registry.hasPlugin(NG1_VERSION)
+    IS_NG2 = registry.hasPlugin(NG2_VERSION)
 
     return IS_NG1, IS_NG2
 
@@ -213,22 +538,17 @@ def loadNgModules(plugInName='ngSkinTools', *module_names):
         module_names: variable number of module names to import
     :return: list of loaded module objects
     """
-    loaded_modules = []
+    registry = capabilities.REGISTRY
+    ngVersions = dict((name, version) for version, name in capabilities.PLUGIN_NAMES.items())
 
-    for module_name in module_names:
-        module_loaded = False
+    # check if plugin is loaded
+    if not registry.hasPlugin(ngVersions.get(plugInName), load=False):
+        print('Plugin for {} modules is not loaded'.format(plugInName))
+        return []
 
-        # check if plugin is loaded
-        if cmds.pluginInfo(plugInName, query=True, loaded=True):
-            # fromlist argument is used to import the module by name.
-            module = __import__(plugin_name + '.' + module_name, fromlist=[module_name])
-            loaded_modules.append(module)
-            module_loaded = True
-            break
-
-        # if plugin is not loaded, print a message
-        if not module_loaded:
-            print('Plugin for {} module is not loaded'.format(module_name))
+    loaded_modules = []
+    for module_name in module_names:
+        loaded_modules.append(registry.importModule(plugInName + '.' + module_name))
 
     return loaded_modules
 
@@ -260,10 +580,18 @@ def getAllNgSkinLayerData(version=1, active=False, inactive=False):
     if (active and inactive) or (not active and not inactive):
         return ngSkinLayerData
 
+    if not ngSkinLayerData:
+        return []
+
+    # a single query for all nodes, the source plug names the connected node
+    pairs = cmds.listConnections(ngSkinLayerData, source=True, destination=False,
+                                 connections=True, type="skinCluster") or []
+    connected = set(plug.split(".")[0] for plug in pairs[0::2])
+
     activeNodes = []
     inactiveNodes = []
     for node in ngSkinLayerData:
-        if not cmds.listConnections(node, source=True, type="skinCluster"):
+        if node not in connected:
             inactiveNodes.append(node)
         else:
             activeNodes.append(node)
@@ -276,8 +604,9 @@ def getAllNgSkinLayerData(version=1, active=False, inactive=False):
 
 
 def killScriptJob(functions, event=None):
-    """ Kills all scriptJobs that call the specified function.
-    Sometimes the saved id somehow gets moved or lost. This will use a name.
+    """ Kills the recorded scriptJobs that call the specified function.
+    Only the jobs made through callbackRegistry.CALLBACK_REGISTRY are looked at,
+    the other jobs of the session are left alone.
 
     :parameters:
         functions : callable | list(callable)
@@ -286,44 +615,16 @@ def killScriptJob(functions, event=None):
             The event string that triggers the job. (Optional)
 
     :return: list of all deleted jobs
-    :type: list
+    :type: list(CallbackRecord)
 
     """
-    jobs = []
-
-    # Loop through all scriptJobs
-    for job in cmds.scriptJob(listJobs=True):
-        for func in common.asList(functions):
-            if event:
-                valid_event = False
-                splitjob = re.findall("[A-Za-z0-9-_]+", job)
-                for idx, text in enumerate(splitjob):
-                    if text not in ('e', 'event'):
-                        continue
-                    jobEvent = splitjob[idx + 1]
-                    if event == jobEvent:
-                        valid_event = True
-                        break
-                if not valid_event:
-                    continue
-
-            jobCbStr = re.findall("<([A-Za-z0-9_<. ]+)>", str(job))
-            if not jobCbStr:
-                continue
-
-            funcStr = re.findall("<([A-Za-z0-9_<. ]+)>", str(func))
-            if not funcStr:
-                continue
-
-            if not (jobCbStr[0].rpartition(' ')[0]
-                    == funcStr[0].rpartition(' ')[0]):
-                continue
-
-            jobs.append(job)
+    functions = common.asList(functions)
+    registry = callbackRegistry.CALLBACK_REGISTRY
 
-            # Kill it using the job ID.
-            jobNum = job.partition(":")[0]
-            cmds.evalDeferred(
-                "cmds.scriptJob(kill={}, force=True)".format(jobNum))
+    records = [record for record in registry.records()
+               if record.kind == callbackRegistry.SCRIPT_JOB
+               and record.function in functions
+               and (event is None or record.event == event)]
 
-    return jobs
+    # Kill them on idle in case this is called from inside one of the jobs.
+    return registry.discard(records, deferred=True)
@@ -0,0 +1,475 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        Keeps the copied weights of the weight clipboard on disk, so they survive closing the window
+        and can be pasted from any Maya session on the machine.
+
+        Features:
+        - The weights stay sparse, the vertex indexes and float32 values of the non-zero weights of
+          every influence are packed in .npy files, a small json header tells the source mesh,
+          layer, vertex count and influence names.
+        - The vertex positions and triangles of the source mesh are kept for a paste to another topology.
+        - The .npy file is memory-mapped on paste, a large copy isn't loaded twice in memory.
+        - A copy writes new files and swaps the header last, a reader never sees a half written clip.
+        - The history keeps the last copies of the session within a memory budget,
+          the least recently used ones are spilled to disk.
+
+:Revisions:
+"""
+# Build-in
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+# Third Party
+import numpy as np
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+HEADER_NAME = "clipboard.json"
+
+# the non-zero weights of the influence of row i are indexes[offsets[i]:offsets[i + 1]] and the same values
+OFFSETS = "offsets"
+INDEXES = "indexes"
+VALUES = "values"
+POINTS = "points"
+TRIANGLES = "triangles"
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".prefs", "ngSkinHelperTool_clipboard")
+
+
+def newStamp():
+    """Make the unique key of a clip, it names its files and keys the lookups built from it
+
+    :return: str
+    """
+    return uuid.uuid4().hex
+
+
+def packSparse(layerWeights, influences):
+    """Pack the non-zero weights of the influences into the arrays of a clip
+
+    :param layerWeights: SparseLayerWeights
+    :param influences: list
+        influence of each row of the clip
+    :return: dict
+        OFFSETS, INDEXES and VALUES arrays
+    """
+    entries = [layerWeights.getSparse(influence) for influence in influences]
+
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(indexes) for indexes, _ in entries], dtype=np.int64)
+
+    indexes = np.zeros(int(offsets[-1]), dtype=np.int32)
+    values = np.zeros(int(offsets[-1]), dtype=np.float32)
+    for row, (rowIndexes, rowValues) in enumerate(entries):
+        indexes[offsets[row]:offsets[row + 1]] = rowIndexes
+        values[offsets[row]:offsets[row + 1]] = rowValues
+
+    return {OFFSETS: offsets, INDEXES: indexes, VALUES: values}
+
+
+class SparseRows(object):
+
+    def __init__(self, offsets, indexes, values, numberOfVertices):
+        """The packed weights of a clip, a row per copied influence.
+
+        rows = SparseRows.fromArrays(arrays, header["numberOfVertices"])
+        indexes, values = rows.getSparse(0)
+
+        Args:
+            offsets (numpy.ndarray): Start of each row in indexes and values, and the end of the last one.
+            indexes (numpy.ndarray): Vertex indexes of the non-zero weights of every row.
+            values (numpy.ndarray): The non-zero weights of every row.
+            numberOfVertices (int): Number of vertices of the source mesh.
+        """
+        self.offsets = offsets
+        self.indexes = indexes
+        self.values = values
+        self.numberOfVertices = numberOfVertices
+
+    @classmethod
+    def fromArrays(cls, arrays, numberOfVertices):
+        return cls(arrays[OFFSETS], arrays[INDEXES], arrays[VALUES], numberOfVertices)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def getSparse(self, row):
+        """Get the non-zero weights of a row, views of the packed arrays
+
+        :param row: int
+        :return: tuple
+            (vertex indexes, values)
+        """
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.indexes[start:end], self.values[start:end]
+
+    def toDense(self, rows=None):
+        """Make a rows x vertices matrix, for the resampling to another topology
+
+        :param rows: list
+            all of the rows if None
+        :return: numpy.ndarray
+        """
+        if rows is None:
+            rows = range(len(self))
+        rows = list(rows)
+
+        dense = np.zeros((len(rows), self.numberOfVertices), dtype=np.float32)
+        for i, row in enumerate(rows):
+            indexes, values = self.getSparse(row)
+            dense[i, indexes] = values
+        return dense
+
+
+def _replaceFile(srcPath, dstPath):
+    # os.replace doesn't exist in python 2 and os.rename can't overwrite on Windows
+    replace = getattr(os, "replace", None)
+    if replace is not None:
+        replace(srcPath, dstPath)
+        return
+
+    if os.path.isfile(dstPath):
+        os.remove(dstPath)
+    os.rename(srcPath, dstPath)
+
+
+class DiskClipboard(object):
+
+    def __init__(self, directory=None):
+        """Clipboard of weight arrays stored in a directory shared by the Maya sessions.
+
+        # copy the weights of two influences in one session
+        DISK_CLIPBOARD.write(packSparse(weights, [0, 1]), mesh="body_GEO", layer="Arm",
+                             influences=["arm_L_JNT", "elbow_L_JNT"], numberOfVertices=12000)
+
+        # paste them in another one, the arrays are read from the files when they are used
+        header, arrays = DISK_CLIPBOARD.read()
+        SparseRows.fromArrays(arrays, header["numberOfVertices"]).getSparse(0)
+
+        Args:
+            directory (str): The directory of the clipboard files, shared by every session if None.
+        """
+        self.directory = directory or DEFAULT_DIRECTORY
+
+    @property
+    def headerPath(self):
+        return os.path.join(self.directory, HEADER_NAME)
+
+    def header(self):
+        """Read the header of the current clip
+
+        :return: dict
+            None when the clipboard is empty or the header can't be read
+        """
+        if not os.path.isfile(self.headerPath):
+            return None
+
+        try:
+            with open(self.headerPath, "r") as f:
+                header = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            log.warning("Can't read the weight clipboard %s: %s", self.headerPath, e)
+            return None
+
+        if header.get("version") != FORMAT_VERSION:
+            log.warning("The weight clipboard was written by another version of the tool")
+            return None
+        return header
+
+    def isEmpty(self):
+        return self.header() is None
+
+    def write(self, arrays, mesh, layer, influences, numberOfVertices, stamp=None, **extra):
+        """Store the arrays as the current clip
+
+        :param arrays: dict
+            numpy array of each name, the weights packed by packSparse(),
+            float arrays are stored as float32
+        :param mesh: str
+            source mesh
+        :param layer: str
+            source layer name
+        :param influences: list
+            influence name of each row of the weights
+        :param numberOfVertices: int
+            number of vertices of the source mesh
+        :param stamp: str
+            the unique key of the clip, made if None
+        :param extra: additional header values, json serializable
+        :return: dict
+            the header
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        stamp = stamp or newStamp()
+        files = {}
+        for name, array in arrays.items():
+            fileName = "{}_{}.npy".format(stamp, name)
+            array = np.asarray(array)
+            if array.dtype.kind == "f":
+                array = array.astype(np.float32, copy=False)
+            np.save(os.path.join(self.directory, fileName), np.ascontiguousarray(array))
+            files[name] = fileName
+
+        header = dict(extra)
+        header.update({"version": FORMAT_VERSION,
+                       "stamp": stamp,
+                       "time": time.time(),
+                       "host": socket.gethostname(),
+                       "pid": os.getpid(),
+                       "mesh": mesh,
+                       "layer": layer,
+                       "numberOfVertices": int(numberOfVertices),
+                       "influences": list(influences),
+                       "files": files})
+
+        # the header is swapped last, the previous clip stays readable until then
+        tempPath = "{}.{}.tmp".format(self.headerPath, stamp)
+        with open(tempPath, "w") as f:
+            json.dump(header, f, indent=4)
+        _replaceFile(tempPath, self.headerPath)
+
+        self._removeStale(stamp)
+        return header
+
+    def read(self, mmap=True):
+        """Read the current clip
+
+        :param mmap: bool
+            map the arrays from the files instead of loading them
+        :return: tuple
+            (header, numpy array of each name), (None, {}) when the clipboard is empty
+        """
+        header = self.header()
+        if header is None:
+            return None, {}
+
+        arrays = {}
+        for name, fileName in header["files"].items():
+            filePath = os.path.join(self.directory, fileName)
+            try:
+                arrays[name] = np.load(filePath, mmap_mode="r" if mmap else None)
+            except (IOError, OSError, ValueError) as e:
+                # another session swapped the clip while it was read
+                log.warning("Can't read the weight clipboard %s: %s", filePath, e)
+                return None, {}
+        return header, arrays
+
+    def clear(self):
+        if os.path.isfile(self.headerPath):
+            os.remove(self.headerPath)
+        self._removeStale(None)
+
+    def _removeStale(self, keepStamp):
+        if not os.path.isdir(self.directory):
+            return
+
+        for fileName in os.listdir(self.directory):
+            if not fileName.endswith(".npy") or (keepStamp and fileName.startswith(keepStamp)):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, fileName))
+            except OSError:
+                # still mapped by a paste of another session on Windows, removed by the next copy
+                log.debug("Weight clipboard file %s is in use", fileName)
+
+
+DISK_CLIPBOARD = DiskClipboard()
+
+
+class HistoryEntry(object):
+
+    def __init__(self, key, header, arrays):
+        """A copy kept in the clipboard history.
+
+        Args:
+            key (str): Key of the copy in the history.
+            header (dict): Header of the copy.
+            arrays (dict): Numpy array of each name, None once spilled to disk.
+        """
+        self.key = key
+        self.header = header
+        self.arrays = arrays
+        self.spillDirectory = None
+        self.lastUsed = time.time()
+
+    @property
+    def isSpilled(self):
+        return self.arrays is None
+
+    def nbytes(self):
+        if self.arrays is None:
+            return 0
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def label(self):
+        header = self.header
+        influences = header.get("influences", [])
+        names = ", ".join(influences[:3]) + (" ..." if len(influences) > 3 else "")
+        return "{}  {} | {}  ({})".format(time.strftime("%H:%M:%S", time.localtime(header.get("time", 0))),
+                                          header.get("mesh"),
+                                          header.get("layer"),
+                                          names)
+
+
+class ClipboardHistory(object):
+
+    def __init__(self, maxEntries=10, byteBudget=256 * 1024 * 1024, directory=None):
+        """The last copies of the weight clipboard, the least recently used are spilled to disk over the budget.
+
+        CLIPBOARD_HISTORY.add(header, arrays)
+        for entry in CLIPBOARD_HISTORY.entries():
+            print(entry.label())
+        header, arrays = CLIPBOARD_HISTORY.get(entry.key)
+
+        Args:
+            maxEntries (int): Number of copies kept, the oldest is dropped first.
+            byteBudget (int): Memory the copies may use before the least recently used are spilled.
+            directory (str): The directory of the spilled copies, one per Maya session.
+        """
+        self.maxEntries = maxEntries
+        self.byteBudget = byteBudget
+        self.directory = directory or os.path.join(DEFAULT_DIRECTORY, "history_{}".format(os.getpid()))
+
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entries(self):
+        """Get the copies from the latest one
+
+        :return: list
+            a list of HistoryEntry
+        """
+        return list(self._entries)
+
+    def nbytes(self):
+        return sum(entry.nbytes() for entry in self._entries)
+
+    def setLimits(self, maxEntries=None, byteBudget=None):
+        if maxEntries is not None:
+            self.maxEntries = maxEntries
+        if byteBudget is not None:
+            self.byteBudget = byteBudget
+        self._evict()
+
+    def add(self, header, arrays):
+        """Keep a copy, its arrays are loaded in memory as the clipboard files are replaced by the next copy
+
+        :param header: dict
+        :param arrays: dict
+        :return: HistoryEntry
+        """
+        key = header.get("stamp") or newStamp()
+        entry = HistoryEntry(key, dict(header, stamp=key),
+                             dict((name, np.array(array)) for name, array in arrays.items()))
+        self._entries.insert(0, entry)
+        self._evict()
+        return entry
+
+    def get(self, key):
+        """Get a copy, a spilled one is mapped from its files
+
+        :param key: str
+        :return: tuple
+            (header, numpy array of each name), (None, {}) when the key isn't in the history
+        """
+        for entry in self._entries:
+            if entry.key != key:
+                continue
+
+            entry.lastUsed = time.time()
+            if not entry.isSpilled:
+                return entry.header, entry.arrays
+
+            arrays = {}
+            for name in entry.header["files"]:
+                arrays[name] = np.load(os.path.join(entry.spillDirectory, "{}.npy".format(name)), mmap_mode="r")
+            return entry.header, arrays
+
+        return None, {}
+
+    def remove(self, key):
+        for entry in list(self._entries):
+            if entry.key == key:
+                self._entries.remove(entry)
+                self._removeSpill(entry)
+
+    def clear(self):
+        for entry in self._entries:
+            self._removeSpill(entry)
+        self._entries = []
+
+    def _evict(self):
+        while len(self._entries) > self.maxEntries:
+            self._removeSpill(self._entries.pop())
+
+        # the least recently used copies go to disk first
+        inMemory = sorted([entry for entry in self._entries if not entry.isSpilled], key=lambda e: e.lastUsed)
+        total = sum(entry.nbytes() for entry in inMemory)
+        for entry in inMemory:
+            if total <= self.byteBudget:
+                break
+            total -= entry.nbytes()
+            self._spill(entry)
+
+    def _spill(self, entry):
+        spillDirectory = os.path.join(self.directory, entry.key)
+        try:
+            if not os.path.isdir(spillDirectory):
+                os.makedirs(spillDirectory)
+            for name, array in entry.arrays.items():
+                np.save(os.path.join(spillDirectory, "{}.npy".format(name)), array)
+        except (IOError, OSError) as e:
+            # dropped rather than kept over the budget
+            log.warning("Can't spill the copy of %s to disk, it is removed from the history: %s",
+                        entry.header.get("mesh"), e)
+            self._entries.remove(entry)
+            return
+
+        entry.header["files"] = dict((name, "{}.npy".format(name)) for name in entry.arrays)
+        entry.spillDirectory = spillDirectory
+        entry.arrays = None
+
+    def _removeSpill(self, entry):
+        if entry.spillDirectory is None or not os.path.isdir(entry.spillDirectory):
+            return
+
+        for fileName in os.listdir(entry.spillDirectory):
+            try:
+                os.remove(os.path.join(entry.spillDirectory, fileName))
+            except OSError:
+                log.debug("History file %s is in use", fileName)
+        try:
+            os.rmdir(entry.spillDirectory)
+        except OSError:
+            pass
+
+
+CLIPBOARD_HISTORY = ClipboardHistory()
@@ -0,0 +1,233 @@
+"""
+:newField description: Description
+:newField revisions: Revisions
+:newField departments: Departments
+:newField applications: Applications
+
+:Authors:
+    Joji Nishimura
+
+:Title
+    ngSkinHelperTool
+
+:Organization:
+    Reel FX Creative Studios
+
+:Departments:
+    rigging
+
+:Description:
+
+        In-place arithmetic of the weight clipboard on float32 buffers.
+
+        Features:
+        - Replace, add, subtract, multiply and scale write into the destination buffer,
+          the results are clamped to 0..1 in the same buffer.
+        - No temporary of the mesh size is made per paste, the influences are combined one column at a time.
+        - The sparse rows of the clipboard are combined through their vertex indexes, only the non-zero
+          weights are read.
+        - benchmark() compares the allocations with the list based paste it replaces.
+
+:Revisions:
+"""
+# Build-in
+import logging
+import time
+
+# Third Party
+import numpy as np
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+REPLACE = "replace"
+ADD = "add"
+SUBTRACT = "subtract"
+MULTIPLY = "multiply"
+SCALE = "scale"
+
+OPERATIONS = (REPLACE, ADD, SUBTRACT, MULTIPLY, SCALE)
+
+DTYPE = np.float32
+
+
+def applyInPlace(target, values, operation, factor=1.0):
+    """Combine the values into the target buffer and clamp it to 0..1, without a temporary
+
+    :param target: numpy.ndarray
+        float32 destination weights, changed in place
+    :param values: numpy.ndarray
+        float32 copied weights of the same shape, not used by SCALE
+    :param operation: str
+        one of OPERATIONS
+    :param factor: float
+        the factor of SCALE
+    :return: numpy.ndarray
+        the target
+    """
+    if operation == REPLACE:
+        np.copyto(target, values, casting="same_kind")
+    elif operation == ADD:
+        np.add(target, values, out=target, casting="same_kind")
+    elif operation == SUBTRACT:
+        np.subtract(target, values, out=target, casting="same_kind")
+    elif operation == MULTIPLY:
+        np.multiply(target, values, out=target, casting="same_kind")
+    elif operation == SCALE:
+        np.multiply(target, DTYPE(factor), out=target)
+    else:
+        raise ValueError("Unknown operation {}".format(operation))
+
+    np.clip(target, 0.0, 1.0, out=target)
+    return target
+
+
+def applyColumns(targetBlock, sourceRows, rows, operation, factor=1.0):
+    """Combine the copied rows into the columns of the destination block one influence at a time
+
+    The copied rows can be memory-mapped, only one row is read at a time.
+
+    :param targetBlock: numpy.ndarray
+        vertices x influences float32 destination weights, changed in place
+    :param sourceRows: numpy.ndarray
+        influences x vertices copied weights
+    :param rows: list
+        row of sourceRows of each column of targetBlock
+    :param operation: str
+        one of OPERATIONS
+    :param factor: float
+        the factor of SCALE
+    :return: numpy.ndarray
+        the target block
+    """
+    for column, row in enumerate(rows):
+        # the column is a view, the ufuncs write straight into the block
+        applyInPlace(targetBlock[:, column], sourceRows[row], operation, factor)
+    return targetBlock
+
+
+def applySparse(target, indexes, values, operation, factor=1.0):
+    """Combine the non-zero values of a sparse row into the target buffer and clamp it to 0..1,
+    the vertices missing from the row count as zeros
+
+    :param target: numpy.ndarray
+        float32 destination weights, changed in place
+    :param indexes: numpy.ndarray
+        unique vertex indexes of the non-zero values
+    :param values: numpy.ndarray
+        float32 value of each index, not used by SCALE
+    :param operation: str
+        one of OPERATIONS
+    :param factor: float
+        the factor of SCALE
+    :return: numpy.ndarray
+        the target
+    """
+    if operation == REPLACE:
+        target.fill(0.0)
+        target[indexes] = values
+    elif operation == ADD:
+        target[indexes] += values
+    elif operation == SUBTRACT:
+        target[indexes] -= values
+    elif operation == MULTIPLY:
+        kept = target[indexes] * values
+        target.fill(0.0)
+        target[indexes] = kept
+    elif operation == SCALE:
+        np.multiply(target, DTYPE(factor), out=target)
+    else:
+        raise ValueError("Unknown operation {}".format(operation))
+
+    np.clip(target, 0.0, 1.0, out=target)
+    return target
+
+
+def applySparseColumns(targetBlock, sparseRows, rows, operation, factor=1.0):
+    """Combine the sparse rows of a clip into the columns of the destination block one influence at a time
+
+    :param targetBlock: numpy.ndarray
+        vertices x influences float32 destination weights, changed in place
+    :param sparseRows: weightClipboard.SparseRows
+        the copied weights
+    :param rows: list
+        row of sparseRows of each column of targetBlock
+    :param operation: str
+        one of OPERATIONS
+    :param factor: float
+        the factor of SCALE
+    :return: numpy.ndarray
+        the target block
+    """
+    for column, row in enumerate(rows):
+        indexes, values = sparseRows.getSparse(row)
+        applySparse(targetBlock[:, column], indexes, values, operation, factor)
+    return targetBlock
+
+
+def _listPaste(copyWeights, pasteWeights, operation):
+    # the paste before the in-place buffers, kept for the benchmark
+    stack = np.array([copyWeights, pasteWeights])
+    if operation == ADD:
+        result = stack.sum(axis=0)
+    elif operation == SUBTRACT:
+        result = stack[1] - stack[0]
+    else:
+        result = stack[0]
+    return np.clip(result, 0.0, 1.0).tolist()
+
+
+def _measure(function, repeat):
+    if tracemalloc is not None:
+        tracemalloc.start()
+
+    start = time.time()
+    for _ in range(repeat):
+        function()
+    seconds = (time.time() - start) / repeat
+
+    peak = 0
+    if tracemalloc is not None:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def benchmark(numberOfVertices=250000, repeat=10, operation=ADD):
+    """Compare the list based paste with the in-place one on random weights
+
+    Only the arithmetic is measured, the plugin read and write are left out.
+    The peak memory needs tracemalloc (python 3).
+
+        print(weightMath.benchmark())
+
+    :param numberOfVertices: int
+    :param repeat: int
+    :param operation: str
+        ADD, SUBTRACT or REPLACE, the operations of the list based paste
+    :return: str
+        a readable report
+    """
+    randomState = np.random.RandomState(0)
+    copyWeights = randomState.random_sample(numberOfVertices).astype(DTYPE)
+    pasteWeights = randomState.random_sample(numberOfVertices).astype(DTYPE)
+
+    copyList = copyWeights.tolist()
+    pasteList = pasteWeights.tolist()
+    listSeconds, listPeak = _measure(lambda: _listPaste(copyList, pasteList, operation), repeat)
+
+    target = pasteWeights.copy()
+    inPlaceSeconds, inPlacePeak = _measure(lambda: applyInPlace(target, copyWeights, operation), repeat)
+
+    lines = ["{} vertices, {}, {} runs".format(numberOfVertices, operation, repeat),
+             "{:<10} {:>9.2f} ms  {:>10.1f} KB peak".format("list", listSeconds * 1000.0, listPeak / 1024.0),
+             "{:<10} {:>9.2f} ms  {:>10.1f} KB peak".format("in-place", inPlaceSeconds * 1000.0,
+                                                            inPlacePeak / 1024.0)]
+    if tracemalloc is None:
+        lines.append("tracemalloc is not available, the peak memory isn't measured")
+    return "\n".join(lines)
@@ -273,6 +273,13 @@ class DisplayFactory(DisplayBar):
             message = token.format("Cut", "source", "destination")
         self.successScreen(message)
 
+    def successBatchCopyPaste(self, numberOfDone, numberOfMeshes):
+        message = "Copied and pasted weights on {} of {} meshes"
+        if numberOfDone == numberOfMeshes:
+            self.successScreen(message.format(numberOfDone, numberOfMeshes))
+        else:
+            self.warningScreen(message.format(numberOfDone, numberOfMeshes))
+
     def successMirror(self, geo):
         if len(geo) > 1:
             meshStr = "meshes"
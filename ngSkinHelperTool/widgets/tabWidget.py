@@ -22,7 +22,7 @@
 
 """
 # Built-in
-import sys
+import logging
 import webbrowser
 from functools import partial
 
@@ -33,10 +33,13 @@ from PySide2.QtCore import QTimer
 from PySide2.QtGui import QIcon
 
 # Local modules
-from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
-from rig_tools.tool.ngSkinHelperTool.util import common, utils, data
+from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase, copyPasteBatch
+from rig_tools.tool.ngSkinHelperTool.util import common, utils, data, remapCompiler, progress
 from rig_tools.tool.ngSkinHelperTool.widgets.build.treeWidgets import CustomTreeWidgets
 
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
 
 class CopyPasteTabBase(QtWidgets.QDialog):
 
@@ -78,6 +81,7 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.frameContent_line_1 = QtWidgets.QFrame()
 
         self.setting_applyMaskWeight_CB = QtWidgets.QCheckBox()
+        self.setting_batch_CB = QtWidgets.QCheckBox()
         self.setting_replace_radioButton = QtWidgets.QRadioButton()
         self.setting_add_radioButton = QtWidgets.QRadioButton()
         self.setting_subtract_radioButton = QtWidgets.QRadioButton()
@@ -158,6 +162,11 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.setting_applyMaskWeight_CB.setText("Apply mask weights")
         self.setting_applyMaskWeight_CB.setChecked(True)
 
+        self.setting_batch_CB.setObjectName("setting_batch_CB")
+        self.setting_batch_CB.setText("All selected meshes")
+        self.setting_batch_CB.setToolTip("Find the layers by name on every selected mesh and copy paste on each")
+        self.setting_batch_CB.setChecked(False)
+
         self.setting_replace_radioButton.setObjectName("setting_replace_radioButton")
         self.setting_replace_radioButton.setText("Replace")
         self.setting_replace_radioButton.setChecked(True)
@@ -274,8 +283,6 @@ class CopyPasteTabBase(QtWidgets.QDialog):
             "QPushButton:hover:!pressed { background-color: #707070;}")
 
     def setSignals(self):
-        self.mLayout.displayBar.button.clicked.connect(self.deleteUnusedNgLayers)
-
         self.layerSet_source_pushButton.clicked.connect(self.setSourceField)
         self.layerSet_destination_pushButton.clicked.connect(self.setDistinationField)
 
@@ -287,6 +294,7 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.addPresetMenuAll()
 
         self.sr_tableView.itemChanged.connect(self.showMatchedNumber)
+        self.sr_matchCase_CB.toggled.connect(self.clearPreview)
 
         self.import_pushButton.clicked.connect(self.importPreset)
         self.export_pushButton.clicked.connect(self.exportPreset)
@@ -297,14 +305,6 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.apply_pushButton.clicked.connect(self.apply)
         self.close_pushButton.clicked.connect(self.closeWindow)
 
-    def deleteUnusedNgLayers(self):
-        nodes = utils.getUnusedNgSkinLayerData()
-        if nodes:
-            cmds.delete(nodes)
-            sys.stdout.write("Removed unused ngSkinLayers. >>> {}".format(nodes))
-
-        self.changeInfoInitScreen()
-
     def changeInfoInitScreen(self):
         self.mLayout.displayBar.infoInitialState()
 
@@ -315,6 +315,7 @@ class CopyPasteTabBase(QtWidgets.QDialog):
 
         self.layerSet_source_lineEdit.setText(layerName)
         self.sourceLayerID = layerID
+        self.clearPreview()
 
     def setDistinationField(self):
         layerName, layerID = self.control.getCurrentLayer()
@@ -323,6 +324,7 @@ class CopyPasteTabBase(QtWidgets.QDialog):
 
         self.layerSet_destination_lineEdit.setText(layerName)
         self.destinationLayerID = layerID
+        self.clearPreview()
 
     def importPreset(self):
         """Todo"""
@@ -388,12 +390,39 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.sr_result_label.setText("No matches")
 
     def showMatchedNumber(self):
-        num = self.getNumberMatchedJoint()
+        try:
+            num = self.getNumberMatchedJoint()
+        except remapCompiler.RemapError:
+            self.sr_result_label.setText("Invalid pattern")
+            return
+
         if num is 0 or num is None:
             self.resetResultMatch()
         else:
             self.sr_result_label.setText("{} matches".format(num))
 
+        self.showPreview()
+
+    def clearPreview(self):
+        """Read the layers again on the next preview
+        """
+        if self.control:
+            self.control.previewCache.clear()
+
+    def showPreview(self):
+        """Show the effect of the copy paste on the result label without touching the layers
+        """
+        self.sr_result_label.setToolTip("")
+        if not self.control or not self.sr_matchCase_CB.isChecked():
+            return
+
+        srcLayerID, dstLayerID = self.getLayers()
+        if srcLayerID is None or dstLayerID is None:
+            return
+
+        preview = self.control.preview()
+        self.sr_result_label.setToolTip(preview.formatReport())
+
     def insertRowTable(self):
         newRow = self.sr_tableView.rowCount()
         self.sr_tableView.insertRow(newRow)
@@ -444,8 +473,7 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         if self.progressStatus:
             return
 
-        utils.hasSkinLayer(self.control.mesh)
-        indentKey, nameKey = self.control.getInfluenceData()
+        indentKey, nameKey = self.control.getCachedInfluenceData()
         infNames, infIDs = self.control.getUsedInfluenceData(indentKey, nameKey)
         remapData = self.control.storeRemapData(infIDs, infNames, nameKey)
 
@@ -453,14 +481,8 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.mLayout.progressBar.setValue(0)
         self.updateVisbilityInfomationBar()
 
-        for i, data in enumerate(remapData.items(), 1):
-            currentNumOperation = float(i)
-            numberOfOperation = float(len(remapData.values()))
-            progress = 100.0 * (currentNumOperation / numberOfOperation)
-            self.mLayout.progressBar.setValue(progress)
-
-            weightsObj, weightMask = self.control.copyWeights(data[0])
-            self.control.pasteWeights(weightsObj, weightMask, data[1])
+        # every mapped influence is read, combined and written in one pass
+        self.control.copyPasteWeights(remapData, progressCallback=self.mLayout.progressBar.setValue)
         self.mLayout.displayBar.successCopyPaste(self.getMethod())
 
         timer = QTimer()
@@ -469,7 +491,61 @@ class CopyPasteTabBase(QtWidgets.QDialog):
         self.progressStatus = False
         self.updateVisbilityInfomationBar()
 
+    def runBatch(self):
+        """Run the copy paste on every selected mesh of this version, the layers are found by name
+        """
+        if self.progressStatus:
+            return
+
+        index = utils.SceneSkinIndex()
+        meshes = [mesh for mesh in utils.getNgSkinnedMesh(mode=1, index=index) or []
+                  if index.get(mesh).ngVersion == self.version]
+
+        layerNames = [self.layerSet_source_lineEdit.text(), self.layerSet_destination_lineEdit.text()]
+        if not meshes or not all(layerNames):
+            return
+
+        batch = copyPasteBatch.CopyPasteBatch(self.control,
+                                              meshes,
+                                              layerNames,
+                                              searchReplace=self.getSearchReplaceText(),
+                                              operation=self.getMethod(),
+                                              mask=self.isApplyMask())
+
+        self.progressStatus = True
+        self.mLayout.progressBar.setValue(0)
+        self.updateVisbilityInfomationBar()
+
+        batch.run(progressCallback=self.mLayout.progressBar.setValue)
+        log.info("Batch copy paste\n%s", batch.formatSummary())
+        self.mLayout.displayBar.successBatchCopyPaste(len(batch.succeeded()), len(meshes))
+
+        timer = QTimer()
+        timer.singleShot(3000, self.changeInfoInitScreen)
+
+        self.progressStatus = False
+        self.updateVisbilityInfomationBar()
+
+    def validateSearchReplace(self):
+        """Report the search/replace tokens that don't compile before any weight is written
+
+        :return: bool
+        """
+        errors = remapCompiler.validateTokens(self.getSearchReplaceText())
+        if not errors:
+            return True
+
+        self.mLayout.displayBar.errorScreen("\n".join(str(error) for error in errors))
+        return False
+
     def apply(self):
+        if not self.validateSearchReplace():
+            return
+
+        if self.setting_batch_CB.isChecked():
+            self.runBatch()
+            return
+
         data = {'mesh': self.control.mesh,
                 'layer': self.getLayers(),
                 'method': self.getMethod(),
@@ -552,11 +628,12 @@ class BuildTabBase(QtWidgets.QWidget):
         self.buildReelfxPresetPb = QtWidgets.QPushButton(self.buildAssignWeightsGroup)
         self.buildReelfxHelpPb = QtWidgets.QPushButton(self.buildAssignWeightsGroup)
 
-    def getControl(self, mesh):
+    def getControl(self, mesh, index=None):
         """Get an object of createLayer class
 
         :param
             parent: object of layout
+            index: SceneSkinIndex of the action, built here if None
         :return: object of creayLayer class
         """
         if mesh is None:
@@ -564,7 +641,7 @@ class BuildTabBase(QtWidgets.QWidget):
             self.mLayout.displayBar.errorScreen(message)
             return None
 
-        verName = utils.getToolVersion(mesh)
+        verName = utils.getToolVersion(mesh, index=index)
         control = layerManagerBase.getVersionControl(verName, self.presetTree)
         return control
 
@@ -651,7 +728,9 @@ class BuildTabBase(QtWidgets.QWidget):
             "QPushButton:hover:!pressed { background-color: #707070;}")
 
     def createLayers(self):
-        meshes = utils.getSkinnedMesh(mode=1)
+        # one index for the whole action, not one per mesh
+        index = utils.SceneSkinIndex()
+        meshes = utils.getSkinnedMesh(mode=1, index=index)
         if not meshes:
             message = "Please select any skinned mesh"
             self.mLayout.displayBar.errorScreen(message)
@@ -659,9 +738,16 @@ class BuildTabBase(QtWidgets.QWidget):
             return
 
         # create layers on the selected mesh
-        for mesh in meshes:
-            control = self.control(self.layerTree, self.mLayout)
-            control.createLayer(mesh)
+        try:
+            for mesh in meshes:
+                control = self.control(self.layerTree, self.mLayout)
+                control.createLayer(mesh, index=index)
+        except progress.CancelledError:
+            # the layers created before the cancel are kept
+            log.warning("Creating the layers was cancelled on %s, the meshes after it have no new layers", mesh)
+            self.mLayout.displayBar.errorScreen("Layer creation cancelled on {}".format(mesh))
+            self.timer.singleShot(3000, self.changeInfoInitScreen)
+            return
 
         message = "Created all defined-layers in the selected mesh"
         self.mLayout.displayBar.successScreen(message)
@@ -744,6 +830,9 @@ class MirrorTabBase(QtWidgets.QWidget):
         self.mll = mll
         self.control = control
 
+        # namespaces searched when running on the whole scene
+        self.namespacePolicy = utils.NamespacePolicy()
+
         # timer instance
         self.timer = QTimer()
 
@@ -784,6 +873,9 @@ class UtilTabBase(QtWidgets.QWidget):
         self.mll = mll
         self.control = control
 
+        # namespaces searched when running on the whole scene
+        self.namespacePolicy = utils.NamespacePolicy()
+
         # timer instance
         self.timer = QTimer()
 
@@ -810,6 +902,7 @@ class UtilTabBase(QtWidgets.QWidget):
 
         self.convertLaunchCBHLayout = QtWidgets.QHBoxLayout(self.convertLayerDataGroup)
         self.convertLaunchCB = QtWidgets.QCheckBox(self.convertLayerDataGroup)
+        self.convertKeepSourceCB = QtWidgets.QCheckBox(self.convertLayerDataGroup)
 
         self.convertSeparatorLine1HLayout = QtWidgets.QHBoxLayout(self.convertLayerDataGroup)
         self.convertSeparatorLine1 = QtWidgets.QFrame(self.convertLayerDataGroup)
@@ -819,11 +912,11 @@ class UtilTabBase(QtWidgets.QWidget):
         self.convertOption1RadioBtn = QtWidgets.QRadioButton()
         self.convertOption2RadioBtn = QtWidgets.QRadioButton()
 
-        # the object related to functions of ngSkinTools
-        if not utils.IS_NG1:
+        # the conversion needs both plugins, they are loaded once the tab is built
+        if not utils.isVersionAvailable(utils.NG1_VERSION, load=True):
             self.convertBtn.setEnabled(False)
 
-        if not utils.IS_NG2:
+        if not utils.isVersionAvailable(utils.NG2_VERSION, load=True):
             self.convertBtn.setEnabled(False)
 
     def convertWidget(self):
@@ -852,6 +945,13 @@ class UtilTabBase(QtWidgets.QWidget):
         self.convertLaunchCB.setFont(font)
         self.convertLaunchCB.setChecked(True)
 
+        self.convertKeepSourceCB.setText("Keep source layers")
+        self.convertKeepSourceCB.setToolTip("Keep the layers of this version, converting again only "
+                                            "updates the layers changed since the last conversion.\n"
+                                            "Without it every conversion writes all the layers")
+        self.convertKeepSourceCB.setFont(font)
+        self.convertKeepSourceCB.setChecked(False)
+
         self.convertSeparatorLine1HLayout.setContentsMargins(10, 3, 10, 3)
         self.convertSeparatorLine1.setFixedWidth(240)
         self.convertSeparatorLine1.setFrameShape(QtWidgets.QFrame.HLine)
@@ -890,7 +990,7 @@ class UtilTabBase(QtWidgets.QWidget):
             meshes = utils.getNgSkinnedMesh(mode=1)
         # all skinned-meshes mode
         elif self.convertOption2RadioBtn.isChecked():
-            meshes = utils.getNgSkinnedMesh(mode=2)
+            meshes = utils.getNgSkinnedMesh(mode=2, namespacePolicy=self.namespacePolicy)
 
         if not meshes:
             message = "Please select any ng-skinned mesh"
@@ -898,12 +998,28 @@ class UtilTabBase(QtWidgets.QWidget):
             self.timer.singleShot(2000, self.changeInfoInitScreen)
             return
 
-        for mesh in meshes:
+        self.control.keepSource = self.convertKeepSourceCB.isChecked()
+
+        failed = []
+        for number, mesh in enumerate(meshes):
             # the mesh needs to be selected for the convert process
             if self.convertOption2RadioBtn.isChecked():
                 cmds.select(cl=True)
                 cmds.select(mesh)
-            self.control.convert(mesh)
+            if not self.control.convert(mesh):
+                failed.append(mesh)
+
+                # a cancel stops the remaining meshes too, not only this one
+                if self.control.reporter.token.isCancelled:
+                    log.warning("The conversion was cancelled on %s, the meshes after it aren't converted", mesh)
+                    failed.extend(meshes[number + 1:])
+                    break
+
+        if failed:
+            message = "{} not converted, the ng data is kept, see the script editor".format(", ".join(failed))
+            self.mLayout.displayBar.errorScreen(message)
+            self.timer.singleShot(4000, self.changeInfoInitScreen)
+            return
 
         if self.convertLaunchCB.isChecked():
             self.mLayout.close()
@@ -26,6 +26,7 @@
 import logging
 import os
 import pickle
+import sys
 import webbrowser
 
 # Third party
@@ -36,8 +37,7 @@ from PySide2.QtWidgets import QDialog
 
 # Local modules
 from rig_tools.tool.ngSkinHelperTool.widgets import messageBox
-from rig_tools.tool.ngSkinHelperTool.util import utils
-from rig_tools.tool.ngSkinHelperTool.tabInternal import layerManagerBase
+from rig_tools.tool.ngSkinHelperTool.util import utils, callbackRegistry, layerDataSweeper, progress
 
 # ----------------------------------------------------------------- GLOBALS --#
 
@@ -87,6 +87,14 @@ class MainWidget(QDialog):
         self.progressBar.setInvertedAppearance(False)
         self.progressBar.setObjectName("progressBar")
 
+        # shared by the controllers of the window, stops the running operation at its next step
+        self.cancelToken = progress.CancellationToken()
+        self.cancelButton = QtWidgets.QPushButton("Cancel")
+        self.cancelButton.setVisible(False)
+        self.cancelButton.setMaximumHeight(15)
+        self.cancelButton.setObjectName("cancelButton")
+        self.cancelButton.clicked.connect(self.cancelToken.cancel)
+
     def _mainTabWidget(self):
         """Generatea main content tabs
         """
@@ -129,13 +137,13 @@ class MainWidget(QDialog):
         """Get the default configuration dictionary for this window.
         """
         pos = self.getCenterWindow()
-        data = layerManagerBase.LayerPresetData()
 
+        # the default layer presets are read when the Build tab is first shown
         config = dict(width=self.widthSize,
                       height=self.heightSize,
                       x=pos.x(),
                       y=pos.y(),
-                      layerPreset=data.load(filePath=data.filePath))
+                      layerPreset=None)
         return config
 
     def getWindowState(self):
@@ -178,6 +186,117 @@ class MainLayout(MainWidget):
 
         self.prefPath = self.getPrefPath(self.PREF_NAME)
 
+        self.tabInfo = {}
+        self.tabNames = []
+        self.mll = None
+
+        # the warning of unused layer data is shown whatever tab is built
+        self.displayBar.button.clicked.connect(self.deleteUnusedNgLayers)
+
+    def createLazyTabs(self, tabNames, tabClasses, controlFactories, mll, tabIndex=0):
+        """Adds an empty page for each tab, a tab is built the first time it is shown.
+        The requested tab is built right away and the controllers of the others are warmed on idle.
+
+        :parameter:
+            tabNames : list
+                Names of the tabs in order
+            tabClasses : dict
+                Tab class of each tab name
+            controlFactories : dict
+                Callable making the controller of each tab name
+            mll : MllInterface
+                The object related to functions of ngSkinTools
+            tabIndex : int
+                Index of the tab to show first
+        """
+        self.mll = mll
+        self.tabNames = []
+        self.tabInfo = {}
+
+        for name in tabNames:
+            tabClass = tabClasses.get(name)
+            if tabClass is None:
+                continue
+
+            page = QtWidgets.QWidget()
+            pageLayout = QtWidgets.QVBoxLayout(page)
+            pageLayout.setContentsMargins(0, 0, 0, 0)
+
+            self.tabNames.append(name)
+            self.tabInfo[name] = {"tab": None,
+                                  "name": name,
+                                  "msg": tabClass.INFO,
+                                  "class": tabClass,
+                                  "page": page,
+                                  "control": None,
+                                  "controlFactory": controlFactories.get(name)}
+            self.mainTabWidget.addTab(page, name)
+
+        self.getTab(self.tabNames[tabIndex])
+        self.mainTabWidget.setCurrentIndex(tabIndex)
+        self.mainTabWidget.currentChanged.connect(self.onTabChanged)
+
+        QtCore.QTimer.singleShot(0, self.warmControllers)
+
+    def getControl(self, name):
+        """Get the controller of the tab, made on the first call
+
+        :param
+            name: str
+        :return: the controller object
+        """
+        info = self.tabInfo[name]
+        if info["control"] is None and info["controlFactory"] is not None:
+            info["control"] = info["controlFactory"]()
+        return info["control"]
+
+    def getTab(self, name):
+        """Get the tab object, built on the first call
+
+        :param
+            name: str
+        :return: the tab object
+        """
+        info = self.tabInfo[name]
+        if info["tab"] is not None:
+            return info["tab"]
+
+        tab = info["class"](self.version,
+                            self.mll,
+                            control=self.getControl(name),
+                            mLayout=self)
+        info["page"].layout().addWidget(tab.tabWidget)
+        info["tab"] = tab
+
+        self.onTabBuilt(name, tab)
+        return tab
+
+    def isTabBuilt(self, name):
+        return name in self.tabInfo and self.tabInfo[name]["tab"] is not None
+
+    def onTabChanged(self, index):
+        """Build the tab being shown if it isn't yet
+        """
+        if 0 <= index < len(self.tabNames):
+            self.getTab(self.tabNames[index])
+
+    def onTabBuilt(self, name, tab):
+        """Called once right after a tab is built, override to set the tab up
+        """
+        pass
+
+    def warmControllers(self):
+        """Make one missing controller per idle tick so the window stays responsive
+        """
+        for name in self.tabNames:
+            info = self.tabInfo[name]
+            if info["control"] is not None or info["controlFactory"] is None:
+                continue
+
+            self.getControl(name)
+            QtCore.QTimer.singleShot(0, self.warmControllers)
+            return
+
     def setSize(self, w=None, h=None):
         """Sets size of the main window during applying the configuration
 
@@ -222,7 +341,10 @@ class MainLayout(MainWidget):
         self.displayBar.layout()
         self.mainLayout.addWidget(self.displayBar.iconFrame)
         self.mainLayout.addLayout(self.displayBar.infoFrameHBoxLayout)
-        self.mainLayout.addWidget(self.progressBar)
+        progressLayout = QtWidgets.QHBoxLayout()
+        progressLayout.addWidget(self.progressBar)
+        progressLayout.addWidget(self.cancelButton)
+        self.mainLayout.addLayout(progressLayout)
         self.mainLayout.addWidget(self.mainTabWidget)
 
     def getScreenCenter(self, screenNumber=None):
@@ -301,13 +423,12 @@ class MainLayout(MainWidget):
     def selectionChangedCallback(self):
         """Call the selection changed callback
         """
-        mesh = utils.getNgSkinnedMesh(mode=1)
+        verName = utils.SKIN_VERSION_CACHE.getSelectionVersion()
 
-        if not mesh:
+        if not verName:
             self.setWindowTitle(self.title)
             return
 
-        verName = utils.getToolVersion(mesh[0])
         tittle = self.renameTitle(self.title, verName)
         self.setWindowTitle(tittle)
 
@@ -322,14 +443,39 @@ class MainLayout(MainWidget):
 
         :return:
         """
-        # Just in case.
-        utils.killScriptJob(self.selectionChangedCallback)
+        registry = callbackRegistry.CALLBACK_REGISTRY
+
+        # Just in case, the jobs of a window that wasn't closed properly.
+        registry.removeOwner(self.title)
+
+        # Scene edits invalidate the cached versions looked up on selection changes
+        utils.SKIN_VERSION_CACHE.install()
 
         # Make new scriptJobs.
-        cmds.scriptJob(
-            event=("SelectionChanged", self.selectionChangedCallback),
-            killWithScene=False
-        )
+        registry.addScriptJob(self.title,
+                              self.selectionChangedCallback,
+                              "SelectionChanged",
+                              killWithScene=False)
+
+    def removeCallbacks(self):
+        """Kill the scriptJobs made by this window
+        """
+        callbackRegistry.CALLBACK_REGISTRY.removeOwner(self.title)
+
+    def deleteUnusedNgLayers(self):
+        """Delete the ngSkinTools layer data nodes no mesh uses anymore
+        """
+        sweeper = layerDataSweeper.LayerDataSweeper()
+        sweeper.scan(measure=False)
+        orphans = sweeper.orphans()
+        if orphans:
+            # only the nodes about to be deleted are reported
+            sweeper.measure(orphans)
+            sys.stdout.write("Unused ngSkinLayers:\n{}\n".format(sweeper.formatReport(orphans)))
+            sweeper.sweep(orphans)
+            sys.stdout.write("Removed unused ngSkinLayers. >>> {}".format([r.node for r in orphans]))
+
+        self.displayBar.infoInitialState()
 
     def openHelpPage(self):
         """Open a confluence page for the tool
@@ -361,13 +507,14 @@ class MainLayout(MainWidget):
     def resetAll(self):
         """Restore settigs to their original defaults
         """
-        self._copyTab.layerSet_source_lineEdit.clear()
-        self._copyTab.layerSet_destination_lineEdit.clear()
-        self._copyTab.setting_replace_radioButton.setChecked(True)
-        self._copyTab.setting_applyMaskWeight_CB.setChecked(True)
-        self._copyTab.sr_tableView.clearContents()
-        self._copyTab.resetResultMatch()
-        self._copyTab.changeInfoInitScreen()
+        copyTab = self.getTab("CopyPaste")
+        copyTab.layerSet_source_lineEdit.clear()
+        copyTab.layerSet_destination_lineEdit.clear()
+        copyTab.setting_replace_radioButton.setChecked(True)
+        copyTab.setting_applyMaskWeight_CB.setChecked(True)
+        copyTab.sr_tableView.clearContents()
+        copyTab.resetResultMatch()
+        copyTab.changeInfoInitScreen()
         self.setWindowTitle(self.TITLE_NAME)
 
     def createMenuItems(self, parent):